@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: LineFramer vs. the old per-line readLine/decode/strip path.
+
+Feeds a recorded-looking stream of M100 position feedback, acks, M08
+input reports and encoder positions in serial-sized chunks through a
+QBuffer (the same QIODevice API QSerialPort exposes) and reports lines per
+second. Both paths classify every line and parse its payload, and must
+agree on the counts.
+
+    python benchmarks/bench_line_framer.py [lines]
+"""
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from PyQt5.QtCore import QBuffer, QIODevice
+
+from components.line_framer import (LineFramer, FRAME_OK, FRAME_POSITION, FRAME_INPUT,
+                                    FRAME_ENCODER, FRAME_TEXT)
+
+CHUNK_SIZE = 64  # Roughly what one readyRead delivers at 115200 baud
+DEFAULT_LINES = 200000
+
+
+def make_stream(lines):
+    pattern = [
+        b"12.345,-67.890,-350.125\r\n",
+        b"12.400,-67.800,-350.100,0.000\r\n",
+        b"Ok\r\n",
+        b"I3 V1\r\n",
+        b"A2 V2478\r\n",
+        b"P:13.2\r\n",
+    ]
+    return b''.join(pattern[i % len(pattern)] for i in range(lines))
+
+
+def chunks(stream):
+    return [stream[i:i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+
+
+def open_device():
+    device = QBuffer()
+    device.open(QIODevice.ReadWrite)
+    return device
+
+
+def receive(device, part):
+    """Append a chunk as if it had just arrived, leaving the read position alone"""
+    pos = device.pos()
+    device.seek(device.size())
+    device.write(part)
+    device.seek(pos)
+
+
+def legacy(parts):
+    """What the device widgets used to do in read_data, extended to pick out
+    every kind of reply the framer classifies, so both do the same work"""
+    device = open_device()
+    counts = Counter()
+    for part in parts:
+        receive(device, part)
+        while device.canReadLine():
+            data = device.readLine().data().decode().strip()
+            if not data:
+                continue
+            if data == "Ok":
+                counts[FRAME_OK] += 1
+            elif ',' in data and len(data.split(',')) >= 3:
+                try:
+                    x, y, z = map(float, data.split(',')[:3])
+                    counts[FRAME_POSITION] += 1
+                except ValueError:
+                    counts[FRAME_TEXT] += 1
+            elif data.startswith("P:") or data.startswith("P0:"):
+                try:
+                    position = float(data.split(":")[1])
+                    counts[FRAME_ENCODER] += 1
+                except (IndexError, ValueError):
+                    counts[FRAME_TEXT] += 1
+            elif data[0] in "IA" and " V" in data:
+                pin, _, value = data.partition(" V")
+                value = int(value)
+                counts[FRAME_INPUT] += 1
+            else:
+                counts[FRAME_TEXT] += 1
+    return counts
+
+
+def framed(parts):
+    """DeviceTransport.read_data with LineFramer"""
+    device = open_device()
+    framer = LineFramer()
+    counts = Counter()
+    for part in parts:
+        receive(device, part)
+        for frame in framer.feed(device.readAll().data()):
+            if frame.kind == FRAME_POSITION:
+                x, y, z = frame.value[:3]
+            counts[frame.kind] += 1
+    return counts
+
+
+def run(name, func, parts, lines):
+    start = time.perf_counter()
+    counts = func(parts)
+    elapsed = time.perf_counter() - start
+    print(f"{name:8s} {elapsed * 1000:8.1f} ms  {lines / elapsed / 1000:8.1f} k lines/s  "
+          f"({', '.join(f'{count} {kind}' for kind, count in sorted(counts.items()))})")
+    return elapsed, counts
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES
+    parts = chunks(make_stream(lines))
+    old, old_counts = run("legacy", legacy, parts, lines)
+    new, new_counts = run("framer", framed, parts, lines)
+    assert old_counts == new_counts, "the two paths classified the stream differently"
+    print(f"speedup  {old / new:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
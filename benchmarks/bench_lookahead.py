@@ -0,0 +1,77 @@
+"""
+Cycle time of a continuous path with and without lookahead blending.
+
+Times the drawing plugin's circle (36 segments of 10 degrees) and a square
+two ways: estimate_cycle_time() on the G-code, and the robot simulator at
+instant time scale with the moves streamed through a window of commands in
+flight, reading its simulated clock. A lookahead of 1 stops at every
+segment, as the simulator used to.
+
+    python benchmarks/bench_lookahead.py [radius] [window]
+"""
+import asyncio
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import deltax_client as dx
+from simulator.cycle_time import estimate_cycle_time
+from simulator.motion_planner import PLANNER_LOOKAHEAD
+from simulator.robot_simulator import RobotSimulator
+from simulator.sim_clock import INSTANT
+
+DEFAULT_RADIUS = 50
+DEFAULT_WINDOW = 32
+Z = -800
+
+
+def circle(radius):
+    return [f"G1 X{radius * math.cos(math.radians(angle)):.3f} "
+            f"Y{radius * math.sin(math.radians(angle)):.3f} Z{Z}"
+            for angle in range(0, 361, 10)]
+
+
+def square(side):
+    return [f"G1 X{x} Y{y} Z{Z}" for x, y in ((0, 0), (side, 0), (side, side), (0, side), (0, 0))]
+
+
+async def stream(port, commands, window):
+    robot = await dx.open_robot(port)
+    try:
+        in_flight = set()
+        for command in commands:
+            if len(in_flight) >= window:
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.add(asyncio.ensure_future(robot.send(command)))
+        await asyncio.gather(*in_flight)
+    finally:
+        robot.close()
+
+
+def simulated(commands, lookahead, window):
+    """Simulated seconds for the path, after moving to its start."""
+    simulator = RobotSimulator(port='loop://lookahead', time_scale=INSTANT, lookahead=lookahead)
+    simulator.start()
+    try:
+        asyncio.run(stream(simulator.device_port, commands[:1], 1))
+        start = simulator.simulated_time
+        asyncio.run(stream(simulator.device_port, commands[1:], window))
+        return simulator.simulated_time - start
+    finally:
+        simulator.stop()
+
+
+def main():
+    radius = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RADIUS
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WINDOW
+    for name, commands in (("circle", circle(radius)), ("square", square(2 * radius))):
+        for lookahead in (1, PLANNER_LOOKAHEAD):
+            estimate = (estimate_cycle_time(commands, lookahead)
+                        - estimate_cycle_time(commands[:1], lookahead))
+            print(f"{name:6s} lookahead {lookahead:2d}  estimate {estimate * 1000:7.1f} ms  "
+                  f"simulator {simulated(commands, lookahead, window) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
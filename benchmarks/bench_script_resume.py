@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: per-ack script resume and per-run script compile.
+
+Every acknowledged command resumes the job that sent it. The runtime used to
+re-execute the source of its Lua resume helper and look it up in the globals
+on each ack; it now calls the helper compiled at setup, so an ack costs one
+coroutine resume. Scripts used to be load()ed on every run; the compiled
+chunk is now reused while the script text is unchanged.
+
+    python benchmarks/bench_script_resume.py [resumes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from PyQt5.QtCore import QCoreApplication
+
+from components.response_router import ResponseRouter
+from plugins.script_runtime import ScriptRuntime, ScriptJob
+
+DEFAULT_RESUMES = 100000
+COMPILES = 2000
+
+RESUME_HELPER = """
+    function safe_resume_script(co)
+        if not co then return false, "No coroutine" end
+
+        local status = coroutine.status(co)
+        if status == "suspended" then
+            local success, result = coroutine.resume(co)
+            if not success then
+                error("Script error: " .. tostring(result))
+            end
+            return success, result
+        elseif status == "dead" then
+            return true, "Script completed"
+        end
+        return false, "Coroutine is " .. status
+    end
+"""
+
+# A script of typical length: the compile cost grows with the text
+SCRIPT = "\n".join(
+    f'robot:move_to({i}, {-i}, -750)\nif get_input(robot, "I{i % 8}") then print("{i}") end'
+    for i in range(200))
+
+
+class DeviceManager:
+    """Just what ScriptRuntime needs to be constructed"""
+
+    def __init__(self):
+        self.router = ResponseRouter()
+
+
+def new_job(runtime):
+    """A job whose coroutine yields forever, as if waiting for acks"""
+    job = ScriptJob("bench")
+    job.thread = runtime.start_coroutine(runtime.lua.eval(
+        "function() while true do coroutine.yield() end end"))
+    return job
+
+
+def legacy_resume(runtime, resumes):
+    """What resume_script used to do per ack"""
+    lua = runtime.lua
+    job = new_job(runtime)
+    for _ in range(resumes):
+        lua.execute(RESUME_HELPER)
+        safe_resume = lua.globals().safe_resume_script
+        safe_resume(job.thread)
+        lua.globals().coroutine.status(job.thread)
+
+
+def cached_resume(runtime, resumes):
+    """ScriptRuntime.resume_script with the helpers compiled at setup"""
+    runtime.running = True
+    job = new_job(runtime)
+    for _ in range(resumes):
+        runtime.resume_script(job)
+    runtime.running = False
+
+
+def legacy_compile(runtime, runs):
+    load = runtime.lua.globals().load
+    for _ in range(runs):
+        load(SCRIPT)
+
+
+def cached_compile(runtime, runs):
+    for _ in range(runs):
+        runtime.compile_script(SCRIPT)
+
+
+def run(name, func, runtime, count, unit):
+    start = time.perf_counter()
+    func(runtime, count)
+    elapsed = time.perf_counter() - start
+    print(f"{name:15s} {elapsed * 1000:8.1f} ms  {elapsed / count * 1e6:8.2f} us/{unit}")
+    return elapsed
+
+
+def main():
+    resumes = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RESUMES
+    app = QCoreApplication(sys.argv)
+    runtime = ScriptRuntime(DeviceManager(), None)
+    try:
+        old = run("resume legacy", legacy_resume, runtime, resumes, "ack")
+        new = run("resume cached", cached_resume, runtime, resumes, "ack")
+        print(f"speedup         {old / new:.2f}x")
+        old = run("compile legacy", legacy_compile, runtime, COMPILES, "run")
+        new = run("compile cached", cached_compile, runtime, COMPILES, "run")
+        print(f"speedup         {old / new:.2f}x")
+    finally:
+        runtime.shutdown()
+
+
+if __name__ == '__main__':
+    main()
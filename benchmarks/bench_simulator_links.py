@@ -0,0 +1,70 @@
+"""
+Full-stack throughput: the asyncio client against RobotSimulator.
+
+Sends G93 position queries through each simulator link and reports replies
+per second, one at a time (stop-and-wait) and with a window of commands in
+flight. The loop:// link needs no OS port; the pty link needs a POSIX
+system; TCP uses a local port.
+
+    python benchmarks/bench_simulator_links.py [commands] [window]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import deltax_client as dx
+from simulator.robot_simulator import RobotSimulator
+
+DEFAULT_COMMANDS = 2000
+DEFAULT_WINDOW = 16
+LINKS = ['loop://bench', 'tcp://127.0.0.1:18799']
+if hasattr(os, 'openpty'):
+    LINKS.insert(1, 'pty')
+
+
+async def stop_and_wait(robot, commands):
+    for _ in range(commands):
+        await robot.get_position()
+
+
+async def windowed(robot, commands, window):
+    in_flight = set()
+    for _ in range(commands):
+        if len(in_flight) >= window:
+            _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        in_flight.add(asyncio.ensure_future(robot.get_position()))
+    await asyncio.gather(*in_flight)
+
+
+async def measure(port, commands, window):
+    robot = await dx.open_robot(port)
+    try:
+        results = []
+        for name, run in (("stop-and-wait", stop_and_wait(robot, commands)),
+                          (f"window {window}", windowed(robot, commands, window))):
+            start = time.perf_counter()
+            await run
+            results.append((name, time.perf_counter() - start))
+        return results
+    finally:
+        robot.close()
+
+
+def main():
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COMMANDS
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WINDOW
+    for link in LINKS:
+        simulator = RobotSimulator(port=link)
+        simulator.start()
+        try:
+            for name, elapsed in asyncio.run(measure(simulator.device_port, commands, window)):
+                print(f"{link.split(':')[0]:5s} {name:14s} {elapsed * 1000:8.1f} ms  "
+                      f"{commands / elapsed:8.0f} cmd/s")
+        finally:
+            simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Soak test: a continuous pick-and-place script against the robot simulator.
+
+Runs the script plugin against a RobotSimulator on a local TCP port for as
+long as asked. Every report interval it prints the process RSS, the Lua
+heap and the robot's ack latency, each with its drift from the first
+report. Memory that keeps climbing, or latency that creeps up, over hours
+is what this is for.
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/soak_script.py [hours] [report_seconds]
+"""
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+from components.device_manager import DeviceManager
+from components.memory_usage import process_rss
+from simulator.robot_simulator import RobotSimulator
+
+PORT = 18777
+DEFAULT_HOURS = 8
+DEFAULT_REPORT_SECONDS = 60
+WATCHDOG_SECONDS = 10
+
+SCRIPT = f"""
+set_continuous({WATCHDOG_SECONDS})
+local robot = get_device("Robot 1")
+robot:set_speed(2000)
+while true do
+    robot:move_to(0, 0, -750)
+    robot:move_to(0, 0, -800)
+    robot:set_output(0, true)
+    robot:move_to(100, 50, -750)
+    robot:move_to(100, 50, -800)
+    robot:set_output(0, false)
+    -- Short-lived garbage, as real cycle bookkeeping makes
+    local samples = {{}}
+    for i = 1, 100 do samples[i] = {{i, i * 2, tostring(i)}} end
+    heartbeat()
+end
+"""
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Soak:
+    def __init__(self, report_seconds):
+        self.manager = DeviceManager()
+        self.manager.add_device('robot')
+        self.robot = self.manager.devices[0]
+        self.plugin = self.manager.plugins['Script']
+        self.runtime = self.plugin.runtime
+        self.runtime.log_message.connect(lambda message: print(f"[script] {message}"))
+        self.runtime.channel.output.connect(self.console_line)
+        self.sent_at = None
+        self.latencies = []
+        self.acks = 0
+        self.baseline = None
+        self.started = time.monotonic()
+        self.report_timer = QTimer()
+        self.report_timer.timeout.connect(self.report)
+        self.report_timer.start(int(report_seconds * 1000))
+
+    def console_line(self, line, device):
+        # Stop-and-wait: each "Sent" is answered by the next "Received"
+        if line.startswith("Sent:"):
+            self.sent_at = time.perf_counter()
+        elif line.startswith("Received:") and self.sent_at is not None:
+            self.latencies.append(time.perf_counter() - self.sent_at)
+            self.sent_at = None
+            self.acks += 1
+
+    def start(self):
+        self.robot.transport.connect_port(f'127.0.0.1:{PORT}')
+        QTimer.singleShot(500, lambda: self.runtime.run(SCRIPT))
+
+    def report(self):
+        latencies, self.latencies = self.latencies, []
+        rss = (process_rss() or 0) / 2**20
+        lua = self.runtime.lua_memory / 2**20
+        p50 = percentile(latencies, 0.5) * 1000 if latencies else 0.0
+        p95 = percentile(latencies, 0.95) * 1000 if latencies else 0.0
+        if self.baseline is None:
+            self.baseline = (rss, lua, p50, p95)
+        base_rss, base_lua, base_p50, base_p95 = self.baseline
+        elapsed = (time.monotonic() - self.started) / 3600
+        print(f"{elapsed:6.2f} h  acks {self.acks:9d}  running {self.runtime.running!s:5s}  "
+              f"rss {rss:7.1f} MB ({rss - base_rss:+6.1f})  lua {lua:6.2f} MB ({lua - base_lua:+5.2f})  "
+              f"ack p50 {p50:6.2f} ms ({p50 - base_p50:+5.2f})  p95 {p95:6.2f} ms ({p95 - base_p95:+5.2f})",
+              flush=True)
+
+    def finish(self):
+        self.report()
+        self.plugin.cleanup()
+        self.robot.transport.disconnect_port()
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_HOURS
+    report_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_REPORT_SECONDS
+    app = QApplication(sys.argv)
+    simulator = RobotSimulator(port=f'tcp://127.0.0.1:{PORT}')
+    simulator.start()
+    soak = Soak(report_seconds)
+    soak.start()
+
+    # Let Ctrl+C through the Qt event loop
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    wakeup = QTimer()
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(200)
+    QTimer.singleShot(int(hours * 3600 * 1000), app.quit)
+    try:
+        app.exec_()
+    finally:
+        soak.finish()
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
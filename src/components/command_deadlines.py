@@ -0,0 +1,46 @@
+"""
+How long each command may wait for its acknowledgement
+"""
+import re
+
+# Default timeouts (seconds) by command class. The longest matching prefix wins.
+DEFAULT_COMMAND_TIMEOUTS = {
+    '': 5.0,  # Anything not listed below
+    'G': 10.0,  # Motion
+    'G28': 30.0,  # Homing
+    'M': 2.0,  # Configuration and I/O
+}
+
+DWELL_PATTERN = re.compile(r'\bP(\d*\.?\d+)')
+
+
+class CommandTimeouts:
+    """Looks up how long a command may stay unacknowledged"""
+
+    def __init__(self, timeouts=None):
+        self.timeouts = dict(DEFAULT_COMMAND_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+    def set(self, prefix, seconds):
+        """Set the timeout for every command starting with prefix"""
+        if seconds <= 0:
+            raise ValueError("Timeout must be positive")
+        self.timeouts[prefix.strip().upper()] = float(seconds)
+
+    def get(self, command):
+        """Timeout in seconds for a command"""
+        code = command.strip().upper()
+        word = code.split(' ', 1)[0]
+        best = ''
+        for prefix in self.timeouts:
+            if len(prefix) > len(best) and word.startswith(prefix):
+                best = prefix
+        timeout = self.timeouts[best]
+        # A dwell takes as long as it asks for on top of the normal timeout
+        if word in ('G4', 'G04'):
+            match = DWELL_PATTERN.search(code)
+            if match:
+                timeout += float(match.group(1)) / 1000
+        return timeout
+
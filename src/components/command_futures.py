@@ -0,0 +1,213 @@
+"""
+Futures for commands sent to a device, resolved by the reply they wait for
+"""
+import time
+import traceback
+from collections import deque
+
+from .command_deadlines import CommandTimeouts
+from .line_framer import (FRAME_OK, FRAME_POSITION, FRAME_INPUT, FRAME_ENCODER, FRAME_ERROR,
+                          FRAME_TEXT)
+
+# Future states
+PENDING = 'pending'
+DONE = 'done'  # Got the reply it was waiting for
+FAILED = 'failed'  # The device answered with an error
+TIMED_OUT = 'timeout'
+CANCELLED = 'cancelled'  # Link closed before the reply came
+NOT_SENT = 'not_sent'  # Device was not connected
+
+# Commands answered with data instead of "Ok": command word -> frame kind
+VALUE_REPLIES = {
+    'G93': FRAME_POSITION,  # "x,y,z"
+    'M7': FRAME_INPUT,  # One "I3 V1" / "A2 V2478" line per requested pin
+    'M07': FRAME_INPUT,
+    'M317': FRAME_ENCODER,  # "P0:5.32"; only without arguments (T/R answer "Ok")
+    'M319': FRAME_INPUT,  # Conveyor "M319 V1" -> "I1 V1"; other forms answer "Ok"
+}
+
+# Queries answered with lines of text: command word -> number of lines
+TEXT_REPLIES = {
+    'M49': 5,  # Ports config, one line per port
+    'M52': 1,  # "MAC add: ..."
+    'M53': 1,  # "IP: ..."
+    'M54': 1,  # "DNS IP: ..."
+    'M57': 1,  # Robot IP
+    'M220': 1,  # "F:2000 A:4000 J:800000 S:30 E:30"
+}
+
+# Queries answered with lines of text followed by "Ok"
+COLLECT_TEXT_REPLIES = frozenset(('M397', 'M398'))
+
+
+def expected_reply(command):
+    """(frame kind, number of frames) a command is answered with"""
+    words = command.strip().upper().split()
+    if not words:
+        return FRAME_OK, 1
+    if words[0] in TEXT_REPLIES:
+        return FRAME_TEXT, TEXT_REPLIES[words[0]]
+    kind = VALUE_REPLIES.get(words[0], FRAME_OK)
+    if words[0] == 'M319':
+        return (kind, 1) if len(words) > 1 and words[1][:1] == 'V' and words[1][1:] else (FRAME_OK, 1)
+    if kind == FRAME_INPUT:
+        pins = sum(1 for word in words[1:] if word[:1] in ('I', 'A'))
+        return kind, max(1, pins)
+    if kind == FRAME_ENCODER and len(words) > 1:
+        return FRAME_OK, 1
+    return kind, 1
+
+
+class CommandFuture:
+    """Handle for one command, resolved by its reply.
+
+    value holds the parsed payload (a position tuple, an (pin, value) pair
+    or a list of them for multi-pin M7, an encoder reading) and response
+    the reply text (every line of it for multi-line queries such as
+    M397). Callbacks added with add_done_callback run once the
+    future settles, or at once if it already has. The future is true if
+    the command went out, so "if device.send_command(...)" keeps working.
+    """
+
+    def __init__(self, command, expect=None, count=None):
+        self.command = command
+        default_expect, default_count = expected_reply(command)
+        self.expect = expect if expect is not None else default_expect
+        self.remaining = count if count is not None else (default_count if expect is None else 1)
+        # Keep text lines that arrive before the expected reply
+        words = command.upper().split()
+        self.collect_text = expect is None and bool(words) and words[0] in COLLECT_TEXT_REPLIES
+        self.frames = []
+        self.state = PENDING
+        self.error = None
+        self.sent_time = time.monotonic()
+        self.timeout = None
+        self.deadline = None
+        self.callbacks = []
+
+    def __bool__(self):
+        return self.state != NOT_SENT
+
+    def __repr__(self):
+        return f"CommandFuture({self.command!r}, {self.state})"
+
+    def done(self):
+        return self.state != PENDING
+
+    def succeeded(self):
+        return self.state == DONE
+
+    @property
+    def response(self):
+        """Reply text, or the error for a failed command"""
+        if self.frames:
+            return "\n".join(frame.text for frame in self.frames)
+        return self.error
+
+    @property
+    def value(self):
+        if not self.frames:
+            return None
+        if len(self.frames) == 1:
+            return self.frames[0].value
+        return [frame.value for frame in self.frames]
+
+    def add_done_callback(self, callback):
+        if self.done():
+            self._call(callback)
+        else:
+            self.callbacks.append(callback)
+
+    def add_frame(self, frame):
+        """Take one matching reply; True once the future is complete"""
+        self.frames.append(frame)
+        self.remaining -= 1
+        if self.remaining > 0:
+            return False
+        self.settle(DONE)
+        return True
+
+    def settle(self, state, error=None):
+        if self.done():
+            return
+        self.state = state
+        self.error = error
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            self._call(callback)
+
+    def _call(self, callback):
+        # Callbacks run inside Qt slots / asyncio callbacks, where an exception
+        # would abort the app or be lost
+        try:
+            callback(self)
+        except Exception:
+            traceback.print_exc()
+
+
+class PendingReplies:
+    """Futures waiting on one device, oldest first.
+
+    Devices answer in order, so a reply can only belong to the oldest
+    command. Frames of other kinds (auto feedback, free text) pass by; an
+    error fails the oldest command. Only the oldest command's clock runs:
+    a command's timeout starts once everything ahead of it is answered.
+    """
+
+    def __init__(self, timeouts=None):
+        self.timeouts = timeouts if timeouts is not None else CommandTimeouts()
+        self.queue = deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, future, timeout=None):
+        future.timeout = timeout if timeout is not None else self.timeouts.get(future.command)
+        self.queue.append(future)
+        if len(self.queue) == 1:
+            self._arm_head()
+
+    def _arm_head(self):
+        if self.queue:
+            head = self.queue[0]
+            if head.deadline is None:
+                head.deadline = max(head.sent_time, time.monotonic()) + head.timeout
+
+    def _pop(self):
+        future = self.queue.popleft()
+        self._arm_head()
+        return future
+
+    def match(self, frame):
+        """Offer a received frame to the oldest command; returns the future it settled"""
+        if not self.queue:
+            return None
+        head = self.queue[0]
+        if frame.kind == FRAME_ERROR:
+            self._pop().settle(FAILED, frame.text)
+            return head
+        if frame.kind == head.expect:
+            if head.add_frame(frame):
+                self._pop()
+                return head
+        elif frame.kind == FRAME_TEXT and head.collect_text:
+            head.frames.append(frame)
+        return None
+
+    def next_deadline(self):
+        return self.queue[0].deadline if self.queue else None
+
+    def expire(self, now=None):
+        """Time out commands whose deadline has passed; returns them"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self.queue and self.queue[0].deadline <= now:
+            future = self._pop()
+            future.settle(TIMED_OUT, f"Timeout waiting for reply to {future.command}")
+            expired.append(future)
+        return expired
+
+    def cancel_all(self, reason):
+        futures, self.queue = self.queue, deque()
+        for future in futures:
+            future.settle(CANCELLED, reason)
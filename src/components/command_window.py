@@ -0,0 +1,137 @@
+"""
+In-flight command window for streaming G-code to a device
+"""
+from collections import deque
+import time
+
+# Window modes
+MODE_STOP_AND_WAIT = "stop_and_wait"  # One command at a time (safe default)
+MODE_COUNT = "count"  # Up to N commands in flight
+MODE_BYTES = "bytes"  # GRBL-style character counting against the RX buffer
+
+STREAM_MODES = (MODE_STOP_AND_WAIT, MODE_COUNT, MODE_BYTES)
+
+DEFAULT_WINDOW_SIZE = 4  # Commands in flight for count mode
+DEFAULT_RX_BUFFER = 128  # Firmware serial receive buffer (bytes)
+GROW_AFTER_ACKS = 8  # Successful acks needed before the window grows again
+
+
+class InFlightCommand:
+    """A command that was sent and is waiting for its acknowledgement"""
+    __slots__ = ('seq', 'command', 'size', 'sent_time')
+
+    def __init__(self, seq, command, size, sent_time):
+        self.seq = seq
+        self.command = command
+        self.size = size
+        self.sent_time = sent_time
+
+
+class CommandWindow:
+    """Tracks commands in flight on one device and decides when more may be sent.
+
+    Acknowledgements are matched to commands in send order. The window
+    halves on errors and timeouts and grows back slowly on successful acks.
+    """
+
+    def __init__(self, mode=MODE_STOP_AND_WAIT, window_size=DEFAULT_WINDOW_SIZE,
+                 rx_buffer=DEFAULT_RX_BUFFER):
+        self.configure(mode, window_size, rx_buffer)
+        self.in_flight = deque()
+        self.bytes_in_flight = 0
+        self.next_seq = 0
+        self.acks_since_shrink = 0
+
+    def configure(self, mode, window_size, rx_buffer):
+        """Change mode and limits; commands already in flight are kept"""
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Unknown stream mode: {mode}")
+        self.mode = mode
+        self.max_window = max(1, int(window_size))
+        self.max_bytes = max(1, int(rx_buffer))
+        self.window_size = self.max_window
+        self.byte_budget = self.max_bytes
+
+    def __len__(self):
+        return len(self.in_flight)
+
+    @staticmethod
+    def command_size(command):
+        """Bytes the command occupies in the firmware buffer, newline included"""
+        return len(command.encode()) + 1
+
+    def can_send(self, command):
+        """Check if the command fits in the window right now"""
+        # An empty window always accepts one command so nothing can stall
+        if not self.in_flight:
+            return True
+        if self.mode == MODE_STOP_AND_WAIT:
+            return False
+        if self.mode == MODE_COUNT:
+            return len(self.in_flight) < self.window_size
+        return self.bytes_in_flight + self.command_size(command) <= self.byte_budget
+
+    def push(self, command, seq=None):
+        """Record a command as sent and return its in-flight entry"""
+        if seq is None:
+            seq = self.next_seq
+            self.next_seq += 1
+        entry = InFlightCommand(seq, command, self.command_size(command), time.monotonic())
+        self.in_flight.append(entry)
+        self.bytes_in_flight += entry.size
+        return entry
+
+    def _pop(self):
+        if not self.in_flight:
+            return None
+        entry = self.in_flight.popleft()
+        self.bytes_in_flight -= entry.size
+        return entry
+
+    def ack(self):
+        """Match an "Ok" to the oldest command in flight"""
+        entry = self._pop()
+        if entry is not None:
+            self.acks_since_shrink += 1
+            if self.acks_since_shrink >= GROW_AFTER_ACKS:
+                self.acks_since_shrink = 0
+                self.window_size = min(self.max_window, self.window_size + 1)
+                self.byte_budget = min(self.max_bytes, self.byte_budget * 2)
+        return entry
+
+    def fail(self):
+        """Match an error response to the oldest command and shrink the window"""
+        entry = self._pop()
+        self.shrink()
+        return entry
+
+    def head(self):
+        """Oldest command in flight, the one the device acks next"""
+        return self.in_flight[0] if self.in_flight else None
+
+    def drop(self, seq):
+        """Drop a timed-out command, and any still ahead of it, then shrink the window"""
+        if not any(entry.seq == seq for entry in self.in_flight):
+            return []
+        dropped = []
+        while True:
+            entry = self._pop()
+            dropped.append(entry)
+            if entry.seq == seq:
+                break
+        self.shrink()
+        return dropped
+
+    def shrink(self):
+        """Halve the window after an error or timeout"""
+        self.acks_since_shrink = 0
+        self.window_size = max(1, self.window_size // 2)
+        self.byte_budget = max(1, self.byte_budget // 2)
+
+    def clear(self):
+        """Forget everything in flight and restore the full window"""
+        self.in_flight.clear()
+        self.bytes_in_flight = 0
+        self.acks_since_shrink = 0
+        self.window_size = self.max_window
+        self.byte_budget = self.max_bytes
@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                            QLabel, QComboBox, QListWidget, QMenu, QMessageBox,
                            QStackedWidget, QTabWidget, QListWidgetItem, QSplitter,
-                           QTextEdit)
+                           QCheckBox)
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtSerialPort import QSerialPortInfo
 import sys
@@ -16,13 +16,19 @@ from .robot_control import RobotControl
 from .conveyor_control import ConveyorControl
 from .encoder_control import EncoderControl
 from .mcu_control import MCUControl
+from .log_console import LogConsole
+from .response_router import ResponseRouter
 
 class DeviceManager(QWidget):
     log_message = pyqtSignal(str)
+    device_removed = pyqtSignal(object)  # The device, before it is deleted
 
     def __init__(self):
         super().__init__()
         self.devices = []  # List of all devices
+        self.device_names = {}  # device -> name shown in the list
+        self.devices_by_name = {}  # name -> device
+        self.router = ResponseRouter()  # Replies -> subscribed plugins
         self.plugins = {}  # Dictionary of loaded plugins
         self.init_ui()
         self.load_plugins()
@@ -40,11 +46,17 @@ class DeviceManager(QWidget):
         add_btn.clicked.connect(self.show_add_menu)
         left_layout.addWidget(add_btn)
         
+        # Auto-connect every identifiable device in one probe pass
+        auto_connect_btn = QPushButton("Auto Connect All")
+        auto_connect_btn.clicked.connect(self.auto_connect_all)
+        left_layout.addWidget(auto_connect_btn)
+        
         # Device list
         self.device_list = QListWidget()
         self.device_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.device_list.customContextMenuRequested.connect(self.show_context_menu)
         self.device_list.currentItemChanged.connect(self.device_selected)
+        self.device_list.itemChanged.connect(self.device_renamed)
         left_layout.addWidget(self.device_list)
         
         # Set fixed width for left panel
@@ -64,11 +76,18 @@ class DeviceManager(QWidget):
         log_layout = QVBoxLayout(log_widget)
         log_layout.setContentsMargins(0, 0, 0, 0)  # Remove margins
         
+        log_header = QHBoxLayout()
         log_label = QLabel("Communication Log")
-        log_layout.addWidget(log_label)
+        log_header.addWidget(log_label)
+        log_header.addStretch()
+        
+        # Keep a full record on disk; the view itself is bounded and rate-limited
+        self.save_log_cb = QCheckBox("Save to file")
+        self.save_log_cb.stateChanged.connect(self.toggle_log_file)
+        log_header.addWidget(self.save_log_cb)
+        log_layout.addLayout(log_header)
         
-        self.log_display = QTextEdit()
-        self.log_display.setReadOnly(True)
+        self.log_display = LogConsole()
         self.log_display.setMaximumHeight(150)
         log_layout.addWidget(self.log_display)
         
@@ -103,7 +122,6 @@ class DeviceManager(QWidget):
         
         # Connect plugin signals
         for plugin in self.plugins.values():
-            plugin.command_sent.connect(self.handle_plugin_command)
             plugin.log_message.connect(self.log_message.emit)
 
     def add_plugin(self, plugin):
@@ -111,17 +129,37 @@ class DeviceManager(QWidget):
         self.plugins[plugin.name] = plugin
         # Note: We don't add the plugin to our UI anymore, 
         # it will be added to the main window's plugin panel
+        for device, keys in plugin.response_routes:
+            self.router.subscribe(plugin.handle_response, device, keys)
         plugin.initialize()
 
+    def toggle_log_file(self, state):
+        if state:
+            path = self.log_display.enable_file_log()
+            self.log_message.emit(f"Saving log to {path}")
+        else:
+            self.log_display.disable_file_log()
+
+    def get_device(self, name):
+        """Device shown under name, or None"""
+        return self.devices_by_name.get(name)
+
     def get_plugins(self):
         """Return all loaded plugins"""
         return self.plugins.values()
 
-    def handle_plugin_command(self, command, device):
-        """Handle command from plugin to device"""
+    def handle_plugin_command(self, command, device, timeout=None):
+        """Send a command from a plugin to a device; returns the device's CommandFuture"""
         if hasattr(device, 'send_command'):
-            device.send_command(command)
+            return device.send_command(command, timeout=timeout)
+        return None
         
+    def auto_connect_all(self):
+        """Start auto-connect on every disconnected device that answers an identity query"""
+        for device in self.devices:
+            if device.transport.identity and not device.transport.is_active():
+                device.start_auto_connect()
+
     def show_add_menu(self):
         menu = QMenu(self)
         robot_action = menu.addAction("Add Robot")
@@ -144,20 +182,25 @@ class DeviceManager(QWidget):
         # Create device
         if device_type == 'robot':
             device = RobotControl()
-            name = f"Robot {sum(1 for d in self.devices if isinstance(d, RobotControl)) + 1}"
+            name = self.unused_name("Robot")
         elif device_type == 'conveyor':
             device = ConveyorControl()
-            name = f"Conveyor {sum(1 for d in self.devices if isinstance(d, ConveyorControl)) + 1}"
+            name = self.unused_name("Conveyor")
         elif device_type == 'encoder':
             device = EncoderControl()
-            name = f"Encoder {sum(1 for d in self.devices if isinstance(d, EncoderControl)) + 1}"
+            name = self.unused_name("Encoder")
         else:  # mcu
             device = MCUControl()
-            name = f"MCU {sum(1 for d in self.devices if isinstance(d, MCUControl)) + 1}"
+            name = self.unused_name("MCU")
+        
+        # Remember ports under the device's name so each one finds its own port again
+        device.transport.name = name
+        self.device_names[device] = name
+        self.devices_by_name[name] = device
         
-        # Connect device signals
-        device.log_message.connect(self.log_message.emit)
-        device.response_received.connect(self.handle_device_response)
+        # Connect device signals; each device is rate-limited on its own in the log
+        device.log_message.connect(lambda message, device=device: self.log_display.append(message, device))
+        device.frame_received.connect(self.handle_device_response)
         
         # Add to devices list
         self.devices.append(device)
@@ -173,21 +216,36 @@ class DeviceManager(QWidget):
         # Select the new device
         self.device_list.setCurrentItem(item)
 
-    def handle_device_response(self, response, device):
-        """Handle response from device and forward to plugins"""
-        # Display response in log
-        device_name = "Unknown Device"
-        for i in range(self.device_list.count()):
-            item = self.device_list.item(i)
-            if item.device == device:
-                device_name = item.text()
-                break
-        
-        self.log_message.emit(f"{device_name}: {response}")
-        
-        # Forward response to plugins
-        for plugin in self.plugins.values():
-            plugin.handle_response(response, device)
+    def unused_name(self, prefix):
+        """First of "<prefix> 1", "<prefix> 2", ... that no device is called"""
+        number = 1
+        while f"{prefix} {number}" in self.devices_by_name:
+            number += 1
+        return f"{prefix} {number}"
+
+    def handle_device_response(self, frame, device):
+        """Log a response and hand it to the plugins subscribed to it"""
+        device_name = self.device_names.get(device, "Unknown Device")
+        self.log_display.append(f"{device_name}: {frame.text}", device)
+        self.router.dispatch(frame, device)
+
+    def device_renamed(self, item):
+        device = getattr(item, 'device', None)
+        if device is None or device not in self.device_names:
+            return
+        name = item.text()
+        old_name = self.device_names[device]
+        if name == old_name:
+            return
+        if name in self.devices_by_name:
+            # Names must stay unique for get_device()
+            self.log_message.emit(f"A device named {name} already exists")
+            item.setText(old_name)
+            return
+        del self.devices_by_name[old_name]
+        self.device_names[device] = name
+        self.devices_by_name[name] = device
+        device.transport.name = name
 
     def device_selected(self, current, previous):
         if current and hasattr(current, 'device'):
@@ -214,11 +272,15 @@ class DeviceManager(QWidget):
             device = item.device
             # Remove from devices list
             self.devices.remove(device)
+            self.devices_by_name.pop(self.device_names.pop(device, None), None)
+            self.router.remove_device(device)
+            self.log_display.forget_source(device)
             # Remove from stack
             self.stack.removeWidget(device)
             # Remove from list
             self.device_list.takeItem(self.device_list.row(item))
             # Delete the device
+            self.device_removed.emit(device)
             device.deleteLater()
             
             # Set stack to first page if no devices left
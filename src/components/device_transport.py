@@ -0,0 +1,508 @@
+"""
+Widget-free serial / TCP transport shared by all device classes
+"""
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QTcpSocket
+from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
+
+from .command_futures import CommandFuture, PendingReplies, NOT_SENT
+from .line_framer import LineFramer, FRAME_TEXT
+from .port_cache import port_key, parse_address
+
+DEFAULT_BAUD_RATE = 115200
+PROBE_TIMEOUT = 1000  # ms to wait for an identity reply
+AUTO_CONNECT_INTERVAL = 2000  # ms between auto-connect rounds
+RECONNECT_INTERVAL = 2000  # ms before the first reconnect attempt after a lost port
+MAX_RECONNECT_INTERVAL = 30000  # ms; reconnect attempts back off up to this
+# Robot port numbers for M100 C: where auto feedback is sent
+FEEDBACK_PORT_USB = 0
+FEEDBACK_PORT_RJ45 = 4
+
+# Identity handshakes: device type -> (query, expected reply)
+DEVICE_IDENTITIES = {
+    'robot': ("IsDelta", "YesDelta"),
+    'conveyor': ("IsXConveyor", "YesXConveyor"),
+    'encoder': ("IsXEncoder", "YesXEncoder"),
+}
+
+
+def list_ports(physical_only=True):
+    """Names of available serial ports, optionally only USB/physical ones"""
+    names = []
+    for port in QSerialPortInfo.availablePorts():
+        if (not physical_only or
+                port.hasProductIdentifier() or
+                port.hasVendorIdentifier() or
+                (port.portName().startswith("COM") and port.portName() != "COM1")):
+            names.append(port.portName())
+    return names
+
+
+def port_keys(port_names):
+    """Stable cache keys for port names"""
+    return {name: port_key(QSerialPortInfo(name)) for name in port_names}
+
+
+class DeviceTransport(QObject):
+    """Owns one device link: open/close, line framing, buffered writes,
+    reconnect and the identity handshake. Has no QWidget dependency, so
+    devices can be driven from a headless QCoreApplication.
+
+    The link is a serial port, or a TCP socket to the device's RJ45 port
+    when connect_port is given a host:port address.
+    """
+    frame_received = pyqtSignal(object)  # One classified line (a line_framer.Frame)
+    connection_changed = pyqtSignal(bool)  # Connected / disconnected
+    auto_connect_failed = pyqtSignal()  # No port answered the identity query
+    connect_failed = pyqtSignal()  # A TCP connection could not be established
+    log_message = pyqtSignal(str)
+
+    def __init__(self, device_type=None, label="device", connect_commands=None,
+                 baud_rate=DEFAULT_BAUD_RATE, parent=None):
+        super().__init__(parent)
+        self.device_type = device_type
+        self.label = label
+        self.name = label  # Name the device is remembered under in the port cache
+        self.identity = DEVICE_IDENTITIES.get(device_type)
+        self.connect_commands = list(connect_commands or [])
+        self.baud_rate = baud_rate
+
+        self.serial_port = QSerialPort(self)
+        self.serial_port.readyRead.connect(self.read_data)
+        self.serial_port.errorOccurred.connect(self.handle_error)
+        self.io = self.serial_port  # Device that reads and writes go through
+
+        # TCP link, created on first use and kept for reconnects
+        self.socket = None
+        self.address = None  # (host, port) while the TCP link is in use
+        self.framer = LineFramer()
+        self.write_buffer = bytearray()
+        self.flush_scheduled = False
+        self.connected = False
+        self.last_command = None
+
+        # Commands waiting for their reply, timed out by one timer
+        self.pending = PendingReplies()
+        self.reply_timer = QTimer(self)
+        self.reply_timer.setSingleShot(True)
+        self.reply_timer.timeout.connect(self.expire_replies)
+
+        # Auto-connect state
+        self.searching = False  # Checking a known port or waiting on the shared port prober
+        self.checking_cached = False
+        self.probing = False
+        self.ports_to_test = []
+        self.current_test_port = None
+        self.auto_connect_timer = QTimer(self)
+        self.auto_connect_timer.timeout.connect(self.try_auto_connect)
+        self.port_response_timer = QTimer(self)
+        self.port_response_timer.setSingleShot(True)
+        self.port_response_timer.timeout.connect(self.port_timeout)
+
+        # Reconnect after the link drops (e.g. USB cable pulled), backing off between attempts
+        self.reconnect_port = None
+        self.reconnect_attempts = 0
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.try_reconnect)
+
+    # Connection
+
+    def is_open(self):
+        if self.address is not None:
+            return self.socket.state() == QAbstractSocket.ConnectedState
+        return self.serial_port.isOpen()
+
+    def is_active(self):
+        """Connected, or busy searching for / connecting / reconnecting to the device"""
+        return (self.serial_port.isOpen() or self.address is not None or self.searching or
+                self.auto_connect_timer.isActive() or self.reconnect_timer.isActive())
+
+    def port_name(self):
+        if self.address is not None:
+            return "%s:%d" % self.address
+        return self.serial_port.portName()
+
+    def feedback_port(self):
+        """Robot port (M100 C) that reaches this link: RJ45 over TCP, else USB"""
+        return FEEDBACK_PORT_RJ45 if self.address is not None else FEEDBACK_PORT_USB
+
+    def open_port(self, port_name, baud_rate=None):
+        """Open a port without marking the device connected"""
+        self.close_socket()
+        if self.serial_port.isOpen():
+            self.serial_port.close()
+        self.cancel_replies("Port reopened")
+        self.framer.clear()
+        self.write_buffer.clear()
+        if baud_rate is not None:
+            self.baud_rate = baud_rate
+        self.serial_port.setPortName(port_name)
+        self.serial_port.setBaudRate(self.baud_rate)
+        return self.serial_port.open(QSerialPort.ReadWrite)
+
+    def connect_port(self, port_name, baud_rate=None):
+        """Open a port chosen by the user and mark the device connected.
+
+        For a host:port address this only starts connecting; connection_changed
+        or connect_failed follows.
+        """
+        self.stop_auto_connect()
+        self.reconnect_timer.stop()
+        address = parse_address(port_name)
+        if address is not None:
+            return self.connect_socket(address)
+        self.close_socket()
+        try:
+            if not self.open_port(port_name, baud_rate):
+                self.log_message.emit(f"Failed to open port {port_name}")
+                return False
+        except Exception as e:
+            self.log_message.emit(f"Error: {str(e)}")
+            return False
+        self.log_message.emit(f"Connected to {port_name} at {self.baud_rate} baud")
+        self.set_connected(True)
+        return True
+
+    def disconnect_port(self):
+        """Close the port on user request; no reconnect is attempted"""
+        self.stop_auto_connect()
+        self.reconnect_timer.stop()
+        self.reconnect_port = None
+        self.close_socket()
+        self.serial_port.close()
+        self.log_message.emit("Disconnected")
+        self.set_connected(False)
+
+    def set_connected(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if not connected:
+            self.cancel_replies("Disconnected")
+        self.connection_changed.emit(connected)
+        if connected:
+            self.reconnect_attempts = 0
+            for command in self.connect_commands:
+                self.send(command)
+
+    def handle_error(self, error):
+        """Close the port and start reconnecting when the device goes away"""
+        if error != QSerialPort.ResourceError or not self.connected or self.address is not None:
+            return
+        port_name = self.serial_port.portName()
+        self.log_message.emit(f"Lost connection to {port_name}")
+        self.serial_port.close()
+        self.set_connected(False)
+        self.reconnect_port = port_name
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self):
+        """Arm the next reconnect attempt, doubling the wait each time"""
+        delay = min(RECONNECT_INTERVAL * 2 ** self.reconnect_attempts, MAX_RECONNECT_INTERVAL)
+        self.reconnect_attempts += 1
+        self.reconnect_timer.start(delay)
+
+    def try_reconnect(self):
+        if self.reconnect_port is None or self.is_open():
+            return
+        if self.address is not None:
+            self.socket.connectToHost(*self.address)
+            return
+        if not self.open_port(self.reconnect_port):
+            self.schedule_reconnect()
+            return
+        if self.identity:
+            # Confirm the same device came back before reporting it connected
+            self.current_test_port = self.reconnect_port
+            self.probing = True
+            self.send(self.identity[0], expect=FRAME_TEXT)
+            self.port_response_timer.start(PROBE_TIMEOUT)
+        else:
+            self.log_message.emit(f"Reconnected to {self.reconnect_port}")
+            self.set_connected(True)
+
+    # Auto-connect
+
+    def start_auto_connect(self, ports=None):
+        """Find the device among ports.
+
+        Devices with an identity query are looked up by the shared prober,
+        which tests every port in parallel; others take the first port
+        that opens.
+        """
+        from .port_prober import shared_prober
+
+        self.ports_to_test = list(ports) if ports is not None else list_ports()
+        if not self.ports_to_test:
+            self.log_message.emit("No COM ports available")
+            self.auto_connect_failed.emit()
+            return False
+        if self.identity is None:
+            self.auto_connect_timer.start(AUTO_CONNECT_INTERVAL)
+            self.try_next_port()
+            return True
+        self.searching = True
+        cache = shared_prober().cache
+        port_name = cache.find_port(port_keys(self.ports_to_test), self.device_type, self.name)
+        if port_name is not None and self.open_port(port_name):
+            # Known port: one handshake instead of a full probe
+            self.log_message.emit(f"Checking known port {port_name} for {self.label}...")
+            self.checking_cached = True
+            self.current_test_port = port_name
+            self.probing = True
+            self.send(self.identity[0], expect=FRAME_TEXT)
+            self.port_response_timer.start(PROBE_TIMEOUT)
+            return True
+        self.start_probe()
+        return True
+
+    def start_probe(self):
+        """Hand the search over to the shared prober"""
+        from .port_prober import shared_prober
+
+        self.log_message.emit(f"Probing {len(self.ports_to_test)} ports for {self.label}...")
+        self.searching = True
+        shared_prober().request(self, self.ports_to_test)
+
+    def probe_finished(self, port_name):
+        """Result of a prober pass: the port that answered as this device, or None"""
+        if not self.searching:
+            return
+        self.searching = False
+        self.ports_to_test = []
+        if port_name is None:
+            self.log_message.emit(f"Auto-connect: No {self.label} found")
+            self.auto_connect_failed.emit()
+            return
+        if not self.open_port(port_name):
+            self.log_message.emit(f"Failed to open port {port_name}")
+            self.auto_connect_failed.emit()
+            return
+        self.reconnect_port = None
+        self.log_message.emit(f"{self.label} detected on {port_name}!")
+        self.remember_port()
+        self.set_connected(True)
+
+    def try_auto_connect(self):
+        """Periodic check for auto-connect status"""
+        if not self.connected and not self.port_response_timer.isActive():
+            self.try_next_port()
+
+    def try_next_port(self):
+        """Try connecting to the next available port"""
+        if not self.ports_to_test:
+            self.stop_auto_connect()
+            self.log_message.emit(f"Auto-connect: No {self.label} found")
+            self.auto_connect_failed.emit()
+            return
+        self.current_test_port = self.ports_to_test.pop(0)
+        if not self.open_port(self.current_test_port):
+            self.log_message.emit(f"Failed to open port {self.current_test_port}")
+            self.try_next_port()
+            return
+        self.log_message.emit(f"Testing port {self.current_test_port}...")
+        if self.identity is None:
+            # Nothing to ask: the first port that opens is the device
+            self.stop_auto_connect()
+            self.set_connected(True)
+            return
+        self.probing = True
+        self.send(self.identity[0], expect=FRAME_TEXT)
+        self.port_response_timer.start(PROBE_TIMEOUT)
+
+    def port_timeout(self):
+        """Called when no response is received from current port within timeout period"""
+        self.probing = False
+        self.cancel_replies("No response")
+        if self.serial_port.isOpen():
+            self.serial_port.close()
+        self.log_message.emit(f"No response from {self.current_test_port}")
+        if self.checking_cached:
+            # The cached entry is stale; fall back to probing every port
+            from .port_prober import shared_prober
+
+            self.checking_cached = False
+            shared_prober().cache.forget(port_key(QSerialPortInfo(self.current_test_port)))
+            self.start_probe()
+        elif self.reconnect_port is not None:
+            self.schedule_reconnect()
+        else:
+            self.try_next_port()
+
+    def stop_auto_connect(self):
+        """Stop all auto-connect related timers"""
+        was_running = (self.searching or self.auto_connect_timer.isActive() or
+                       self.port_response_timer.isActive())
+        if self.searching:
+            from .port_prober import shared_prober
+            shared_prober().cancel(self)
+            self.searching = False
+        self.checking_cached = False
+        self.auto_connect_timer.stop()
+        self.port_response_timer.stop()
+        self.probing = False
+        self.ports_to_test = []
+        if was_running:
+            self.log_message.emit("Auto-connect stopped")
+
+    def identity_confirmed(self):
+        """The port under test answered the identity query"""
+        self.port_response_timer.stop()
+        self.auto_connect_timer.stop()
+        self.searching = False
+        self.checking_cached = False
+        self.probing = False
+        self.ports_to_test = []
+        self.reconnect_port = None
+        self.log_message.emit(f"{self.label} detected on {self.serial_port.portName()}!")
+        self.set_connected(True)
+
+    def remember_port(self):
+        """Store the open port in the port cache under this device"""
+        from .port_prober import shared_prober
+
+        if self.address is not None:
+            return  # Network devices are addressed explicitly
+        key = port_key(QSerialPortInfo(self.serial_port.portName()))
+        shared_prober().cache.remember(key, self.device_type, self.name)
+
+    # TCP
+
+    def connect_socket(self, address):
+        """Start connecting to a device's Ethernet port"""
+        if self.serial_port.isOpen():
+            self.serial_port.close()
+        if self.socket is None:
+            self.socket = QTcpSocket(self)
+            self.socket.connected.connect(self.socket_connected)
+            self.socket.disconnected.connect(self.socket_lost)
+            self.socket.errorOccurred.connect(self.socket_error)
+            self.socket.readyRead.connect(self.read_data)
+        self.address = None  # Not a lost link: ignore the abort below
+        self.socket.abort()
+        self.io = self.socket
+        self.address = address
+        self.reconnect_port = None
+        self.reconnect_attempts = 0
+        self.cancel_replies("Port reopened")
+        self.framer.clear()
+        self.write_buffer.clear()
+        self.log_message.emit(f"Connecting to {self.port_name()}...")
+        self.socket.connectToHost(*address)
+        return True
+
+    def close_socket(self):
+        if self.address is None:
+            return
+        # Clear the address first so the disconnect is not taken for a lost link
+        self.address = None
+        self.io = self.serial_port
+        self.socket.abort()
+
+    def socket_connected(self):
+        # Commands are short lines; don't let Nagle hold them back waiting for more
+        self.socket.setSocketOption(QAbstractSocket.LowDelayOption, 1)
+        self.socket.setSocketOption(QAbstractSocket.KeepAliveOption, 1)
+        self.framer.clear()
+        if self.reconnect_port is not None:
+            self.log_message.emit(f"Reconnected to {self.port_name()}")
+            self.reconnect_port = None
+        else:
+            self.log_message.emit(f"Connected to {self.port_name()}")
+        self.set_connected(True)
+
+    def socket_lost(self):
+        """The link dropped or a connection attempt failed"""
+        if self.address is None:
+            return
+        if self.connected:
+            self.log_message.emit(f"Lost connection to {self.port_name()}")
+            self.set_connected(False)
+            self.reconnect_port = self.port_name()
+        if self.reconnect_port is not None:
+            if not self.reconnect_timer.isActive():
+                self.schedule_reconnect()
+            return
+        # The first connection attempt failed; leave it to the user
+        self.log_message.emit(f"Failed to connect to {self.port_name()}")
+        self.close_socket()
+        self.connect_failed.emit()
+
+    def socket_error(self, error):
+        # A refused or timed-out connect never reaches the connected state,
+        # so no disconnected signal follows
+        if self.socket.state() == QAbstractSocket.UnconnectedState:
+            self.socket_lost()
+
+    # Data
+
+    def send(self, command, expect=None, timeout=None):
+        """Queue a line for the port and return a CommandFuture for its reply.
+
+        Writes made in one event-loop pass go out together. expect is the
+        frame kind that answers the command (by default "Ok", or the data
+        reply of G93 / M7 / M317); timeout defaults by command class.
+        """
+        command = command.strip()
+        future = CommandFuture(command, expect)
+        if not self.is_open():
+            self.log_message.emit(f"Error: Not connected to {self.label}")
+            future.settle(NOT_SENT, f"Not connected to {self.label}")
+            return future
+        self.write_buffer += command.encode() + b'\n'
+        self.last_command = command
+        self.log_message.emit(f"Sent: {command}")
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            QTimer.singleShot(0, self.flush)
+        self.pending.add(future, timeout)
+        if not self.reply_timer.isActive():
+            self.arm_reply_timer()
+        return future
+
+    def flush(self):
+        """Hand buffered writes to the serial port"""
+        self.flush_scheduled = False
+        if not self.write_buffer:
+            return
+        if self.is_open():
+            try:
+                self.io.write(bytes(self.write_buffer))
+            except Exception as e:
+                self.log_message.emit(f"Error sending command: {str(e)}")
+        self.write_buffer.clear()
+
+    def read_data(self):
+        """Frame everything available and emit each frame"""
+        for frame in self.framer.feed(self.io.readAll().data()):
+            self.log_message.emit(f"Received: {frame.text}")
+            if frame.kind == FRAME_TEXT and self.identity and frame.text == self.identity[1]:
+                # Also seen after a manual connect, which sends the query too
+                self.remember_port()
+                if self.probing:
+                    self.identity_confirmed()
+            self.frame_received.emit(frame)
+            if self.pending.match(frame) is not None:
+                self.arm_reply_timer()
+
+    # Replies
+
+    def arm_reply_timer(self):
+        """Point the reply timer at the oldest command's deadline"""
+        deadline = self.pending.next_deadline()
+        if deadline is None:
+            self.reply_timer.stop()
+            return
+        self.reply_timer.start(max(0, int((deadline - time.monotonic()) * 1000) + 1))
+
+    def expire_replies(self):
+        for future in self.pending.expire():
+            self.log_message.emit(f"No reply to {future.command}")
+        self.arm_reply_timer()
+
+    def cancel_replies(self, reason):
+        self.reply_timer.stop()
+        self.pending.cancel_all(reason)
@@ -0,0 +1,112 @@
+import time
+
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import pyqtSignal
+
+from .device_transport import list_ports
+from .line_framer import FRAME_INPUT
+
+
+class DeviceView(QWidget):
+    """Base class for device widgets: a thin view on top of a DeviceTransport.
+
+    Subclasses build the UI (with port_combo, auto_connect_cb, refresh_btn
+    and connect_btn) and override handle_frame for device-specific replies.
+    """
+    log_message = pyqtSignal(str)  # Signal to emit log messages
+    response_received = pyqtSignal(str, object)  # Signal for device responses (response, device)
+    frame_received = pyqtSignal(object, object)  # Classified response (line_framer.Frame, device)
+    connection_status_changed = pyqtSignal(bool)  # Signal to emit when connection status changes
+
+    # Auto-connect probes every port, not only the USB/physical ones
+    probe_all_ports = False
+
+    def __init__(self, transport):
+        super().__init__()
+        self.transport = transport
+        self.transport.setParent(self)
+        self.transport.log_message.connect(self.log_message.emit)
+        self.transport.frame_received.connect(self.handle_frame)
+        self.transport.connection_changed.connect(self.update_connection_ui)
+        self.transport.auto_connect_failed.connect(self.auto_connect_failed)
+        self.transport.connect_failed.connect(self.reset_connection_ui)
+        # Last reported value of each input pin: "I3" -> (timestamp, value)
+        self.inputs = {}
+
+    def baud_rate(self):
+        """Baud rate to connect with"""
+        return self.transport.baud_rate
+
+    def update_ports(self):
+        """Update available COM ports, filtering out non-physical ports"""
+        self.port_combo.clear()
+        self.port_combo.addItems(list_ports())
+
+    def toggle_connection(self):
+        if not self.transport.is_active():  # Connect
+            if self.auto_connect_cb.isChecked():
+                self.start_auto_connect()
+            else:
+                # Normal connection process; a host:port entry connects over TCP
+                self.transport.connect_port(self.port_combo.currentText(), self.baud_rate())
+                if self.transport.is_active() and not self.transport.connected:
+                    self.connect_btn.setText("Connecting...")
+                    self.set_port_controls_enabled(False)
+        else:  # Disconnect
+            self.transport.disconnect_port()
+            self.reset_connection_ui()
+
+    def start_auto_connect(self):
+        """Search for the device; searches started together share one probe pass"""
+        self.auto_connect_cb.setChecked(True)
+        self.connect_btn.setText("Searching...")
+        self.set_port_controls_enabled(False)
+        self.transport.baud_rate = self.baud_rate()
+        self.transport.start_auto_connect(list_ports(physical_only=not self.probe_all_ports))
+
+    def toggle_auto_connect(self, state):
+        """Only update checkbox state, actual auto-connect starts when clicking connect"""
+        if not state and self.transport.connected:
+            # If turning off auto-connect while connected, stay connected
+            self.connect_btn.setText("Disconnect")
+            self.set_port_controls_enabled(False)
+
+    def set_port_controls_enabled(self, enabled):
+        self.port_combo.setEnabled(enabled)
+        self.refresh_btn.setEnabled(enabled)
+
+    def update_connection_ui(self, connected):
+        """Reflect the transport's connection state in the widgets"""
+        if connected:
+            self.port_combo.setCurrentText(self.transport.port_name())
+            self.connect_btn.setText("Disconnect")
+            self.set_port_controls_enabled(False)
+        elif not self.transport.is_active():
+            self.reset_connection_ui()
+        self.connection_status_changed.emit(connected)
+
+    def reset_connection_ui(self):
+        """Back to the disconnected state"""
+        self.connect_btn.setText("Connect")
+        self.set_port_controls_enabled(True)
+
+    def auto_connect_failed(self):
+        """No port answered during auto-connect"""
+        self.auto_connect_cb.setChecked(False)
+        self.reset_connection_ui()
+
+    def send_command(self, command, expect=None, timeout=None):
+        """Send a command line to the device; returns a CommandFuture for the reply"""
+        return self.transport.send(command, expect, timeout)
+
+    def get_input(self, pin):
+        """Latest (timestamp, value) reported for an input ("I3", "A2"), or None"""
+        return self.inputs.get(pin)
+
+    def handle_frame(self, frame):
+        """Handle one frame received from the device"""
+        if frame.kind == FRAME_INPUT:
+            pin, value = frame.value
+            self.inputs[pin] = (time.time(), value)
+        self.response_received.emit(frame.text, self)  # Emit response with self as device
+        self.frame_received.emit(frame, self)
@@ -2,32 +2,24 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QComboBox,
                            QPushButton, QLabel, QSpinBox, QDoubleSpinBox,
                            QGroupBox, QGridLayout, QTabWidget, QLineEdit,
                            QCheckBox, QRadioButton, QButtonGroup, QTextEdit)
-from PyQt5.QtCore import QTimer, pyqtSignal, Qt
-from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
+from PyQt5.QtCore import QTimer, Qt
 
-class EncoderControl(QWidget):
-    log_message = pyqtSignal(str)  # Signal to emit log messages
-    response_received = pyqtSignal(str, object)  # Signal for device responses (response, device)
+from .device_transport import DeviceTransport
+from .line_framer import FRAME_ENCODER
+from .device_view import DeviceView
+from .position_telemetry import PositionTelemetry
 
+class EncoderControl(DeviceView):
     def __init__(self):
-        super().__init__()
-        self.serial_port = QSerialPort()
-        self.serial_port.readyRead.connect(self.read_data)
+        # Check it's an encoder as soon as the port is opened
+        super().__init__(DeviceTransport('encoder', "X Encoder", connect_commands=["IsXEncoder"]))
+        # Positions, read by scripts without querying the encoder
+        self.telemetry = PositionTelemetry()
         
         # Position update timer
         self.position_update_timer = QTimer()
         self.position_update_timer.timeout.connect(self.request_position)
         
-        # Auto-connect timers
-        self.auto_connect_timer = QTimer()
-        self.auto_connect_timer.timeout.connect(self.try_auto_connect)
-        self.port_response_timer = QTimer()
-        self.port_response_timer.timeout.connect(self.port_timeout)
-        self.port_response_timer.setSingleShot(True)  # Timer runs only once
-        
-        self.current_test_port = None
-        self.ports_to_test = []
-        
         self.init_ui()
         self.update_ports()
 
@@ -168,163 +160,23 @@ class EncoderControl(QWidget):
         
         layout.addStretch()
 
-    def update_ports(self):
-        """Update available COM ports, filtering out non-physical ports"""
-        self.port_combo.clear()
-        for port in QSerialPortInfo.availablePorts():
-            # Only add physical ports (USB or COM)
-            if (port.hasProductIdentifier() or 
-                port.hasVendorIdentifier() or 
-                (port.portName().startswith("COM") and port.portName() != "COM1")):
-                self.port_combo.addItem(port.portName())
-
-    def toggle_connection(self):
-        if not self.serial_port.isOpen():  # Connect
-            if self.auto_connect_cb.isChecked():
-                # Start auto-connect process
-                self.connect_btn.setText("Searching...")
-                self.port_combo.setEnabled(False)
-                self.refresh_btn.setEnabled(False)
-                self.start_auto_connect()
-            else:
-                # Normal connection process
-                try:
-                    self.serial_port.setPortName(self.port_combo.currentText())
-                    self.serial_port.setBaudRate(QSerialPort.Baud115200)
-                    if self.serial_port.open(QSerialPort.ReadWrite):
-                        self.connect_btn.setText("Disconnect")
-                        self.port_combo.setEnabled(False)
-                        self.refresh_btn.setEnabled(False)
-                        self.log_message.emit(f"Connected to {self.port_combo.currentText()} at 115200 baud")
-                        # Check if it's an encoder
-                        self.send_command("IsXEncoder")
-                    else:
-                        self.log_message.emit(f"Failed to open port {self.port_combo.currentText()}")
-                except Exception as e:
-                    self.log_message.emit(f"Error: {str(e)}")
-        else:  # Disconnect
-            self.stop_auto_connect()  # Stop any auto-connect process
+    def update_connection_ui(self, connected):
+        if not connected:
             self.position_update_timer.stop()
-            self.serial_port.close()
-            self.connect_btn.setText("Connect")
-            self.port_combo.setEnabled(True)
-            self.refresh_btn.setEnabled(True)
-            self.log_message.emit("Disconnected")
-
-    def toggle_auto_connect(self, state):
-        """Only update checkbox state, actual auto-connect starts when clicking connect"""
-        if not state and self.serial_port.isOpen():
-            # If turning off auto-connect while connected, stay connected
-            self.connect_btn.setText("Disconnect")
-            self.port_combo.setEnabled(False)
-            self.refresh_btn.setEnabled(False)
+        super().update_connection_ui(connected)
 
-    def try_auto_connect(self):
-        """Periodic check for auto-connect status"""
-        if not self.serial_port.isOpen():
-            self.try_next_port()
-
-    def start_auto_connect(self):
-        """Start the auto-connect process"""
-        self.ports_to_test = [port.portName() for port in QSerialPortInfo.availablePorts() 
-                             if (port.hasProductIdentifier() or 
-                                 port.hasVendorIdentifier() or 
-                                 (port.portName().startswith("COM") and port.portName() != "COM1"))]
-        if self.ports_to_test:
-            # Start the auto-connect timer
-            self.auto_connect_timer.start(2000)  # Check every 2 seconds
-            self.try_next_port()
-        else:
-            self.log_message.emit("No COM ports available")
-            self.auto_connect_cb.setChecked(False)
-
-    def try_next_port(self):
-        """Try connecting to the next available port"""
-        if self.ports_to_test:
-            self.current_test_port = self.ports_to_test.pop(0)
-            if self.try_connect_to_port(self.current_test_port):
-                # Send IsXEncoder command to check if this is an encoder
-                self.send_command("IsXEncoder")
-                # Start response timeout timer
-                self.port_response_timer.start(1000)  # 1 second timeout
-            else:
-                # If connection failed, try next port immediately
-                self.try_next_port()
-        else:
-            # No more ports to test
-            self.stop_auto_connect()
-            self.log_message.emit("Auto-connect: No X Encoder found")
-
-    def try_connect_to_port(self, port_name):
-        """Attempt to connect to a specific port"""
-        if self.serial_port.isOpen():
-            self.serial_port.close()
-        
-        self.serial_port.setPortName(port_name)
-        self.serial_port.setBaudRate(QSerialPort.Baud115200)
+    def handle_frame(self, frame):
+        """Handle one frame received from the encoder"""
+        super().handle_frame(frame)
         
-        if self.serial_port.open(QSerialPort.ReadWrite):
-            self.log_message.emit(f"Testing port {port_name}...")
-            return True
-        else:
-            self.log_message.emit(f"Failed to open port {port_name}")
-            return False
-
-    def port_timeout(self):
-        """Called when no response is received from current port within timeout period"""
-        if self.serial_port.isOpen():
-            self.serial_port.close()
-        self.log_message.emit(f"No response from {self.current_test_port}")
-        self.try_next_port()  # Try next port immediately
+        if frame.kind == FRAME_ENCODER:
+            self.telemetry.update(frame.value)
+            # Update position display
+            self.position_display.setText(f"{frame.value:.2f}")
 
-    def stop_auto_connect(self):
-        """Stop all auto-connect related timers"""
-        self.auto_connect_timer.stop()
-        self.port_response_timer.stop()
-        if not self.serial_port.isOpen():
-            self.auto_connect_cb.setChecked(False)
-            self.connect_btn.setText("Connect")
-            self.port_combo.setEnabled(True)
-            self.refresh_btn.setEnabled(True)
-        self.log_message.emit("Auto-connect stopped")
-
-    def read_data(self):
-        """Read data from serial port"""
-        while self.serial_port.canReadLine():
-            data = self.serial_port.readLine().data().decode().strip()
-            self.log_message.emit(f"Received: {data}")
-            self.response_received.emit(data, self)  # Emit response with self as device
-            
-            # Handle special responses
-            if data == "YesXEncoder":
-                self.log_message.emit("X Encoder detected!")
-                # Stop auto-connect process since we found the encoder
-                self.port_response_timer.stop()
-                self.auto_connect_timer.stop()
-                # Update UI to show current port
-                self.port_combo.setCurrentText(self.serial_port.portName())
-                self.connect_btn.setText("Disconnect")
-                self.port_combo.setEnabled(False)
-                self.refresh_btn.setEnabled(False)
-            elif data.startswith("P:"):
-                # Update position display
-                try:
-                    position = float(data.split(":")[1])
-                    self.position_display.setText(f"{position:.2f}")
-                except (IndexError, ValueError):
-                    pass
-
-    def send_command(self, command):
-        if self.serial_port.isOpen():
-            try:
-                if not command.endswith('\n'):
-                    command += '\n'
-                self.serial_port.write(command.encode())
-                self.log_message.emit(f"Sent: {command.strip()}")
-            except Exception as e:
-                self.log_message.emit(f"Error sending command: {str(e)}")
-        else:
-            self.log_message.emit("Error: Not connected to encoder")
+    def get_position(self):
+        """Latest (timestamp, position) sample, or None before any M317 reply"""
+        return self.telemetry.latest
 
     def change_mode(self, button):
         self.send_command(f"M316 {button.mode_value}")
@@ -0,0 +1,135 @@
+"""
+Line framing and classification of device replies
+"""
+
+# Frame kinds
+FRAME_OK = 'ok'  # Command acknowledged
+FRAME_POSITION = 'position'  # "x,y,z[,...]" from G93 / M100 auto feedback
+FRAME_INPUT = 'input'  # "I3 V1" / "A2 V2478" from M7 / M08
+FRAME_ENCODER = 'encoder'  # "P:13.2" (encoder) / "P0:5.32" (conveyor)
+FRAME_ERROR = 'error'  # Error reply from the firmware
+FRAME_TEXT = 'text'  # Anything else (identity replies, free text)
+
+DEFAULT_CAPACITY = 4096
+MAX_LINE_LENGTH = 1024  # Longer runs without a newline are line noise and get dropped
+
+INPUT_PREFIXES = frozenset(b'IA')
+NEWLINE = b'\n'
+OK_TEXT = 'Ok'
+
+
+class Frame:
+    """One classified line. value holds the parsed payload for the kind:
+    a tuple of floats for positions, (pin, value) for inputs, a float for
+    encoder readings and None otherwise.
+    """
+    __slots__ = ('kind', 'text', 'value')
+
+    def __init__(self, kind, text, value=None):
+        self.kind = kind
+        self.text = text
+        self.value = value
+
+    def __repr__(self):
+        return f"Frame({self.kind!r}, {self.text!r}, {self.value!r})"
+
+
+class LineFramer:
+    """Splits a byte stream into classified frames.
+
+    Incoming bytes are copied into one reusable bytearray. The complete
+    lines in it are copied out together and split by one bytes.split(), then
+    classified on the raw bytes: a plain "Ok" is never decoded, other lines
+    are decoded once and position replies are split only once.
+
+    This is not zero-copy: the split and strip copy each line. Scanning the
+    buffer by offsets instead measured no faster, as the per-line cost is
+    in the interpreter rather than the copies.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.buffer = bytearray(capacity)
+        self.start = 0  # First unconsumed byte
+        self.end = 0  # One past the last received byte
+
+    def __len__(self):
+        """Bytes received but not yet framed"""
+        return self.end - self.start
+
+    def clear(self):
+        self.start = self.end = 0
+
+    def _make_room(self, size):
+        pending = self.end - self.start
+        if pending > MAX_LINE_LENGTH:
+            # No newline in sight; drop the partial line
+            pending = 0
+        if pending + size > len(self.buffer):
+            grown = bytearray(max(len(self.buffer) * 2, pending + size))
+            grown[:pending] = self.buffer[self.end - pending:self.end]
+            self.buffer = grown
+        elif pending:
+            self.buffer[:pending] = self.buffer[self.end - pending:self.end]
+        self.start = 0
+        self.end = pending
+
+    def feed(self, data):
+        """Add received bytes and return the complete frames they finish"""
+        size = len(data)
+        if self.end + size > len(self.buffer):
+            self._make_room(size)
+        buffer = self.buffer
+        buffer[self.end:self.end + size] = data
+        self.end += size
+
+        last = buffer.rfind(NEWLINE, self.start, self.end)
+        if last < 0:
+            return []
+        with memoryview(buffer) as view:
+            lines = bytes(view[self.start:last]).split(NEWLINE)
+        if last + 1 == self.end:
+            self.start = self.end = 0
+        else:
+            self.start = last + 1
+
+        frames = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                frames.append(classify(line))
+        return frames
+
+
+def classify(line):
+    """Classify one stripped, non-empty line"""
+    if line == b'Ok':
+        return Frame(FRAME_OK, OK_TEXT)
+    text = line.decode('ascii', 'replace')
+
+    # Position feedback is by far the most frequent reply, so test it first
+    if line.count(b',') >= 2:
+        try:
+            return Frame(FRAME_POSITION, text, tuple(map(float, line.split(b','))))
+        except ValueError:
+            pass  # Free text that happens to contain commas
+
+    first = line[0]
+    if first == 0x50 and (line.startswith(b'P:') or line.startswith(b'P0:')):  # 'P'
+        try:
+            return Frame(FRAME_ENCODER, text, float(line[line.index(b':') + 1:]))
+        except ValueError:
+            return Frame(FRAME_TEXT, text)
+
+    if first in INPUT_PREFIXES:
+        pin, sep, value = text.partition(' V')
+        if sep:
+            try:
+                return Frame(FRAME_INPUT, text, (pin, int(value)))
+            except ValueError:
+                pass
+        return Frame(FRAME_TEXT, text)
+
+    if line[:5].lower() == b'error':
+        return Frame(FRAME_ERROR, text)
+
+    return Frame(FRAME_TEXT, text)
@@ -0,0 +1,142 @@
+"""
+Bounded, batched log view with per-source rate limiting and optional file spill
+"""
+import logging
+import logging.handlers
+import os
+import time
+from collections import deque
+
+from PyQt5.QtWidgets import QPlainTextEdit
+from PyQt5.QtCore import QTimer
+
+MAX_LOG_LINES = 5000  # Lines kept in the view; older ones are discarded by Qt
+MAX_PENDING_LINES = 2000  # Lines buffered between flushes; the oldest are dropped beyond this
+FLUSH_INTERVAL = 100  # ms between view updates
+SOURCE_RATE_LIMIT = 20.0  # Lines per second shown per source once its burst is used up
+SOURCE_BURST = 50
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+DEFAULT_LOG_FILE = os.path.join(os.path.expanduser('~'), '.deltax_tool', 'logs', 'communication.log')
+
+
+class RateLimiter:
+    """Token bucket per source; counts what it turns away"""
+
+    def __init__(self, rate=SOURCE_RATE_LIMIT, burst=SOURCE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # source -> [tokens, last refill time, suppressed count]
+
+    def allow(self, source, now=None):
+        """Returns (allowed, suppressed count to report)"""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(source)
+        if bucket is None:
+            bucket = self.buckets[source] = [float(self.burst), now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False, 0
+        bucket[0] -= 1
+        suppressed, bucket[2] = bucket[2], 0
+        return True, suppressed
+
+    def forget(self, source):
+        self.buckets.pop(source, None)
+
+
+class LogConsole(QPlainTextEdit):
+    """Read-only plain-text log. append() only queues the line; a timer
+    writes everything queued in one appendPlainText call, and the document
+    is capped with maximumBlockCount so memory stays flat.
+    """
+
+    def __init__(self, parent=None, max_lines=MAX_LOG_LINES):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self.pending = deque(maxlen=MAX_PENDING_LINES)
+        self.dropped = 0
+        self.limiter = RateLimiter()
+        self.file_handler = None
+        self.file_pending = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append(self, message, source=None):
+        """Queue a message; source (e.g. a device) is rate-limited on its own"""
+        if self.file_handler is not None:
+            self.file_pending.append(f"{time.strftime('%H:%M:%S')} {message}")
+        if source is not None:
+            allowed, suppressed = self.limiter.allow(source)
+            if not allowed:
+                self.schedule_flush()
+                return
+            if suppressed:
+                self.queue_line(f"... {suppressed} messages suppressed")
+        self.queue_line(message)
+        self.schedule_flush()
+
+    def queue_line(self, line):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(line)
+
+    def schedule_flush(self):
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(FLUSH_INTERVAL)
+
+    def flush(self):
+        """Write queued lines to the view and the log file"""
+        if self.file_pending:
+            self.write_file(self.file_pending)
+            self.file_pending = []
+        if not self.pending:
+            return
+        lines = list(self.pending)
+        self.pending.clear()
+        if self.dropped:
+            lines.insert(0, f"... {self.dropped} messages dropped")
+            self.dropped = 0
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear(self):
+        self.pending.clear()
+        self.dropped = 0
+        super().clear()
+
+    def forget_source(self, source):
+        """Drop the rate-limit state of a source that went away"""
+        self.limiter.forget(source)
+
+    # File spill
+
+    def enable_file_log(self, path=DEFAULT_LOG_FILE, max_bytes=LOG_FILE_MAX_BYTES,
+                        backup_count=LOG_FILE_BACKUPS):
+        """Also write every message, rate-limited or not, to a rotating file"""
+        self.disable_file_log()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.file_handler.setFormatter(logging.Formatter('%(message)s'))
+        return path
+
+    def disable_file_log(self):
+        if self.file_handler is None:
+            return
+        if self.file_pending:
+            self.write_file(self.file_pending)
+            self.file_pending = []
+        self.file_handler.close()
+        self.file_handler = None
+
+    def write_file(self, lines):
+        # One record per batch, so the handler rotates and writes once per flush
+        self.file_handler.handle(logging.makeLogRecord({'msg': "\n".join(lines)}))
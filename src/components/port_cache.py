@@ -0,0 +1,107 @@
+"""
+On-disk cache of which serial port holds which device
+"""
+import json
+import os
+import re
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.deltax_tool', 'port_cache.json')
+BY_ID_DIR = '/dev/serial/by-id'
+
+# "tcp://192.168.1.1:8080" or "192.168.1.1:8080" (robot M50-M57, conveyor M390-M398)
+ADDRESS_PATTERN = re.compile(r'^(?:tcp://)?([\w.-]+):(\d{1,5})$')
+
+
+def parse_address(name):
+    """(host, port) if a port name is a network address, else None"""
+    match = ADDRESS_PATTERN.match(name.strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def by_id_path(system_location):
+    """The /dev/serial/by-id link pointing at a port, if there is one"""
+    if not os.path.isdir(BY_ID_DIR):
+        return None
+    target = os.path.realpath(system_location)
+    for name in sorted(os.listdir(BY_ID_DIR)):
+        link = os.path.join(BY_ID_DIR, name)
+        if os.path.realpath(link) == target:
+            return link
+    return None
+
+
+def port_key(info):
+    """Stable identity of a port that survives re-plugging and renumbering.
+
+    info is a QSerialPortInfo. USB VID/PID plus serial number is preferred;
+    adapters without a serial number fall back to their by-id path. Ports
+    with neither can't be told apart across runs and get None.
+    """
+    if info.hasVendorIdentifier() and info.hasProductIdentifier() and info.serialNumber():
+        return f"usb:{info.vendorIdentifier():04x}:{info.productIdentifier():04x}:{info.serialNumber()}"
+    path = by_id_path(info.systemLocation())
+    if path:
+        return f"by-id:{path}"
+    return None
+
+
+class PortCache:
+    """Maps port keys to the device type and name last found there"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.entries = {}  # key -> {'type': device type, 'name': device name}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # The cache only saves time; losing it is harmless
+
+    def lookup(self, key):
+        return self.entries.get(key) if key else None
+
+    def remember(self, key, device_type, name):
+        if not key:
+            return
+        entry = {'type': device_type, 'name': name}
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.save()
+
+    def forget(self, key):
+        if key and self.entries.pop(key, None) is not None:
+            self.save()
+
+    def find_port(self, keys, device_type, name=None):
+        """Pick the cached port for a device from {port name: key}.
+
+        A port remembered under the same device name wins over one that
+        only matches the device type.
+        """
+        fallback = None
+        for port_name, key in keys.items():
+            entry = self.lookup(key)
+            if not entry or entry.get('type') != device_type:
+                continue
+            if name is not None and entry.get('name') == name:
+                return port_name
+            if fallback is None:
+                fallback = port_name
+        return fallback
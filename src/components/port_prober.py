@@ -0,0 +1,133 @@
+"""
+Parallel identity probing of serial ports for auto-connect
+"""
+from functools import partial
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtSerialPort import QSerialPort
+
+from .device_transport import DEVICE_IDENTITIES, PROBE_TIMEOUT
+from .line_framer import LineFramer
+from .port_cache import PortCache
+
+# Every identity query goes out in one write; the device answers the one it knows
+IDENTITY_QUERIES = b''.join(query.encode() + b'\n' for query, _ in DEVICE_IDENTITIES.values())
+IDENTITY_REPLIES = {reply: device_type for device_type, (_, reply) in DEVICE_IDENTITIES.items()}
+
+
+def assign_ports(requests, found):
+    """Give each requester the first unclaimed port that answered as its type.
+
+    requests is a list of (device_type, ports) in request order and found maps
+    port name -> device type. Returns one port name (or None) per request.
+    """
+    claimed = set()
+    assigned = []
+    for device_type, ports in requests:
+        port_name = next((p for p in ports if found.get(p) == device_type and p not in claimed), None)
+        if port_name is not None:
+            claimed.add(port_name)
+        assigned.append(port_name)
+    return assigned
+
+
+class PortProber(QObject):
+    """Opens all candidate ports at once, sends every identity query and
+    hands each waiting transport the port that answered as its device type.
+
+    Transports that start auto-connect while a pass is running join it, so
+    several devices searching at the same time share a single pass. The
+    prober also holds the port cache the transports check before probing.
+    """
+
+    def __init__(self, parent=None, cache=None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else PortCache()
+        self.ports = {}  # port name -> open QSerialPort, or None if it failed to open
+        self.framers = {}  # port name -> LineFramer
+        self.found = {}  # port name -> device type that answered
+        self.requests = []  # (transport, ports) waiting for this pass
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.finish)
+
+    def is_running(self):
+        return self.timer.isActive()
+
+    def request(self, transport, ports):
+        """Add a transport to the current pass, starting one if needed"""
+        self.cancel(transport)
+        self.requests.append((transport, list(ports)))
+        opened = False
+        for port_name in ports:
+            # Retry ports that were busy (e.g. held by a transport checking its cached port)
+            if self.ports.get(port_name) is None:
+                opened = self.open_port(port_name, transport.baud_rate) or opened
+        if opened or not self.timer.isActive():
+            # Give newly opened ports the full timeout
+            self.timer.start(PROBE_TIMEOUT)
+        # Another transport's pass may already have found this device
+        self.finish_if_complete()
+
+    def cancel(self, transport):
+        self.requests = [r for r in self.requests if r[0] is not transport]
+
+    def open_port(self, port_name, baud_rate):
+        port = QSerialPort(self)
+        port.setPortName(port_name)
+        port.setBaudRate(baud_rate)
+        if not port.open(QSerialPort.ReadWrite):
+            port.deleteLater()
+            self.ports[port_name] = None
+            return False
+        self.ports[port_name] = port
+        self.framers[port_name] = LineFramer()
+        port.readyRead.connect(partial(self.read_data, port_name))
+        port.write(IDENTITY_QUERIES)
+        return True
+
+    def read_data(self, port_name):
+        port = self.ports.get(port_name)
+        if port is None:
+            return
+        for frame in self.framers[port_name].feed(port.readAll().data()):
+            if frame.text in IDENTITY_REPLIES:
+                self.found[port_name] = IDENTITY_REPLIES[frame.text]
+        self.finish_if_complete()
+
+    def assignments(self):
+        requests = [(transport.device_type, ports) for transport, ports in self.requests]
+        return assign_ports(requests, self.found)
+
+    def finish_if_complete(self):
+        """Stop waiting once every requester has a port"""
+        if self.timer.isActive() and all(p is not None for p in self.assignments()):
+            self.finish()
+
+    def finish(self):
+        """Close the probe ports and report the result to each transport"""
+        self.timer.stop()
+        assigned = self.assignments()
+        requests = self.requests
+        for port in self.ports.values():
+            if port is not None:
+                port.close()
+                port.deleteLater()
+        self.ports = {}
+        self.framers = {}
+        self.found = {}
+        self.requests = []
+        # Ports are closed now, so each transport can open the one it was given
+        for (transport, _), port_name in zip(requests, assigned):
+            transport.probe_finished(port_name)
+
+
+_shared_prober = None
+
+
+def shared_prober():
+    """The prober used by every DeviceTransport"""
+    global _shared_prober
+    if _shared_prober is None:
+        _shared_prober = PortProber()
+    return _shared_prober
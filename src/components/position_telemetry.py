@@ -0,0 +1,60 @@
+"""
+Position telemetry: latest value plus a bounded history of samples
+"""
+import time
+from collections import deque
+
+POSITION_HISTORY = 10000  # Samples kept; about 50 s of M100 feedback at 5 ms
+
+
+class PositionTelemetry:
+    """Stores every position sample as it arrives.
+
+    latest is a single (timestamp, values) slot that the display reads at
+    its own pace; history keeps the full-rate samples for scripts and
+    plugins. Timestamps come from time.time() so they compare with the
+    script's get_time().
+    """
+
+    def __init__(self, history_size=POSITION_HISTORY):
+        self.latest = None
+        self.history = deque(maxlen=history_size)
+        self.sample_count = 0
+        self.dirty = False  # latest changed since the display last took it
+
+    def update(self, values, timestamp=None):
+        sample = (time.time() if timestamp is None else timestamp, values)
+        self.latest = sample
+        self.history.append(sample)
+        self.sample_count += 1
+        self.dirty = True
+        return sample
+
+    def take_latest(self):
+        """Latest sample if it is new since the last call, else None"""
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return self.latest
+
+    def since(self, timestamp):
+        """Samples newer than timestamp, oldest first"""
+        samples = []
+        # Iterate a copy: the script thread reads while the GUI thread appends
+        for sample in reversed(list(self.history)):
+            if sample[0] <= timestamp:
+                break
+            samples.append(sample)
+        samples.reverse()
+        return samples
+
+    def rate(self, window=1.0):
+        """Samples per second over the last window seconds"""
+        if not self.history:
+            return 0.0
+        return len(self.since(self.history[-1][0] - window)) / window
+
+    def clear(self):
+        self.latest = None
+        self.history.clear()
+        self.dirty = False
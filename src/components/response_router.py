@@ -0,0 +1,87 @@
+"""
+Routing of device replies to the plugins subscribed to them
+"""
+from .line_framer import (FRAME_OK, FRAME_POSITION, FRAME_INPUT, FRAME_ENCODER,
+                          FRAME_ERROR)
+
+# Route keys: reply prefixes, plus position tuples and everything else
+ROUTE_OK = 'Ok'
+ROUTE_DIGITAL = 'I'  # "I3 V1"
+ROUTE_ANALOG = 'A'  # "A2 V2478"
+ROUTE_ENCODER = 'P:'  # "P:13.2" / "P0:5.32"
+ROUTE_POSITION = 'position'  # "x,y,z[,...]"
+ROUTE_ERROR = 'error'
+ROUTE_TEXT = 'text'
+
+ROUTE_KEYS = (ROUTE_OK, ROUTE_DIGITAL, ROUTE_ANALOG, ROUTE_ENCODER, ROUTE_POSITION,
+              ROUTE_ERROR, ROUTE_TEXT)
+
+_FRAME_ROUTES = {
+    FRAME_OK: ROUTE_OK,
+    FRAME_POSITION: ROUTE_POSITION,
+    FRAME_ENCODER: ROUTE_ENCODER,
+    FRAME_ERROR: ROUTE_ERROR,
+}
+
+
+def route_key(frame):
+    """Route key of a classified frame"""
+    if frame.kind == FRAME_INPUT:
+        return ROUTE_ANALOG if frame.text.startswith('A') else ROUTE_DIGITAL
+    return _FRAME_ROUTES.get(frame.kind, ROUTE_TEXT)
+
+
+class ResponseRouter:
+    """Subscriptions indexed by (device, route key).
+
+    None in either position is a wildcard, so dispatching one frame is four
+    dictionary lookups however many devices and subscribers there are.
+    Callbacks are called as callback(response_text, device), once per frame
+    even when several of their routes match it.
+    """
+
+    def __init__(self):
+        self.routes = {}  # (device or None, key or None) -> [callback, ...]
+
+    def subscribe(self, callback, device=None, keys=None):
+        """Call callback for replies from device (any if None) whose route key
+        is in keys (any if None). Returns a handle for unsubscribe."""
+        if keys is not None:
+            unknown = set(keys) - set(ROUTE_KEYS)
+            if unknown:
+                raise ValueError(f"Unknown route keys: {', '.join(sorted(unknown))}")
+        routes = [(device, key) for key in (keys if keys is not None else (None,))]
+        for route in routes:
+            callbacks = self.routes.setdefault(route, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+        return callback, routes
+
+    def unsubscribe(self, handle):
+        callback, routes = handle
+        for route in routes:
+            callbacks = self.routes.get(route)
+            if callbacks and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del self.routes[route]
+
+    def remove_device(self, device):
+        """Drop every subscription to a device that went away"""
+        for route in [r for r in self.routes if r[0] is device]:
+            del self.routes[route]
+
+    def dispatch(self, frame, device):
+        """Call the subscribers of one frame; returns how many were called"""
+        key = route_key(frame)
+        routes = self.routes
+        called = []
+        for route in ((device, key), (device, None), (None, key), (None, None)):
+            callbacks = routes.get(route)
+            if callbacks:
+                # Copy: a callback may unsubscribe
+                for callback in tuple(callbacks):
+                    if callback not in called:
+                        called.append(callback)
+                        callback(frame.text, device)
+        return len(called)
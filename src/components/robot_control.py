@@ -3,30 +3,30 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QComboBox,
                            QGroupBox, QGridLayout, QTabWidget, QLineEdit,
                            QCheckBox)
 from PyQt5.QtCore import QTimer, pyqtSignal, Qt
-from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
 
-class RobotControl(QWidget):
-    position_updated = pyqtSignal(dict)  # Signal to emit when position is updated
-    connection_status_changed = pyqtSignal(bool)  # Signal to emit when connection status changes
-    log_message = pyqtSignal(str)  # Signal to emit log messages
-    response_received = pyqtSignal(str, object)  # Signal for device responses (response, device)
+from .device_transport import DeviceTransport
+from .line_framer import FRAME_OK, FRAME_POSITION
+from .position_telemetry import PositionTelemetry
+from .device_view import DeviceView
+
+DISPLAY_REFRESH_INTERVAL = 16  # ms; position widgets follow the screen, not the feedback rate
+
+class RobotControl(DeviceView):
+    position_updated = pyqtSignal(dict)  # Emitted for every position sample, at full rate
+
+    # The robot may sit on any port (e.g. the simulator on COM1)
+    probe_all_ports = True
 
     def __init__(self):
-        super().__init__()
-        self.serial_port = QSerialPort()
-        self.serial_port.readyRead.connect(self.read_data)
-        self.buffer = ""
+        # Get current position as soon as the robot is connected
+        super().__init__(DeviceTransport('robot', "Delta robot", connect_commands=["G93"]))
         self.last_command = None
         
-        # Auto-connect timers
-        self.auto_connect_timer = QTimer()
-        self.auto_connect_timer.timeout.connect(self.try_auto_connect)
-        self.port_response_timer = QTimer()
-        self.port_response_timer.timeout.connect(self.port_timeout)
-        self.port_response_timer.setSingleShot(True)  # Timer runs only once
-        
-        self.current_test_port = None
-        self.ports_to_test = []
+        # Every sample goes into telemetry; the spinboxes are refreshed from its latest slot
+        self.telemetry = PositionTelemetry()
+        self.display_timer = QTimer(self)
+        self.display_timer.setInterval(DISPLAY_REFRESH_INTERVAL)
+        self.display_timer.timeout.connect(self.refresh_position_display)
         self.init_ui()
         self.update_ports()
 
@@ -45,6 +45,7 @@ class RobotControl(QWidget):
         port_layout = QHBoxLayout()
         self.port_combo = QComboBox()
         self.port_combo.setMinimumWidth(150)
+        self.port_combo.setEditable(True)  # Also accepts an Ethernet address, e.g. 192.168.1.100:8080
         port_layout.addWidget(QLabel("Port:"))
         port_layout.addWidget(self.port_combo)
         connection_layout.addLayout(port_layout)
@@ -339,99 +340,39 @@ class RobotControl(QWidget):
 
         layout.addWidget(tab_widget)
 
-    def update_ports(self):
-        """Update available COM ports, filtering out non-physical ports"""
-        self.port_combo.clear()
-        for port in QSerialPortInfo.availablePorts():
-            # Only add physical ports (USB or COM)
-            if (port.hasProductIdentifier() or 
-                port.hasVendorIdentifier() or 
-                (port.portName().startswith("COM") and port.portName() != "COM1")):
-                self.port_combo.addItem(port.portName())
-
-    def toggle_connection(self):
-        if not self.serial_port.isOpen():  # Connect
-            if self.auto_connect_cb.isChecked():
-                # Start auto-connect process
-                self.connect_btn.setText("Searching...")
-                self.port_combo.setEnabled(False)
-                self.refresh_btn.setEnabled(False)
-                self.start_auto_connect()
-            else:
-                # Normal connection process
-                try:
-                    self.serial_port.setPortName(self.port_combo.currentText())
-                    self.serial_port.setBaudRate(QSerialPort.Baud115200)
-                    if self.serial_port.open(QSerialPort.ReadWrite):
-                        self.connect_btn.setText("Disconnect")
-                        self.port_combo.setEnabled(False)
-                        self.refresh_btn.setEnabled(False)
-                        self.connection_status_changed.emit(True)
-                        self.log_message.emit(f"Connected to {self.port_combo.currentText()} at 115200 baud")
-                        # Get current position
-                        self.send_gcode("G93")
-                    else:
-                        self.log_message.emit(f"Failed to open port {self.port_combo.currentText()}")
-                except Exception as e:
-                    self.log_message.emit(f"Error: {str(e)}")
-        else:  # Disconnect
-            self.stop_auto_connect()  # Stop any auto-connect process
-            self.serial_port.close()
-            self.connect_btn.setText("Connect")
-            self.port_combo.setEnabled(True)
-            self.refresh_btn.setEnabled(True)
-            self.connection_status_changed.emit(False)
-            self.log_message.emit("Disconnected")
-
     def send_gcode(self, command):
-        if self.serial_port.isOpen():
-            try:
-                # Add newline if not present
-                if not command.endswith('\n'):
-                    command += '\n'
-                self.serial_port.write(command.encode())
-                self.last_command = command.strip()  # Store last command without newline
-                self.log_message.emit(f"Sent: {command.strip()}")
-            except Exception as e:
-                self.log_message.emit(f"Error sending command: {str(e)}")
-        else:
-            self.log_message.emit("Error: Not connected to robot")
-
-    def read_data(self):
-        """Read data from serial port"""
-        while self.serial_port.canReadLine():
-            data = self.serial_port.readLine().data().decode().strip()
-            self.log_message.emit(f"Received: {data}")
-            self.response_received.emit(data, self)  # Emit response with self as device
-            
-            # Handle special responses
-            if data == "YesDelta" and self.last_command == "IsDelta":
-                self.log_message.emit("Robot detected!")
-                # Stop auto-connect process since we found the robot
-                self.port_response_timer.stop()
-                self.auto_connect_timer.stop()
-                # Update UI to show current port
-                self.port_combo.setCurrentText(self.serial_port.portName())
-                self.connect_btn.setText("Disconnect")
-                self.port_combo.setEnabled(False)
-                self.refresh_btn.setEnabled(False)
-                self.connection_status_changed.emit(True)
-                # Get current position
-                self.send_gcode("G93")
-            elif data == "Ok" and self.last_command == "G28":
-                # After homing, request current position
-                self.send_gcode("G93")
-            
-            # Parse position data
-            if ',' in data and len(data.split(',')) >= 3:
-                try:
-                    x, y, z = map(float, data.split(',')[:3])
-                    self.pos_spinboxes['X'].setValue(x)
-                    self.pos_spinboxes['Y'].setValue(y)
-                    self.pos_spinboxes['Z'].setValue(z)
-                    self.position_updated.emit({'X': x, 'Y': y, 'Z': z})
-                except ValueError:
-                    pass
+        future = self.send_command(command)
+        if future:
+            self.last_command = command.strip()  # Store last command without newline
+        return future
+
+    def handle_frame(self, frame):
+        """Handle one frame received from the robot"""
+        super().handle_frame(frame)
+        
+        # Handle special responses
+        if frame.kind == FRAME_OK and self.last_command == "G28":
+            # After homing, request current position
+            self.send_gcode("G93")
+        
+        # Position data, already parsed by the framer
+        elif frame.kind == FRAME_POSITION:
+            x, y, z = frame.value[:3]
+            self.telemetry.update((x, y, z))
+            self.position_updated.emit({'X': x, 'Y': y, 'Z': z})
+            if not self.display_timer.isActive():
+                self.display_timer.start()
+
+    def refresh_position_display(self):
+        """Show the newest position; idles once feedback stops"""
+        sample = self.telemetry.take_latest()
+        if sample is None:
+            self.display_timer.stop()
+            return
+        x, y, z = sample[1]
+        self.pos_spinboxes['X'].setValue(x)
+        self.pos_spinboxes['Y'].setValue(y)
+        self.pos_spinboxes['Z'].setValue(z)
 
     def send_move_command(self):
         command = "G1"
@@ -496,80 +437,6 @@ class RobotControl(QWidget):
             self.send_gcode(command)
             self.command_input.clear()
 
-    def toggle_auto_connect(self, state):
-        """Only update checkbox state, actual auto-connect starts when clicking connect"""
-        if not state and self.serial_port.isOpen():
-            # If turning off auto-connect while connected, stay connected
-            self.connect_btn.setText("Disconnect")
-            self.port_combo.setEnabled(False)
-            self.refresh_btn.setEnabled(False)
-
-    def try_auto_connect(self):
-        """Periodic check for auto-connect status"""
-        if not self.serial_port.isOpen():
-            self.try_next_port()
-
-    def start_auto_connect(self):
-        """Start the auto-connect process"""
-        self.ports_to_test = [port.portName() for port in QSerialPortInfo.availablePorts()]
-        if self.ports_to_test:
-            # Start the auto-connect timer
-            self.auto_connect_timer.start(2000)  # Check every 2 seconds
-            self.try_next_port()
-        else:
-            self.log_message.emit("No COM ports available")
-            self.auto_connect_cb.setChecked(False)
-
-    def try_next_port(self):
-        """Try connecting to the next available port"""
-        if self.ports_to_test:
-            self.current_test_port = self.ports_to_test.pop(0)
-            if self.try_connect_to_port(self.current_test_port):
-                # Send IsDelta command to check if this is a robot
-                self.send_gcode("IsDelta")
-                # Start response timeout timer
-                self.port_response_timer.start(1000)  # 1 second timeout
-            else:
-                # If connection failed, try next port immediately
-                self.try_next_port()
-        else:
-            # No more ports to test
-            self.stop_auto_connect()
-            self.log_message.emit("Auto-connect: No Delta robot found")
-
-    def try_connect_to_port(self, port_name):
-        """Attempt to connect to a specific port"""
-        if self.serial_port.isOpen():
-            self.serial_port.close()
-        
-        self.serial_port.setPortName(port_name)
-        self.serial_port.setBaudRate(QSerialPort.Baud115200)
-        
-        if self.serial_port.open(QSerialPort.ReadWrite):
-            self.log_message.emit(f"Testing port {port_name}...")
-            return True
-        else:
-            self.log_message.emit(f"Failed to open port {port_name}")
-            return False
-
-    def port_timeout(self):
-        """Called when no response is received from current port within timeout period"""
-        if self.serial_port.isOpen():
-            self.serial_port.close()
-        self.log_message.emit(f"No response from {self.current_test_port}")
-        self.try_next_port()  # Try next port immediately
-
-    def stop_auto_connect(self):
-        """Stop all auto-connect related timers"""
-        self.auto_connect_timer.stop()
-        self.port_response_timer.stop()
-        if not self.serial_port.isOpen():
-            self.auto_connect_cb.setChecked(False)
-            self.connect_btn.setText("Connect")
-            self.port_combo.setEnabled(True)
-            self.refresh_btn.setEnabled(True)
-        self.log_message.emit("Auto-connect stopped")
-
     def send_arc_command_cw(self):
         """Send G2 (clockwise arc) command"""
         command = "G2"
@@ -606,6 +473,14 @@ class RobotControl(QWidget):
         self.send_gcode("G93")  # Get current position
 
     # Robot control methods for Lua scripting
+    def get_position(self):
+        """Latest (timestamp, (x, y, z)) sample, or None before any feedback"""
+        return self.telemetry.latest
+
+    def get_position_history(self, since=0):
+        """Every position sample newer than since, oldest first"""
+        return self.telemetry.since(since)
+        
     def home(self):
         """Home all axes of the robot"""
         return self.home_robot()
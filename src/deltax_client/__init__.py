@@ -0,0 +1,29 @@
+"""
+asyncio client for DeltaX robots, conveyors and encoders, without Qt
+
+    robot = await open_robot("COM3")  # or "192.168.1.10:3456"
+    await robot.move_to(x=0, y=0, z=-750, feed=500)
+    async for x, y, z in robot.positions(period_ms=50):
+        ...
+"""
+import os
+import sys
+
+# Reuse the app's framing and reply matching (components/ imports no Qt)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from .devices import (Device, Robot, Conveyor, Encoder, DeviceError, ReplyTimeout,  # noqa: E402
+                      gcode)
+from .links import DEFAULT_BAUD_RATE  # noqa: E402
+
+
+async def open_robot(port, baudrate=DEFAULT_BAUD_RATE, check_identity=True):
+    return await Robot.open(port, baudrate, check_identity)
+
+
+async def open_conveyor(port, baudrate=DEFAULT_BAUD_RATE, check_identity=True):
+    return await Conveyor.open(port, baudrate, check_identity)
+
+
+async def open_encoder(port, baudrate=DEFAULT_BAUD_RATE, check_identity=True):
+    return await Encoder.open(port, baudrate, check_identity)
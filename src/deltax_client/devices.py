@@ -0,0 +1,530 @@
+"""
+asyncio device classes: one link, one framer and a reply queue per device
+"""
+import asyncio
+import contextlib
+import re
+import time
+
+from components.command_futures import CommandFuture, PendingReplies, DONE, FAILED, TIMED_OUT
+from components.line_framer import (LineFramer, FRAME_POSITION, FRAME_INPUT, FRAME_ENCODER,
+                                    FRAME_TEXT)
+
+from .links import DEFAULT_BAUD_RATE, TcpLink, open_link
+
+FEEDBACK_QUEUE_SIZE = 1000  # Feedback frames kept per listener; the oldest are dropped beyond this
+IDENTITY_TIMEOUT = 1.0  # s
+# Robot port numbers for M100 C: where auto feedback is sent
+FEEDBACK_PORT_USB = 0
+FEEDBACK_PORT_RJ45 = 4
+
+# Replies whose parsed value is returned instead of the text
+VALUE_FRAMES = frozenset((FRAME_POSITION, FRAME_INPUT, FRAME_ENCODER))
+
+
+class DeviceError(Exception):
+    """The device answered a command with an error"""
+
+    def __init__(self, command, message):
+        super().__init__(f"{command}: {message}")
+        self.command = command
+        self.message = message
+
+
+class ReplyTimeout(DeviceError, TimeoutError):
+    """No reply to a command within its timeout"""
+
+
+def format_value(value):
+    """Number as G-code writes it: no exponent, no trailing zeros"""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float):
+        return f"{value:.4f}".rstrip('0').rstrip('.')
+    return str(value)
+
+
+def gcode(code, **words):
+    """"G1 X10 Y-2.5" from G1, X=10, Y=-2.5; words left as None are skipped"""
+    parts = [code]
+    for letter, value in words.items():
+        if value is not None:
+            parts.append(letter + format_value(value))
+    return " ".join(parts)
+
+
+class Device:
+    """One DeltaX device driven from an asyncio event loop.
+
+    Every reply is matched to its command by the same PendingReplies the Qt
+    transport uses, so commands on different devices overlap freely and
+    only one timer handle per device is ever scheduled. Writes made in one
+    loop iteration go out in a single write.
+    """
+    identity = None  # (query, expected reply)
+
+    def __init__(self, link, timeouts=None):
+        self.loop = asyncio.get_running_loop()
+        self.link = link
+        self.framer = LineFramer()
+        self.pending = PendingReplies(timeouts)
+        self.timer = None
+        self.write_buffer = bytearray()
+        self.flush_scheduled = False
+        self.listeners = {}  # frame kind -> set of asyncio.Queue
+        link.attach(self.data_received, self.connection_lost)
+
+    @classmethod
+    async def open(cls, port, baudrate=DEFAULT_BAUD_RATE, check_identity=True, timeouts=None):
+        """Connect over a serial port or a "host:port" address"""
+        device = cls(await open_link(port, baudrate), timeouts)
+        if check_identity and device.identity is not None:
+            try:
+                await device.identify()
+            except Exception:
+                device.close()
+                raise
+        return device
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.link.closed
+
+    def close(self):
+        self.link.close()
+
+    async def identify(self):
+        """Check the device answers the identity query of its type"""
+        query, expected = self.identity
+        reply = await self.send(query, expect=FRAME_TEXT, timeout=IDENTITY_TIMEOUT)
+        if reply != expected:
+            raise DeviceError(query, f"expected {expected}, got {reply}")
+
+    # Commands
+
+    def send(self, command, expect=None, timeout=None):
+        """Send one line; the returned asyncio future resolves with the reply.
+
+        The result is the parsed value for data replies (G93 position, M7
+        inputs, M317 position) and the reply text otherwise. Error replies
+        raise DeviceError, missing ones ReplyTimeout and a closed link
+        ConnectionError.
+        """
+        command = command.strip()
+        reply = CommandFuture(command, expect)
+        result = self.loop.create_future()
+        if self.link.closed:
+            result.set_exception(ConnectionError("Link is closed"))
+            return result
+        self.write_buffer += command.encode() + b'\n'
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon(self.flush)
+        self.pending.add(reply, timeout)
+        if self.timer is None:
+            self.arm_timer()
+        reply.add_done_callback(lambda reply: self.settle(result, reply))
+        return result
+
+    def command(self, code, **words):
+        """Send any G-code with its parameter words, e.g. command("M204", A=15000)"""
+        return self.send(gcode(code, **words))
+
+    def flush(self):
+        self.flush_scheduled = False
+        if self.write_buffer and not self.link.closed:
+            self.link.write(bytes(self.write_buffer))
+        self.write_buffer.clear()
+
+    @staticmethod
+    def settle(result, reply):
+        if result.done():
+            return  # The caller cancelled it
+        if reply.state == DONE:
+            result.set_result(reply.value if reply.expect in VALUE_FRAMES else reply.response)
+        elif reply.state == FAILED:
+            result.set_exception(DeviceError(reply.command, reply.error))
+        elif reply.state == TIMED_OUT:
+            result.set_exception(ReplyTimeout(reply.command, reply.error))
+        else:
+            result.set_exception(ConnectionError(reply.error))
+
+    # Replies
+
+    def data_received(self, data):
+        for frame in self.framer.feed(data):
+            listeners = self.listeners.get(frame.kind)
+            if listeners:
+                for queue in listeners:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(frame)
+            if self.pending.match(frame) is not None:
+                self.arm_timer()
+
+    def arm_timer(self):
+        """Schedule the timeout of the oldest command"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        deadline = self.pending.next_deadline()
+        if deadline is not None:
+            self.timer = self.loop.call_later(max(0.0, deadline - time.monotonic()), self.expire)
+
+    def expire(self):
+        self.timer = None
+        self.pending.expire()
+        self.arm_timer()
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.pending.cancel_all(f"Connection lost: {exc}" if exc else "Connection closed")
+        for queues in self.listeners.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def feedback(self, kind):
+        """Every frame of a kind as it arrives (auto feedback, input changes)"""
+        queue = asyncio.Queue(FEEDBACK_QUEUE_SIZE)
+        self.listeners.setdefault(kind, set()).add(queue)
+        try:
+            while not self.link.closed or not queue.empty():
+                frame = await queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.listeners[kind].discard(queue)
+
+    async def feedback_values(self, kind, start=None):
+        """Values of every frame of a kind as it arrives; start(), if given,
+        is awaited once subscribed so no early frame is missed"""
+        stream = self.feedback(kind)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        try:
+            if start is not None:
+                await start()
+            yield (await first).value
+            async for frame in stream:
+                yield frame.value
+        except StopAsyncIteration:
+            return
+        finally:
+            # The stream cannot be closed while first is still running it
+            if not first.done():
+                first.cancel()
+                with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                    await first
+            await stream.aclose()
+
+    async def inputs(self):
+        """(pin, value) for every input report, e.g. ("I3", 1)"""
+        async for frame in self.feedback(FRAME_INPUT):
+            yield frame.value
+
+
+class Robot(Device):
+    """Delta X S robot (gcode-deltaxs.md)"""
+    identity = ("IsDelta", "YesDelta")
+
+    # Motion
+
+    def move_to(self, x=None, y=None, z=None, w=None, u=None, v=None, feed=None,
+                accel=None, jerk=None, begin_speed=None, end_speed=None):
+        """G1 linear move; resolves when the robot acknowledges it"""
+        return self.send(gcode("G1", X=x, Y=y, Z=z, W=w, U=u, V=v, F=feed, A=accel,
+                               J=jerk, S=begin_speed, E=end_speed))
+
+    def arc(self, x, y, i, j, clockwise=True, w=None, u=None, v=None, feed=None,
+            accel=None, begin_speed=None, end_speed=None):
+        """G2 (clockwise) / G3 arc around the center offset (i, j)"""
+        return self.send(gcode("G2" if clockwise else "G3", I=i, J=j, X=x, Y=y, W=w, U=u,
+                               V=v, F=feed, A=accel, S=begin_speed, E=end_speed))
+
+    def dwell(self, ms):
+        return self.send(gcode("G4", P=ms))
+
+    def move_angles(self, theta1=None, theta2=None, theta3=None, w=None, u=None, v=None):
+        """G6 joint-space move (degrees)"""
+        return self.send(gcode("G6", X=theta1, Y=theta2, Z=theta3, W=w, U=u, V=v))
+
+    def home(self):
+        return self.send("G28")
+
+    def set_absolute(self):
+        return self.send("G90")
+
+    def set_relative(self):
+        return self.send("G91")
+
+    def get_position(self):
+        """G93; resolves with (x, y, z)"""
+        return self.send("G93")
+
+    def disable_steppers(self):
+        return self.send("M84")
+
+    # I/O
+
+    def set_output(self, pin, on=True):
+        return self.send(gcode("M03" if on else "M05", D=pin))
+
+    def set_pwm(self, pin, value, wide=False):
+        """PWM duty 0-255, or 0-65535 with wide=True (M04); 0 turns it off"""
+        if not value:
+            return self.send(gcode("M05", P=pin))
+        return self.send(gcode("M04" if wide else "M03", P=pin, W=value))
+
+    async def read_inputs(self, digital=(), analog=()):
+        """One M07 per pin, all in flight at once; returns {"I0": 1, "A2": 3946, ...}"""
+        words = [f"I{pin}" for pin in digital] + [f"A{pin}" for pin in analog]
+        return dict(await asyncio.gather(*(self.send("M07 " + word) for word in words)))
+
+    def watch_digital_input(self, pin, enabled=True, port=0):
+        """M08: report a digital input whenever it changes (see inputs())"""
+        return self.send(gcode("M08", I=pin, B=1 if enabled else 0, P=port))
+
+    def watch_analog_input(self, pin, cycle_us, port=0):
+        """M08: report an analog input every cycle_us; below 100 stops it"""
+        return self.send(gcode("M08", A=pin, C=cycle_us, P=port))
+
+    # Position feedback
+
+    def set_auto_feedback(self, period_ms, port=None):
+        """M100: report the position every period_ms (0 stops it) to port,
+        by default the one this link is on: RJ45 (4) over TCP, else USB (0)"""
+        if port is None:
+            port = FEEDBACK_PORT_RJ45 if isinstance(self.link, TcpLink) else FEEDBACK_PORT_USB
+        if period_ms and period_ms > 0:
+            return self.send(gcode("M100", A=1, B=int(period_ms), C=port))
+        return self.send(gcode("M100", A=0))
+
+    def positions(self, period_ms=None):
+        """Position tuples as they arrive; starts M100 feedback if period_ms is given"""
+        start = (lambda: self.set_auto_feedback(period_ms)) if period_ms else None
+        return self.feedback_values(FRAME_POSITION, start)
+
+    # Motion parameters
+
+    def set_jerk(self, jerk):
+        return self.send(gcode("M203", J=jerk))
+
+    def set_acceleration(self, accel):
+        return self.send(gcode("M204", A=accel))
+
+    def set_begin_velocity(self, speed):
+        return self.send(gcode("M205", S=speed))
+
+    def set_offset(self, x=None, y=None, z=None, w=None, u=None, v=None):
+        return self.send(gcode("M206", X=x, Y=y, Z=z, W=w, U=u, V=v))
+
+    def set_z_safe(self, z):
+        return self.send(gcode("M207", Z=z))
+
+    def set_motion_parameters(self, axis=None, feed=None, accel=None, jerk=None,
+                              begin_speed=None, end_speed=None):
+        """M210 for theta moves (axis None), M211-M213 for axes 4-6"""
+        code = "M210" if axis is None else f"M21{axis - 3}"
+        return self.send(gcode(code, F=feed, A=accel, J=jerk, S=begin_speed, E=end_speed))
+
+    def get_motion_parameters(self, axis=None):
+        """M220; resolves with "F:2000 A:4000 J:800000 S:30 E:30" """
+        return self.send(gcode("M220", I=0 if axis is None else axis - 3))
+
+    def set_axis_parameters(self, axis, **words):
+        """M60-M62 for axes 4-6, e.g. set_axis_parameters(4, D=1, E=1, S=15)"""
+        return self.send(gcode(f"M6{axis - 4}", **words))
+
+    def save_settings(self):
+        return self.send("M500")
+
+    def restore_settings(self):
+        return self.send("M501")
+
+    def reset_settings(self):
+        return self.send("M502")
+
+    def set_emergency_button(self, enabled, a=None, b=None):
+        return self.send(gcode("M600", A=a, B=b) if enabled else "M601")
+
+    # Ports
+
+    def open_port(self, port, enabled=True, baudrate=DEFAULT_BAUD_RATE):
+        """M40 (RS232), M41 (RS485) or M42 (USB1)"""
+        code = {'rs232': "M40", 'rs485': "M41", 'usb1': "M42"}[port.lower()]
+        return self.send(gcode(code, A=1 if enabled else 0, B=baudrate))
+
+    def get_ports_config(self):
+        return self.send("M49")
+
+    def enable_ethernet(self, enabled=True):
+        return self.send(gcode("M50", A=1 if enabled else 0))
+
+    def set_ethernet_port(self, port):
+        return self.send(gcode("M51", B=port))
+
+    def set_mac(self, address):
+        """M52 with "12:23:34:45:56:67" """
+        parts = [int(part, 16) for part in re.split(r'[:-]', address)]
+        return self.send(gcode("M52", **dict(zip("ABCDEF", parts))))
+
+    def set_ip(self, address):
+        return self.send(gcode("M53", **self.dotted(address)))
+
+    def set_dns(self, address):
+        return self.send(gcode("M54", **self.dotted(address)))
+
+    def set_gateway(self, address):
+        return self.send(gcode("M55", **self.dotted(address)))
+
+    def set_subnet(self, address):
+        return self.send(gcode("M56", **self.dotted(address)))
+
+    def get_ip(self):
+        return self.send("M57")
+
+    @staticmethod
+    def dotted(address):
+        return dict(zip("ABCD", (int(part) for part in address.split('.'))))
+
+
+class EncoderPositions:
+    """Shared by conveyor and encoder: M317 position reads and feedback"""
+
+    def get_position(self):
+        """M317; resolves with the position in mm"""
+        return self.send("M317")
+
+    def set_position_feedback(self, period_ms):
+        """M317 T: report the position every period_ms"""
+        return self.send(gcode("M317", T=int(period_ms)))
+
+    def positions(self, period_ms=None):
+        """Encoder positions (mm) as they arrive; starts feedback if period_ms is given"""
+        start = (lambda: self.set_position_feedback(period_ms)) if period_ms else None
+        return self.feedback_values(FRAME_ENCODER, start)
+
+
+class Conveyor(EncoderPositions, Device):
+    """X Conveyor board (gc_industrial_conveyor.md)"""
+    identity = ("IsXConveyor", "YesXConveyor")
+
+    # M310 motion modes
+    MODE_OUTPUT = 0
+    MODE_POSITION = 1
+    MODE_VELOCITY = 2
+    MODE_MANUAL = 3
+
+    def set_mode(self, mode):
+        return self.send(f"M310 {int(mode)}")
+
+    def set_velocity(self, speed):
+        """M311 speed in mm/s (negative reverses) in velocity mode"""
+        return self.send(f"M311 {format_value(speed)}")
+
+    def move_to(self, position):
+        """M312 in position mode"""
+        return self.send(f"M312 {format_value(position)}")
+
+    def set_move_speed(self, speed):
+        """M313 speed of position moves"""
+        return self.send(f"M313 {format_value(speed)}")
+
+    def set_output(self, pin, on=True):
+        return self.send(gcode("M314", P=pin, V=1 if on else 0))
+
+    def configure(self, pulses_per_mm=None, reverse=None, encoder=None, stop_position=None,
+                  acceleration=None, velocity_button=None):
+        """M315 with the given settings; resolves with "Ok". The settings report
+        a bare M315 prints is not documented, so it is not parsed"""
+        return self.send(gcode("M315", S=pulses_per_mm, R=reverse, E=encoder, P=stop_position,
+                               A=acceleration, B=velocity_button))
+
+    def set_encoder_mode(self, mode):
+        """M316: 0 absolute, 1 relative, 2 input pins, 3 buttons"""
+        return self.send(f"M316 {int(mode)}")
+
+    def reset_position(self):
+        return self.send("M317 R")
+
+    def configure_encoder(self, pulses_per_mm=None, reverse=None, scale=None):
+        return self.send(gcode("M318", S=pulses_per_mm, R=reverse, C=scale))
+
+    async def read_input(self, pin):
+        """M319 V; returns 0 or 1"""
+        _, value = await self.send(gcode("M319", V=pin))
+        return value
+
+    def watch_input(self, pin, enabled=True):
+        """M319 T / S: report an input pin whenever it changes (see inputs())"""
+        return self.send(gcode("M319", **{'T' if enabled else 'S': pin}))
+
+    # Ethernet
+
+    def set_ethernet_port(self, port):
+        return self.send(f"M390 {int(port)}")
+
+    def set_ip(self, address):
+        return self.send("M391 " + address.replace('.', ' '))
+
+    def set_dns(self, address):
+        return self.send("M392 " + address.replace('.', ' '))
+
+    def set_gateway(self, address):
+        return self.send("M393 " + address.replace('.', ' '))
+
+    def set_subnet(self, address):
+        return self.send("M394 " + address.replace('.', ' '))
+
+    def set_mac(self, address):
+        parts = (str(int(part, 16)) for part in re.split(r'[:-]', address))
+        return self.send("M395 " + " ".join(parts))
+
+    def init_ethernet(self):
+        """M396: save the settings and restart the Ethernet port"""
+        return self.send("M396")
+
+    async def ethernet_parameters(self, local=False):
+        """M397 / M398; returns {"port": "3456", "ip": "192.168.0.2", ...}"""
+        reply = await self.send("M398" if local else "M397")
+        parameters = {}
+        for line in reply.splitlines():
+            key, sep, value = line.partition(':')
+            if sep and key.startswith('E_'):
+                parameters[key[2:]] = value
+        return parameters
+
+
+class Encoder(EncoderPositions, Device):
+    """X Encoder (gc_encoder.md)"""
+    identity = ("IsXEncoder", "YesXEncoder")
+
+    MODE_ABSOLUTE = 0
+    MODE_RELATIVE = 1
+
+    def set_mode(self, mode):
+        """M316: 0 absolute, 1 relative positions"""
+        return self.send(f"M316 {int(mode)}")
+
+    def set_pulses_per_mm(self, value):
+        return self.send(gcode("M318", S=value))
+
+    async def read_sensor(self):
+        """M319 V; the proximity sensor answers like an input pin"""
+        _, value = await self.send("M319 V", expect=FRAME_INPUT)
+        return value
+
+    def watch_sensor(self):
+        """M319 T: report the sensor whenever it changes (see inputs())"""
+        return self.send("M319 T")
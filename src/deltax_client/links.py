@@ -0,0 +1,174 @@
+"""
+Byte links for the asyncio client: TCP through asyncio, serial through pyserial
+"""
+import asyncio
+import os
+import socket
+import threading
+
+import serial
+
+from components.port_cache import parse_address
+
+DEFAULT_BAUD_RATE = 115200
+LOOP_PREFIX = 'loop://'  # In-process link to a simulator, for tests
+SERIAL_POLL_TIMEOUT = 0.05  # s; read timeout of the reader thread where add_reader is unavailable
+
+
+class Link:
+    """A byte stream to one device. attach() sets the on_data(bytes) and
+    on_close(exc) callbacks, both run on the event loop; bytes that arrive
+    before that are held back."""
+
+    def __init__(self):
+        self.on_data = None
+        self.on_close = None
+        self.closed = False
+        self.early = bytearray()
+
+    def attach(self, on_data, on_close):
+        self.on_data = on_data
+        self.on_close = on_close
+        if self.early:
+            data, self.early = bytes(self.early), bytearray()
+            on_data(data)
+
+    def data_received(self, data):
+        if self.on_data is None:
+            self.early += data
+        else:
+            self.on_data(data)
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def connection_lost(self, exc=None):
+        if self.closed:
+            return
+        self.closed = True
+        if self.on_close is not None:
+            self.on_close(exc)
+
+
+class _TcpProtocol(asyncio.Protocol):
+    def __init__(self, link):
+        self.link = link
+
+    def data_received(self, data):
+        self.link.data_received(data)
+
+    def connection_lost(self, exc):
+        self.link.connection_lost(exc)
+
+
+class TcpLink(Link):
+    """Connection to a device's RJ45 port"""
+
+    def __init__(self):
+        super().__init__()
+        self.transport = None
+
+    def write(self, data):
+        self.transport.write(data)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class SerialLink(Link):
+    """pyserial port read from the event loop.
+
+    On POSIX the port's file descriptor is watched with add_reader, so no
+    thread is needed; elsewhere a reader thread hands data to the loop.
+    """
+
+    def __init__(self, port, baudrate, loop):
+        super().__init__()
+        self.loop = loop
+        self.thread = None
+        watch_fd = os.name == 'posix'
+        self.serial = serial.Serial(port, baudrate, timeout=0 if watch_fd else SERIAL_POLL_TIMEOUT)
+        if watch_fd:
+            loop.add_reader(self.serial.fileno(), self.read_ready)
+        else:
+            self.thread = threading.Thread(target=self.reader_loop, daemon=True)
+            self.thread.start()
+
+    def read_ready(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self.close(e)
+            return
+        if data:
+            self.data_received(data)
+
+    def reader_loop(self):
+        while not self.closed:
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                self.loop.call_soon_threadsafe(self.close, e)
+                return
+            if data:
+                self.loop.call_soon_threadsafe(self.data_received, data)
+
+    def write(self, data):
+        try:
+            self.serial.write(data)
+        except (serial.SerialException, OSError) as e:
+            self.close(e)
+
+    def close(self, exc=None):
+        if self.closed:
+            return
+        if self.thread is None:
+            self.loop.remove_reader(self.serial.fileno())
+        self.serial.close()
+        self.connection_lost(exc)
+
+
+class LoopbackLink(Link):
+    """Client end of a RobotSimulator started on "loop://name" in this process.
+
+    The simulator's threads write into it; the bytes are handed to the loop.
+    """
+
+    def __init__(self, end, loop):
+        super().__init__()
+        self.end = end
+        end.set_listener(lambda data: loop.call_soon_threadsafe(self.data_received, data))
+
+    def write(self, data):
+        self.end.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.end.set_listener(None)
+        self.connection_lost(None)
+
+
+async def open_link(port, baudrate=DEFAULT_BAUD_RATE):
+    """Open a serial port, a TCP connection for a "host:port" name, or the
+    in-process link of a simulator for a "loop://name" one"""
+    loop = asyncio.get_running_loop()
+    if port.startswith(LOOP_PREFIX):
+        from simulator.links import connect_loopback
+        return LoopbackLink(connect_loopback(port), loop)
+    address = parse_address(port)
+    if address is None:
+        return SerialLink(port, baudrate, loop)
+    link = TcpLink()
+    transport, _ = await loop.create_connection(lambda: _TcpProtocol(link), *address)
+    sock = transport.get_extra_info('socket')
+    if sock is not None:
+        # asyncio already disables Nagle; keep-alive notices a dead link
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    link.transport = transport
+    return link
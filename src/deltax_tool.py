@@ -144,6 +144,12 @@ class DeltaXTool(QMainWindow):
         for plugin in self.device_manager.get_plugins():
             self.plugin_tabs.addTab(plugin, plugin.name)
 
+    def closeEvent(self, event):
+        """Let plugins stop their threads before the window closes"""
+        for plugin in self.device_manager.get_plugins():
+            plugin.cleanup()
+        super().closeEvent(event)
+
     def log_message(self, message):
         self.log_text.append(message)
         # Auto scroll to bottom
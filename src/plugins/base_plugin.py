@@ -9,6 +9,10 @@ class BasePlugin(QWidget):
     command_sent = pyqtSignal(str, object)  # Command and target device
     command_response = pyqtSignal(str, object)  # Response and source device
     
+    # (device, route keys) pairs handle_response is subscribed to when the plugin
+    # is loaded; None means any device / any reply (see components.response_router)
+    response_routes = ((None, None),)
+    
     def __init__(self, device_manager):
         super().__init__()
         self.device_manager = device_manager
@@ -27,9 +31,11 @@ class BasePlugin(QWidget):
         """Returns the widget to be displayed"""
         return self
         
-    def send_command(self, command, device):
-        """Send a command to a device and wait for response"""
+    def send_command(self, command, device, timeout=None):
+        """Send a command to a device; returns a CommandFuture for its reply"""
+        future = self.device_manager.handle_plugin_command(command, device, timeout)
         self.command_sent.emit(command, device)
+        return future
         
     def handle_response(self, response, device):
         """Handle response from device"""
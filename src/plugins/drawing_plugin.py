@@ -130,6 +130,8 @@ class DrawingArea(QGraphicsView):
         return path
 
 class DrawingPlugin(BasePlugin):
+    response_routes = ()  # Only sends commands
+    
     def __init__(self, device_manager):
         super().__init__(device_manager)
         self.name = "Drawing"
@@ -0,0 +1,79 @@
+"""
+Message queues between the script thread and the GUI thread that owns the devices
+"""
+from PyQt5.QtCore import QObject, Qt, pyqtSignal, pyqtSlot
+from collections import deque
+
+
+class MessageQueue(QObject):
+    """Messages handed to the thread this object lives in.
+
+    put() may be called from any thread: deque appends and pops are
+    atomic, so no lock is taken. A queued signal wakes the consumer and
+    posts at most one event for everything put before it drains.
+    """
+    wake = pyqtSignal()
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler  # Called with each message, in the consumer thread
+        self.messages = deque()
+        self.posted = False
+        self.wake.connect(self.drain, Qt.QueuedConnection)
+
+    def put(self, message):
+        self.messages.append(message)
+        if not self.posted:
+            self.posted = True
+            self.wake.emit()
+
+    @pyqtSlot()
+    def drain(self):
+        # Clear the flag first: anything put from here on posts a new wake-up
+        self.posted = False
+        messages = self.messages
+        while messages:
+            self.handler(messages.popleft())
+
+
+class DeviceChannel(QObject):
+    """The GUI-thread side of a script runtime.
+
+    Commands from the script thread are sent from here, where the device
+    transports live, and their replies go back through replies. Devices
+    are only ever touched on this side.
+    """
+    output = pyqtSignal(str, object)  # Console line and its source device
+
+    def __init__(self, router, send_command, replies):
+        super().__init__()
+        self.router = router
+        self.send_command = send_command  # (command, device, timeout) -> CommandFuture
+        self.replies = replies  # MessageQueue of the script thread: (handle, future)
+        self.requests = MessageQueue(self.handle_request)
+        self.watched_devices = set()
+        self.active = False  # Replies are shown while a script runs
+
+    def send(self, command, device, timeout, handle):
+        """Called from the script thread; handle is settled with the reply"""
+        self.requests.put((command, device, timeout, handle))
+
+    def handle_request(self, request):
+        command, device, timeout, handle = request
+        if device not in self.watched_devices:
+            self.watched_devices.add(device)
+            self.router.subscribe(self.handle_response, device)
+        future = self.send_command(command, device, timeout)
+        if future:
+            self.output.emit(f"Sent: {command}", device)
+        future.add_done_callback(lambda future: self.replies.put((handle, future)))
+
+    def forget_device(self, device):
+        """Stop watching a device that was removed; the router has already
+        dropped its subscriptions"""
+        self.watched_devices.discard(device)
+
+    def handle_response(self, response, device):
+        """Show replies from the devices the script talks to"""
+        if self.active:
+            self.output.emit(f"Received: {response}", device)
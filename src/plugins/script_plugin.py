@@ -5,31 +5,21 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
 from PyQt5.QtCore import Qt, QTimer, QRect, QSize, pyqtSignal
 from PyQt5.QtGui import (QTextCharFormat, QSyntaxHighlighter, QColor, QFont, 
                         QTextCursor, QPainter, QTextFormat)
-import lupa
-from lupa import LuaRuntime
 import os
 import re
-import time
-import threading
 from datetime import datetime
-import math
-import traceback
 import sys
-from .coroutine import yield_
 
 # Add parent directory to Python path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from components.robot_control import RobotControl
-from components.conveyor_control import ConveyorControl
-from components.encoder_control import EncoderControl
+from components.log_console import LogConsole
 
 from .base_plugin import BasePlugin
+from .script_runtime import ScriptRuntime
 
 # Constants
-MAX_SCRIPT_RUNTIME = 30000  # 30 seconds
 SCRIPT_CHECK_INTERVAL = 100  # 100ms
-MAX_QUEUE_SIZE = 1000
 SCRIPT_STOP_TIMEOUT = 5  # 5 seconds
 
 class LuaSyntaxHighlighter(QSyntaxHighlighter):
@@ -268,7 +258,7 @@ class HelpDialog(QDialog):
                 <li><b>Device Functions:</b> get_device, move_to, set_speed, home, etc.</li>
                 <li><b>Conveyor Functions:</b> conveyor_move, conveyor_stop, conveyor_step</li>
                 <li><b>Encoder Functions:</b> get_encoder_position, reset_encoder, set_encoder_mode</li>
-                <li><b>Utility Functions:</b> sleep, get_time, average, median, print</li>
+                <li><b>Utility Functions:</b> sleep, wait_until, get_time, average, median, print</li>
                 <li><b>Math Functions:</b> math.sin, math.cos, math.tan, math.abs, math.sqrt, etc.</li>
                 <li><b>Common Variables:</b> robot, conveyor, encoder, position, speed, steps</li>
             </ul>
@@ -302,6 +292,20 @@ class HelpDialog(QDialog):
             <h3>Basic Device Control</h3>
             <pre>
 get_device(name)          -- Get device by name (Robot 1, Conveyor 1, Encoder 1)
+set_stream_mode(mode, n)  -- "stop_and_wait" (default), "count" (n commands in flight)
+                          -- or "bytes" (n bytes of firmware buffer in flight)
+get_queue_stats()         -- Queue wait of sent commands: count, avg_ms, p95_ms, max_ms
+set_command_timeout(p, s) -- Ack timeout (s) for commands starting with p, e.g. "G28", "M"
+h = send_async(dev, cmd)  -- Send now, outside the queue; returns a reply handle
+wait_reply(h)             -- Wait for it: ok, response, value (position, inputs, ...)
+get_input(dev, pin)       -- Last reported value of an input ("I3", "A2") and its time
+            </pre>
+            
+            <h3>Jobs</h3>
+            <pre>
+spawn(name, fn, ...)      -- Run fn(...) concurrently, with its own command queue
+wait_job(name)            -- Wait until a job has finished and all its commands are acked
+job_name()                -- Name of the running job ("main" for the script itself)
             </pre>
             
             <h3>Robot Functions</h3>
@@ -311,20 +315,23 @@ robot:set_speed(speed)    -- Set movement speed (mm/s)
 robot:home()              -- Home all axes
 robot:set_output(pin, on) -- Control digital output (pin: 0-15)
 robot:set_pwm(pin, value) -- Set PWM output (pin: 0-15, value: 0-255)
+robot:set_auto_feedback(ms) -- M100 position feedback every ms (0 = off)
+robot:get_position()      -- Latest x, y, z, t (nil before any feedback)
+robot:position_history(t) -- Every sample since get_time() value t: {t, x, y, z}
             </pre>
             
             <h3>Conveyor Functions</h3>
             <pre>
-conveyor_move(dev, dir, speed)  -- Move conveyor (dir: "forward"/"backward", speed: 0-100)
-conveyor_stop(dev)              -- Stop conveyor movement
-conveyor_step(dev, steps, speed) -- Move specific steps
+conveyor_move(dev, dir, speed)  -- Run in velocity mode (dir: "forward"/"backward", speed: mm/s)
+conveyor_stop(dev)              -- Stop a conveyor in velocity mode
+conveyor_step(dev, mm, speed)   -- Move mm in position mode at speed mm/s
             </pre>
             
             <h3>Encoder Functions</h3>
             <pre>
-get_encoder_position(dev)       -- Get current position
-reset_encoder(dev)              -- Reset position to zero
-set_encoder_mode(dev, mode)     -- Set mode ("absolute"/"relative")
+get_encoder_position(dev)       -- Last reported position and its time (encoder or conveyor)
+reset_encoder(dev)              -- Reset a conveyor's encoder position to zero
+set_encoder_mode(dev, mode)     -- Set mode ("absolute"/"relative"), encoder or conveyor
             </pre>
         """)
         tab_widget.addTab(device_funcs, "Device Functions")
@@ -337,10 +344,17 @@ set_encoder_mode(dev, mode)     -- Set mode ("absolute"/"relative")
             
             <h3>Time Functions</h3>
             <pre>
-sleep(seconds)            -- Pause execution
+sleep(seconds)            -- Pause this job; devices and other jobs keep running
+wait_until(fn, timeout, interval) -- Wait until fn() is true (false on timeout)
 get_time()               -- Get current time (seconds)
             </pre>
             
+            <h3>Continuous Mode</h3>
+            <pre>
+set_continuous(seconds)  -- Run without the 30 s limit; stop if heartbeat() stops
+heartbeat()              -- Tell the watchdog the script is alive (once per cycle)
+            </pre>
+            
             <h3>Data Processing</h3>
             <pre>
 average(values)          -- Calculate average of array
@@ -398,15 +412,15 @@ if not conveyor then
 end
 
 -- Move conveyor forward
-conveyor_move(conveyor, "forward", 50)  -- 50% speed
+conveyor_move(conveyor, "forward", 50)  -- 50 mm/s
 sleep(2)                                -- Run for 2 seconds
 
 -- Stop conveyor
 conveyor_stop(conveyor)
 sleep(1)
 
--- Move specific steps
-conveyor_step(conveyor, 1000, 30)  -- 1000 steps at 30% speed
+-- Move a set distance
+conveyor_step(conveyor, 100, 30)  -- 100 mm at 30 mm/s
             </pre>
             
             <h3>Encoder Monitoring</h3>
@@ -418,8 +432,7 @@ if not encoder then
     return
 end
 
--- Reset and configure encoder
-reset_encoder(encoder)
+-- Configure encoder
 set_encoder_mode(encoder, "absolute")
 
 -- Monitor position
@@ -445,7 +458,7 @@ end
 
 -- Initialize
 robot:set_speed(100)
-reset_encoder(encoder)
+set_encoder_mode(encoder, "absolute")
 
 -- Main loop
 for i = 1, 5 do
@@ -498,47 +511,32 @@ end
 class ScriptPlugin(BasePlugin):
     # Signal for logging messages
     log_message = pyqtSignal(str)
+    # The runtime subscribes to replies from the devices a script talks to
+    response_routes = ()
     
     def __init__(self, device_manager):
         super().__init__(device_manager)
         self.name = "Script"
         self.description = "Lua scripting for device control"
-        self.lua = LuaRuntime(unpack_returned_tuples=True)
-        self.current_device = None
-        self.command_queue = []
-        self.queue_lock = threading.Lock()
-        self.waiting_response = False
         self.scripts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'scripts')
         
-        # Script execution control
-        self.script_running = False
-        self.stop_requested = False
-        self.script_timeout = None
-        self.lua_thread = None
-        self.last_command = None
-        
-        # Initialize UI and setup environment
+        # Initialize UI
         self.init_ui()
-        self.setup_lua_env()
+        
+        # Scripts and the jobs they spawn run in the runtime, on its own thread
+        self.runtime = ScriptRuntime(device_manager, self.send_command)
+        self.runtime.log_message.connect(self.log_message)
+        self.runtime.output.connect(self.output_console.append)
+        self.runtime.channel.output.connect(self.output_console.append)
+        self.runtime.finished.connect(self.script_stopped)
         self.load_script_list()
         
         # Connect signals
         self.log_message.connect(self.output_console.append)
         
-    def handle_script_timeout(self):
-        """Handle script timeout"""
-        if self.script_running:
-            self.log_message.emit("Script execution timeout")
-            self.stop_script()
-            
-    def check_queue_size(self):
-        """Check if command queue is not too large"""
-        with self.queue_lock:
-            if len(self.command_queue) >= MAX_QUEUE_SIZE:
-                self.log_message.emit("Command queue overflow")
-                self.stop_script()
-                return False
-        return True
+    @property
+    def script_running(self):
+        return self.runtime.running
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -693,18 +691,12 @@ class ScriptPlugin(BasePlugin):
         console_label = QLabel("Output Console")
         main_layout.addWidget(console_label)
         
-        self.output_console = QTextEdit()
-        self.output_console.setReadOnly(True)
+        self.output_console = LogConsole()
         self.output_console.setMaximumHeight(150)  # Limit console height
         main_layout.addWidget(self.output_console)
         
         layout.addWidget(main_widget)
         
-        # Timer for processing command queue
-        self.queue_timer = QTimer()
-        self.queue_timer.timeout.connect(self.process_queue)
-        self.queue_timer.start(100)  # Check queue every 100ms
-
     def load_script_list(self):
         """Load all .lua scripts from the scripts directory"""
         self.script_list.clear()
@@ -825,491 +817,25 @@ print("Script started...")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error saving script: {str(e)}")
 
-    def setup_lua_env(self):
-        """Set up the Lua environment with functions and error handling"""
-        try:
-            # Add global functions to Lua environment
-            lua_globals = self.lua.globals()
-            
-            # Add print function
-            def lua_print(*args):
-                message = " ".join(str(arg) for arg in args)
-                self.output_console.append(message)
-            lua_globals.print = lua_print
-            
-            # Add command queue function
-            def queue_command(command):
-                if not self.script_running:
-                    lua_print("Error: Script not running")
-                    return False
-                    
-                try:
-                    if not self.check_queue_size():
-                        return False
-                        
-                    # Lưu coroutine hiện tại để có thể tiếp tục sau này
-                    current_coroutine = self.lua_thread
-                    
-                    # Thêm lệnh vào queue
-                    with self.queue_lock:
-                        self.command_queue.append(command)
-                        
-                    # Đảm bảo chúng ta không đang đợi phản hồi
-                    if not self.waiting_response:
-                        # Kích hoạt xử lý queue ngay lập tức
-                        self.process_queue()
-                    
-                    # Sau khi gửi lệnh, tạm dừng coroutine để chờ phản hồi
-                    # Sử dụng module yield_ từ thư viện coroutine đã import
-                    return yield_()
-                except Exception as e:
-                    lua_print(f"Error queueing command: {str(e)}")
-                    return False
-            lua_globals.queue_command = queue_command
-
-            # Add robot control methods to Python globals first
-            def robot_move_to(robot, x, y, z):
-                if not isinstance(robot, RobotControl):
-                    lua_print("Error: Invalid robot device")
-                    return False
-                lua_print(f"Sending move command to robot: G1 X{x} Y{y} Z{z}")
-                return queue_command(f"G1 X{x} Y{y} Z{z}")
-            lua_globals.robot_move_to = robot_move_to
-
-            def robot_set_speed(robot, speed):
-                if not isinstance(robot, RobotControl):
-                    lua_print("Error: Invalid robot device")
-                    return False
-                lua_print(f"Setting robot speed: G0 F{speed}")
-                return queue_command(f"G0 F{speed}")
-            lua_globals.robot_set_speed = robot_set_speed
-
-            def robot_home(robot):
-                if not isinstance(robot, RobotControl):
-                    lua_print("Error: Invalid robot device")
-                    return False
-                lua_print("Homing robot: G28")
-                return queue_command("G28")
-            lua_globals.robot_home = robot_home
-
-            # Now set up the robot methods in Lua
-            self.lua.execute("""
-                -- Robot methods
-                function robot_methods(robot)
-                    return {
-                        move_to = function(self, x, y, z)
-                            print("Robot executing move command...")
-                            return robot_move_to(self._robot, x, y, z)
-                        end,
-                        set_speed = function(self, speed)
-                            print("Robot executing speed command...")
-                            return robot_set_speed(self._robot, speed)
-                        end,
-                        home = function(self)
-                            print("Robot executing home command...")
-                            return robot_home(self._robot)
-                        end
-                    }
-                end
-
-                -- Set up metatable for robot
-                robot_mt = {
-                    __index = function(t, k)
-                        local methods = robot_methods(t)
-                        return methods[k]
-                    end
-                }
-
-                -- Function to set up robot object
-                function setup_robot(robot)
-                    return setmetatable({_robot = robot}, robot_mt)
-                end
-            """)
-
-            # Modify get_device to use robot setup
-            old_get_device = lua_globals.get_device
-            def new_get_device(name):
-                device = old_get_device(name)
-                if device and isinstance(device, RobotControl):
-                    return self.lua.eval('setup_robot')(device)
-                return device
-            lua_globals.get_device = new_get_device
-
-            # Conveyor specific functions with error handling
-            def conveyor_move(conveyor, direction, speed):
-                try:
-                    if not isinstance(conveyor, ConveyorControl):
-                        raise TypeError("First argument must be a conveyor device")
-                    if direction not in ["forward", "backward"]:
-                        raise ValueError("Direction must be 'forward' or 'backward'")
-                    if not isinstance(speed, (int, float)) or speed < 0 or speed > 100:
-                        raise ValueError("Speed must be between 0 and 100")
-                        
-                    if direction == "forward":
-                        conveyor.move_forward(speed)
-                    else:
-                        conveyor.move_backward(speed)
-                    return True
-                except Exception as e:
-                    lua_print(f"Error moving conveyor: {str(e)}")
-                    return False
-            lua_globals.conveyor_move = conveyor_move
-            
-            def conveyor_stop(conveyor):
-                try:
-                    if not isinstance(conveyor, ConveyorControl):
-                        raise TypeError("Argument must be a conveyor device")
-                    conveyor.stop()
-                    return True
-                except Exception as e:
-                    lua_print(f"Error stopping conveyor: {str(e)}")
-                    return False
-            lua_globals.conveyor_stop = conveyor_stop
-            
-            def conveyor_step(conveyor, steps, speed):
-                try:
-                    if not isinstance(conveyor, ConveyorControl):
-                        raise TypeError("First argument must be a conveyor device")
-                    if not isinstance(steps, (int, float)):
-                        raise TypeError("Steps must be a number")
-                    if not isinstance(speed, (int, float)) or speed < 0 or speed > 100:
-                        raise ValueError("Speed must be between 0 and 100")
-                        
-                    conveyor.move_steps(steps, speed)
-                    return True
-                except Exception as e:
-                    lua_print(f"Error stepping conveyor: {str(e)}")
-                    return False
-            lua_globals.conveyor_step = conveyor_step
-            
-            # Encoder specific functions with error handling
-            def get_encoder_position(encoder):
-                try:
-                    if not isinstance(encoder, EncoderControl):
-                        raise TypeError("Argument must be an encoder device")
-                    return encoder.get_position()
-                except Exception as e:
-                    lua_print(f"Error getting encoder position: {str(e)}")
-                    return None
-            lua_globals.get_encoder_position = get_encoder_position
-            
-            def reset_encoder(encoder):
-                try:
-                    if not isinstance(encoder, EncoderControl):
-                        raise TypeError("Argument must be an encoder device")
-                    encoder.reset_position()
-                    return True
-                except Exception as e:
-                    lua_print(f"Error resetting encoder: {str(e)}")
-                    return False
-            lua_globals.reset_encoder = reset_encoder
-            
-            def set_encoder_mode(encoder, mode):
-                try:
-                    if not isinstance(encoder, EncoderControl):
-                        raise TypeError("First argument must be an encoder device")
-                    if mode not in ["absolute", "relative"]:
-                        raise ValueError("Mode must be 'absolute' or 'relative'")
-                    encoder.set_mode(mode)
-                    return True
-                except Exception as e:
-                    lua_print(f"Error setting encoder mode: {str(e)}")
-                    return False
-            lua_globals.set_encoder_mode = set_encoder_mode
-            
-            # Math and utility functions
-            lua_globals.math = {
-                'pi': math.pi,
-                'sin': math.sin,
-                'cos': math.cos,
-                'tan': math.tan,
-                'abs': math.fabs,
-                'floor': math.floor,
-                'ceil': math.ceil,
-                'rad': math.radians,
-                'deg': math.degrees,
-                'sqrt': math.sqrt,
-                'min': min,
-                'max': max
-            }
-            
-            # Time functions with error handling
-            def sleep(seconds):
-                try:
-                    if not isinstance(seconds, (int, float)) or seconds < 0:
-                        raise ValueError("Sleep time must be a non-negative number")
-                    if self.stop_requested:
-                        return
-                    time.sleep(seconds)
-                except Exception as e:
-                    lua_print(f"Error in sleep: {str(e)}")
-            lua_globals.sleep = sleep
-            
-            def get_time():
-                try:
-                    return time.time()
-                except Exception as e:
-                    lua_print(f"Error getting time: {str(e)}")
-                    return 0
-            lua_globals.get_time = get_time
-            
-            # Data processing functions with error handling
-            def average(values):
-                try:
-                    if not isinstance(values, (list, tuple)):
-                        raise TypeError("Expected list or tuple")
-                    if not values:
-                        return 0
-                    numeric_values = [float(x) for x in values]
-                    return sum(numeric_values) / len(numeric_values)
-                except Exception as e:
-                    lua_print(f"Error calculating average: {str(e)}")
-                    return 0
-            lua_globals.average = average
-            
-            def median(values):
-                try:
-                    if not isinstance(values, (list, tuple)):
-                        raise TypeError("Expected list or tuple")
-                    if not values:
-                        return 0
-                    numeric_values = sorted([float(x) for x in values])
-                    mid = len(numeric_values) // 2
-                    if len(numeric_values) % 2 == 0:
-                        return (numeric_values[mid-1] + numeric_values[mid]) / 2
-                    return numeric_values[mid]
-                except Exception as e:
-                    lua_print(f"Error calculating median: {str(e)}")
-                    return 0
-            lua_globals.median = median
-            
-            # Add stop check function
-            def check_stop():
-                return self.stop_requested
-            lua_globals.check_stop = check_stop
-            
-            # Basic device functions with error handling
-            def get_device(name):
-                try:
-                    if not isinstance(name, str):
-                        raise TypeError("Device name must be a string")
-                        
-                    for i in range(self.device_manager.device_list.count()):
-                        item = self.device_manager.device_list.item(i)
-                        if item.text() == name:
-                            device = item.device
-                            if device is None:
-                                raise Exception(f"Device {name} is not connected")
-                            self.current_device = device  # Set current device
-                            return device
-                    raise Exception(f"Device {name} not found")
-                except Exception as e:
-                    lua_print(f"Error getting device: {str(e)}")
-                    return None
-            lua_globals.get_device = get_device
-
-        except Exception as e:
-            self.log_message.emit(f"Error setting up Lua environment: {str(e)}")
-            self.output_console.append(traceback.format_exc())
-
     def run_script(self):
         """Run the current script"""
-        try:
-            # Reset state
-            self.script_running = True
-            self.stop_requested = False
-            self.waiting_response = False
-            with self.queue_lock:
-                self.command_queue.clear()
-            self.run_btn.setEnabled(False)
-            self.stop_btn.setEnabled(True)
-            self.output_console.clear()
-            
-            # Set up timeout
-            self.script_timeout = QTimer()
-            self.script_timeout.setSingleShot(True)
-            self.script_timeout.timeout.connect(self.handle_script_timeout)
-            self.script_timeout.start(MAX_SCRIPT_RUNTIME)
-            
-            # Get script content
-            script = self.script_editor.toPlainText()
-            
-            # Tạo một cơ chế coroutine mới rõ ràng hơn
-            self.lua.execute("""
-                function create_and_run_script(script_text)
-                    -- Load the script
-                    local fn, err = load(script_text)
-                    if not fn then
-                        error("Failed to load script: " .. tostring(err))
-                    end
-                    
-                    -- Create coroutine
-                    local co = coroutine.create(fn)
-                    
-                    -- Initial run
-                    local success, result = coroutine.resume(co)
-                    if not success then
-                        error("Script error: " .. tostring(result))
-                    end
-                    
-                    -- Return coroutine for future resuming
-                    return co
-                end
-            """)
-            
-            # Run the script
-            create_and_run = self.lua.globals().create_and_run_script
-            self.lua_thread = create_and_run(script)
-            
-        except Exception as e:
-            self.log_message.emit(f"Script error: {str(e)}")
-            self.output_console.append(traceback.format_exc())
-            self.stop_script()
+        self.run_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.output_console.clear()
+        self.runtime.run(self.script_editor.toPlainText())
 
     def stop_script(self):
         """Stop the current script safely"""
-        try:
-            self.stop_requested = True
-            
-            if hasattr(self, 'lua_thread'):
-                # Set stop flag in Lua environment
-                self.lua.globals().stop_requested = True
-                
-                # Create Lua function to safely stop script
-                self.lua.execute("""
-                    function safe_stop_script(co)
-                        if not co then return end
-                        
-                        local status = coroutine.status(co)
-                        if status == "suspended" then
-                            -- Try to resume one last time to allow cleanup
-                            pcall(coroutine.resume, co)
-                        end
-                    end
-                """)
-                
-                # Stop the script
-                safe_stop = self.lua.globals().safe_stop_script
-                safe_stop(self.lua_thread)
-                    
-            # Clean up
-            with self.queue_lock:
-                self.command_queue.clear()
-            self.waiting_response = False
-            self.script_running = False
-            
-            # Reset UI
-            self.run_btn.setEnabled(True)
-            self.stop_btn.setEnabled(False)
-            
-            # Stop timeout timer
-            if self.script_timeout:
-                self.script_timeout.stop()
-                
-        except Exception as e:
-            self.log_message.emit(f"Error stopping script: {str(e)}")
-            self.output_console.append(traceback.format_exc())
+        self.runtime.request_stop()
 
-    def process_queue(self):
-        """Process commands in the queue"""
-        try:
-            if self.stop_requested:
-                return
-            
-            with self.queue_lock:
-                # Chỉ gửi lệnh tiếp theo khi:
-                # 1. Không đang đợi phản hồi từ lệnh trước (waiting_response = False)
-                # 2. Có lệnh trong queue
-                # 3. Script đang chạy
-                if not self.waiting_response and self.command_queue and self.script_running:
-                    # Lấy lệnh tiếp theo
-                    command = self.command_queue.pop(0)
-                    
-                    # Đánh dấu đang đợi phản hồi và gửi lệnh
-                    self.waiting_response = True
-                    self.last_command = command
-                    self.send_command(command, self.current_device)
-                    self.output_console.append(f"Sent: {command}")
-                    
-                    # Set timeout để tránh treo script
-                    QTimer.singleShot(5000, self.check_command_timeout)
-                    
-        except Exception as e:
-            self.log_message.emit(f"Error processing queue: {str(e)}")
-            self.output_console.append(traceback.format_exc())
-            self.stop_script()
-
-    def check_command_timeout(self):
-        """Check if the current command has timed out"""
-        if self.waiting_response:
-            self.log_message.emit(f"Command timeout: {self.last_command}")
-            self.waiting_response = False
-            
-            # Nếu script vẫn đang chạy, tiếp tục thực thi
-            if self.script_running and hasattr(self, 'lua_thread'):
-                self.resume_script()
+    def cleanup(self):
+        """Stop the script thread"""
+        self.runtime.shutdown()
 
-    def handle_response(self, response, device):
-        """Handle device response"""
-        try:
-            if device == self.current_device and self.waiting_response:
-                self.output_console.append(f"Received: {response}")
-                
-                # Khi nhận được "Ok", tiếp tục thực thi script
-                if response.lower() == "ok":
-                    self.waiting_response = False
-                    
-                    # Nếu script vẫn đang chạy, tiếp tục thực thi
-                    if self.script_running and hasattr(self, 'lua_thread'):
-                        self.resume_script()
-            
-        except Exception as e:
-            self.log_message.emit(f"Error handling response: {str(e)}")
-            self.output_console.append(traceback.format_exc())
-            self.stop_script()
-
-    def resume_script(self):
-        """Resume script execution"""
-        try:
-            # Check if script should continue
-            if self.stop_requested or not self.script_running:
-                return
-                
-            # Resume script execution
-            if hasattr(self, 'lua_thread'):
-                # Create Lua function to safely resume script
-                self.lua.execute("""
-                    function safe_resume_script(co)
-                        if not co then return false, "No coroutine" end
-                        
-                        local status = coroutine.status(co)
-                        if status == "suspended" then
-                            local success, result = coroutine.resume(co)
-                            if not success then
-                                error("Script error: " .. tostring(result))
-                            end
-                            return success, result
-                        elseif status == "dead" then
-                            return true, "Script completed"
-                        end
-                        return false, "Coroutine is " .. status
-                    end
-                """)
-                
-                # Resume the script
-                safe_resume = self.lua.globals().safe_resume_script
-                success, result = safe_resume(self.lua_thread)
-                
-                if success and result == "Script completed":
-                    self.log_message.emit("Script execution completed")
-                    self.stop_script()
-                elif not success:
-                    raise Exception(str(result))
-                    
-        except Exception as e:
-            self.log_message.emit(f"Script error: {str(e)}")
-            self.output_console.append(traceback.format_exc())
-            self.stop_script()
+    def script_stopped(self):
+        """Reset UI once the script and its jobs are done"""
+        self.run_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
 
     def get_completion_words(self):
         return [
@@ -1318,12 +844,15 @@ print("Script started...")
             "repeat", "until", "break", "return", "and", "or", "not",
             
             # Device functions
-            "get_device", "move_to", "set_speed", "home", "set_output",
+            "get_device", "set_stream_mode", "get_queue_stats", "set_command_timeout",
+            "send_async", "wait_reply", "spawn", "wait_job", "job_name", "get_input",
+            "move_to", "set_speed", "home", "set_output",
             "set_pwm", "conveyor_move", "conveyor_stop", "conveyor_step",
             "get_encoder_position", "reset_encoder", "set_encoder_mode",
             
             # Utility functions
-            "sleep", "get_time", "average", "median", "print",
+            "sleep", "wait_until", "get_time", "average", "median", "print",
+            "set_continuous", "heartbeat",
             
             # Math functions
             "math.sin", "math.cos", "math.tan", "math.abs", "math.sqrt",
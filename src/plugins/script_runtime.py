@@ -0,0 +1,1245 @@
+"""
+Lua script execution: one coroutine per job, scheduled on device replies
+"""
+from PyQt5.QtCore import QObject, QThread, QTimer, Qt, pyqtSignal, pyqtSlot
+import lupa
+from lupa import LuaRuntime
+import os
+import time
+import heapq
+import hashlib
+from collections import deque, OrderedDict
+import math
+import traceback
+import sys
+
+# Add parent directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.robot_control import RobotControl
+from components.conveyor_control import ConveyorControl
+from components.encoder_control import EncoderControl
+from components.command_window import (CommandWindow, MODE_STOP_AND_WAIT, MODE_BYTES,
+                                       STREAM_MODES, DEFAULT_WINDOW_SIZE, DEFAULT_RX_BUFFER)
+from components.command_deadlines import CommandTimeouts
+from components.command_futures import CommandFuture, TIMED_OUT, NOT_SENT
+from components.memory_usage import process_rss
+
+from .script_channel import MessageQueue, DeviceChannel
+
+# Constants
+MAX_SCRIPT_RUNTIME = 30000  # 30 seconds
+MAX_SCRIPT_CPU_TIME = 20000  # ms of worker-thread CPU time per run
+CHECK_INTERVAL = 10000  # Lua instructions between budget and stop checks; 0 turns the hook off
+MAX_QUEUE_SIZE = 1000  # Per job
+QUEUE_WAIT_HISTORY = 1000  # Queue-wait samples kept for statistics, per job
+MAIN_JOB = "main"  # The script itself; spawn() adds the others
+WAIT_POLL_INTERVAL = 0.01  # s; how often wait_until() checks its condition by default
+SCRIPT_CACHE_SIZE = 32  # Compiled scripts kept, keyed by content hash
+WATCHDOG_TIMEOUT = 10.0  # s without heartbeat() before a continuous script is stopped
+MAINTENANCE_INTERVAL = 1000  # ms between Lua GC steps and memory checks while a script runs
+LUA_MEMORY_LIMIT = 256 * 1024 * 1024  # Bytes; allocations past this fail in the script
+LUA_MEMORY_ALARM = 64 * 1024 * 1024  # Bytes of Lua heap that raise an alarm
+RSS_ALARM = 1024 * 1024 * 1024  # Bytes of process memory that raise an alarm
+ALARM_RESET = 0.9  # An alarm re-arms once usage falls below this fraction of its ceiling
+ENCODER_MODES = {"absolute": 0, "relative": 1}  # set_encoder_mode() names of the M316 modes
+
+
+class ScriptJob:
+    """One script coroutine with its own command queue and ack tracking.
+
+    Jobs only share the devices they talk to, so an ack from one robot
+    resumes that robot's job and nothing else.
+    """
+
+    def __init__(self, name, thread=None, stream=None):
+        self.name = name
+        self.thread = thread  # Lua coroutine
+        self.current_device = None
+        self.command_queue = deque()  # (command, device, queued_time)
+        self.queue_waits = deque(maxlen=QUEUE_WAIT_HISTORY)  # seconds spent queued
+        self.command_windows = {}  # device -> CommandWindow
+        self.waiting_response = False
+        self.waiting_future = None  # Reply the job is blocked on in wait_reply()
+        self.waiting_job = None  # Job it is blocked on in wait_job()
+        self.sleep_until = None  # time.monotonic() deadline of sleep()
+        self.last_command = None
+        self.finished = False
+        # Command streaming (stop-and-wait unless the script opts in)
+        self.stream_mode, self.stream_window_size, self.stream_rx_buffer = stream or (
+            MODE_STOP_AND_WAIT, DEFAULT_WINDOW_SIZE, DEFAULT_RX_BUFFER)
+
+    @property
+    def stream(self):
+        return self.stream_mode, self.stream_window_size, self.stream_rx_buffer
+
+    def get_command_window(self, device):
+        """Get the in-flight window for a device, creating it on first use"""
+        window = self.command_windows.get(device)
+        if window is None:
+            window = CommandWindow(*self.stream)
+            self.command_windows[device] = window
+        return window
+
+    def configure_streaming(self, mode, size=None):
+        """Select stop-and-wait, count or bytes streaming for this job's devices"""
+        if mode not in STREAM_MODES:
+            raise ValueError(f"Stream mode must be one of: {', '.join(STREAM_MODES)}")
+        if size is not None:
+            if mode == MODE_BYTES:
+                self.stream_rx_buffer = int(size)
+            else:
+                self.stream_window_size = int(size)
+        self.stream_mode = mode
+        for window in self.command_windows.values():
+            window.configure(*self.stream)
+
+    def commands_pending(self):
+        """Check if any command is still queued or waiting for its ack"""
+        if self.command_queue:
+            return True
+        return any(len(window) for window in self.command_windows.values())
+
+    def can_resume(self):
+        """Check if the job may continue past its last queued command"""
+        if self.waiting_future is not None and not self.waiting_future.done():
+            return False
+        if self.waiting_job is not None and not self.waiting_job.finished:
+            return False
+        if self.sleep_until is not None:
+            return False
+        if self.command_queue:
+            return False
+        if self.stream_mode == MODE_STOP_AND_WAIT:
+            return not self.commands_pending()
+        return True
+
+    def get_queue_stats(self):
+        """Summarize how long recent commands waited in the queue before sending"""
+        waits = sorted(self.queue_waits)
+        if not waits:
+            return {'count': 0, 'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'count': len(waits),
+            'avg_ms': sum(waits) / len(waits) * 1000,
+            'p95_ms': waits[int(0.95 * (len(waits) - 1))] * 1000,
+            'max_ms': waits[-1] * 1000,
+        }
+
+    def clear(self):
+        self.command_queue.clear()
+        for window in self.command_windows.values():
+            window.clear()
+        self.waiting_future = None
+        self.waiting_job = None
+        self.sleep_until = None
+        self.waiting_response = False
+
+
+class ScriptRuntime(QObject):
+    """Runs a Lua script and the jobs it spawns on a thread of its own.
+
+    Every job is a coroutine on the same LuaRuntime; it yields when its
+    window to a device is full and is resumed when that device acks, so
+    jobs driving different robots proceed independently. sleep() yields
+    too, and one timer wakes sleeping jobs. Python functions called from
+    Lua act on current_job, the job being resumed.
+
+    The runtime lives on its worker thread; the devices stay on the GUI
+    thread. Commands go out through channel and come back as settled
+    handles through replies, so a busy script never delays serial
+    servicing and a busy GUI never stalls the script. run() and
+    request_stop() are called from the GUI thread.
+    """
+    log_message = pyqtSignal(str)
+    output = pyqtSignal(str, object)  # Console line and its source device (or None)
+    finished = pyqtSignal()
+    run_requested = pyqtSignal(str)
+    stop_requested_signal = pyqtSignal()
+
+    def __init__(self, device_manager, send_command):
+        super().__init__()
+        self.device_manager = device_manager
+        self.replies = MessageQueue(self.settle_reply, self)
+        self.channel = DeviceChannel(device_manager.router, send_command, self.replies)
+        device_manager.device_removed.connect(self.channel.forget_device)
+        self.lua = LuaRuntime(unpack_returned_tuples=True, max_memory=LUA_MEMORY_LIMIT)
+        self.jobs = {}  # name -> ScriptJob; spawned jobs are dropped when they finish
+        self.current_job = None
+        self.running = False
+        self.stop_requested = False
+        # The run-time limit, or the watchdog in continuous mode
+        self.script_timeout = QTimer(self)
+        self.script_timeout.setSingleShot(True)
+        self.script_timeout.timeout.connect(self.handle_script_timeout)
+        # Budgets, enforced inside running Lua code by an instruction-count hook
+        self.time_limit = MAX_SCRIPT_RUNTIME
+        self.cpu_time_limit = MAX_SCRIPT_CPU_TIME
+        self.check_interval = CHECK_INTERVAL
+        self.deadline = None  # time.monotonic() of the wall-clock limit
+        self.cpu_deadline = None  # time.thread_time() of the CPU limit
+        self.interrupted = None  # Why the hook stopped the script
+        self.watchdog = None  # Heartbeat timeout (s) of a script in continuous mode
+
+        # Memory, sampled by the maintenance timer; readable from any thread
+        self.lua_memory = 0  # Bytes of Lua heap
+        self.rss = None  # Bytes resident, where the platform reports it
+        self.memory_alarms = set()  # Ceilings currently exceeded
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.maintain)
+        # Reply timeouts by command class; the devices time commands out themselves
+        self.command_timeouts = CommandTimeouts()
+        self.next_command_seq = 0
+        
+        # Sleeping jobs, earliest wake-up first: (wake time, seq, job)
+        self.sleepers = []
+        self.next_sleeper_seq = 0
+        self.wake_timer = QTimer(self)
+        self.wake_timer.setSingleShot(True)
+        self.wake_timer.setTimerType(Qt.PreciseTimer)
+        self.wake_timer.timeout.connect(self.wake_sleepers)
+        self.setup_lua_env()
+        
+        # Compiled scripts by SHA-1 of their text, least recently run first
+        self.chunk_cache = OrderedDict()
+        
+        self.run_requested.connect(self.start, Qt.QueuedConnection)
+        self.stop_requested_signal.connect(self.stop, Qt.QueuedConnection)
+        self.worker = QThread()
+        self.moveToThread(self.worker)
+        self.worker.start()
+
+    def run(self, script):
+        """Start a script on the worker thread"""
+        self.running = True
+        self.stop_requested = False
+        self.channel.active = True
+        self.run_requested.emit(script)
+
+    def request_stop(self):
+        """Ask the script to stop; it does at its next wait"""
+        self.stop_requested = True
+        self.stop_requested_signal.emit()
+
+    def shutdown(self):
+        """Stop the script and the worker thread"""
+        self.request_stop()
+        self.worker.quit()
+        self.worker.wait()
+
+    def settle_reply(self, message):
+        """Settle a script's command handle with the device's reply"""
+        handle, future = message
+        handle.frames = future.frames
+        handle.settle(future.state, future.error)
+
+    def send(self, command, device):
+        """Hand a command to the GUI thread; returns the handle its reply settles"""
+        handle = CommandFuture(command)
+        self.channel.send(command, device, self.command_timeouts.get(command), handle)
+        return handle
+
+    def print(self, message):
+        self.output.emit(str(message), None)
+
+    @pyqtSlot()
+    def handle_script_timeout(self):
+        """Handle script timeout"""
+        if self.running:
+            self.log_message.emit(self.timeout_message())
+            self.stop()
+
+    def timeout_message(self):
+        if self.watchdog is not None:
+            return f"Watchdog timeout: no heartbeat for {self.watchdog:g} s"
+        return "Script execution timeout"
+
+    def heartbeat(self):
+        """Push the watchdog deadline of a continuous script forward"""
+        if self.watchdog is None:
+            return
+        self.deadline = time.monotonic() + self.watchdog
+        self.script_timeout.start(int(self.watchdog * 1000))
+
+    @pyqtSlot()
+    def maintain(self):
+        """Periodic upkeep while a script runs: a Lua GC step between
+        resumes, then the memory figures and their alarms"""
+        self.gc_step()
+        self.lua_memory = int(self.lua_memory_kb() * 1024)
+        if self.lua_memory > LUA_MEMORY_ALARM * ALARM_RESET:
+            # Old garbage waits for a major collection; do one before alarming
+            self.gc_full()
+            self.lua_memory = int(self.lua_memory_kb() * 1024)
+        self.rss = process_rss()
+        self.check_memory_alarm("Lua heap", self.lua_memory, LUA_MEMORY_ALARM)
+        if self.rss is not None:
+            self.check_memory_alarm("Process memory", self.rss, RSS_ALARM)
+
+    def check_memory_alarm(self, name, used, ceiling):
+        """Log once when usage crosses a ceiling, and once when it is back under"""
+        if name not in self.memory_alarms:
+            if used > ceiling:
+                self.memory_alarms.add(name)
+                self.log_message.emit(
+                    f"Memory alarm: {name} {used / 2**20:.1f} MB over {ceiling / 2**20:.0f} MB")
+        elif used < ceiling * ALARM_RESET:
+            self.memory_alarms.discard(name)
+            self.log_message.emit(f"Memory alarm cleared: {name} {used / 2**20:.1f} MB")
+
+    def check_budget(self):
+        """Called by the hook every check_interval instructions; returns why
+        the running script must stop, or None"""
+        if self.interrupted is None:
+            if self.stop_requested:
+                self.interrupted = "Script stopped"
+            elif self.deadline is not None and time.monotonic() > self.deadline:
+                self.interrupted = self.timeout_message()
+            elif self.cpu_deadline is not None and time.thread_time() > self.cpu_deadline:
+                self.interrupted = "Script CPU time limit exceeded"
+        return self.interrupted
+
+    def report_error(self, job, error):
+        """Log a failed job and stop; an interruption is not a script error"""
+        if self.interrupted:
+            self.log_message.emit(self.interrupted)
+        else:
+            self.log_message.emit(f"Script error{self.job_label(job)}: {str(error)}")
+            self.print(traceback.format_exc())
+        self.stop()
+
+    def check_queue_size(self, job):
+        """Check if a job's command queue is not too large"""
+        if len(job.command_queue) >= MAX_QUEUE_SIZE:
+            self.log_message.emit(f"Command queue overflow{self.job_label(job)}")
+            self.stop()
+            return False
+        return True
+
+    def job_label(self, job):
+        """Job name to append to messages when several jobs run"""
+        return "" if len(self.jobs) < 2 else f" ({job.name})"
+
+    def arm_wake_timer(self):
+        """Schedule the wake-up of the earliest sleeping job"""
+        if not self.sleepers:
+            self.wake_timer.stop()
+            return
+        delay = self.sleepers[0][0] - time.monotonic()
+        self.wake_timer.start(max(0, int(delay * 1000 + 0.999)))
+
+    @pyqtSlot()
+    def wake_sleepers(self):
+        """Resume the jobs whose sleep is over"""
+        now = time.monotonic()
+        while self.sleepers and self.sleepers[0][0] <= now:
+            wake_time, _, job = heapq.heappop(self.sleepers)
+            if job.sleep_until == wake_time:
+                job.sleep_until = None
+                self.resume_if_ready(job)
+        if self.running:
+            self.arm_wake_timer()
+
+    def setup_lua_env(self):
+        """Set up the Lua environment with functions and error handling"""
+        try:
+            # Add global functions to Lua environment
+            lua_globals = self.lua.globals()
+
+            # Add print function
+            def lua_print(*args):
+                self.print(" ".join(str(arg) for arg in args))
+            lua_globals.print = lua_print
+
+            def unwrap_device(device):
+                """Device behind a Lua robot wrapper (see setup_robot)"""
+                if lupa.lua_type(device) == 'table':
+                    return device._robot
+                return device
+
+            # Add command queue function; device defaults to the last one from get_device()
+            def queue_command(command, device=None):
+                if not self.running:
+                    lua_print("Error: Script not running")
+                    return False
+
+                try:
+                    job = self.current_job
+                    if not self.check_queue_size(job):
+                        return False
+
+                    # Thêm lệnh vào queue của job cùng với thiết bị đích và thời điểm xếp hàng
+                    device = unwrap_device(device) if device is not None else job.current_device
+                    job.command_queue.append((command, device, time.perf_counter()))
+
+                    # Gửi ngay nếu cửa sổ lệnh còn chỗ
+                    self.process_queue(job)
+
+                    # Báo cho Lua biết có cần tạm dừng coroutine để chờ phản hồi hay không
+                    if job.can_resume():
+                        return "sent"
+                    job.waiting_response = True
+                    return "wait"
+                except Exception as e:
+                    lua_print(f"Error queueing command: {str(e)}")
+                    return False
+            lua_globals._queue_command = queue_command
+
+            # Commands outside the queue: each device answers its own, so a
+            # robot, a conveyor and an encoder can all have one outstanding
+            def send_async(device, command):
+                if not self.running:
+                    lua_print("Error: Script not running")
+                    return None
+                return self.send(str(command), unwrap_device(device))
+            lua_globals.send_async = send_async
+
+            def wait_future(future):
+                if future is None or future.done():
+                    return "sent"
+                job = self.current_job
+                job.waiting_future = future
+                job.waiting_response = True
+                future.add_done_callback(lambda future: self.resume_if_ready(job))
+                return "wait"
+            lua_globals._wait_future = wait_future
+
+            def reply_result(future):
+                if future is None:
+                    return False, "not sent", None
+                self.current_job.waiting_future = None
+                value = future.value
+                if isinstance(value, (tuple, list)):
+                    value = self.lua.table_from(value, recursive=True)
+                return future.succeeded(), future.response, value
+            lua_globals._reply_result = reply_result
+
+            # Jobs: coroutines with their own queue, e.g. one per robot
+            def spawn(name, fn):
+                if not self.running:
+                    lua_print("Error: Script not running")
+                    return False
+                name = str(name)
+                job = self.jobs.get(name)
+                if job is not None and not job.finished:
+                    lua_print(f"Error: job {name} is already running")
+                    return False
+                job = ScriptJob(name, stream=self.current_job.stream)
+                self.jobs[name] = job
+                # Started from the event loop, once the spawning job yields or returns
+                QTimer.singleShot(0, lambda: self.start_job(job, fn))
+                return True
+            lua_globals._spawn = spawn
+
+            def wait_job(name):
+                job = self.jobs.get(str(name))
+                if job is None or job.finished or job is self.current_job:
+                    return "sent"
+                self.current_job.waiting_job = job
+                self.current_job.waiting_response = True
+                return "wait"
+            lua_globals._wait_job = wait_job
+
+            def job_name():
+                return self.current_job.name if self.current_job else None
+            lua_globals.job_name = job_name
+
+            def set_stream_mode(mode, size=None):
+                try:
+                    self.current_job.configure_streaming(mode, size)
+                    return True
+                except Exception as e:
+                    lua_print(f"Error setting stream mode: {str(e)}")
+                    return False
+            lua_globals.set_stream_mode = set_stream_mode
+
+            def get_queue_stats():
+                return self.lua.table_from(self.current_job.get_queue_stats())
+            lua_globals.get_queue_stats = get_queue_stats
+
+            def set_command_timeout(prefix, seconds):
+                try:
+                    self.command_timeouts.set(str(prefix), float(seconds))
+                    return True
+                except Exception as e:
+                    lua_print(f"Error setting command timeout: {str(e)}")
+                    return False
+            lua_globals.set_command_timeout = set_command_timeout
+
+            # Add robot control methods to Python globals first
+            def robot_move_to(robot, x, y, z):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                lua_print(f"Sending move command to robot: G1 X{x} Y{y} Z{z}")
+                return queue_command(f"G1 X{x} Y{y} Z{z}", robot)
+            lua_globals.robot_move_to = robot_move_to
+
+            def robot_set_speed(robot, speed):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                lua_print(f"Setting robot speed: G0 F{speed}")
+                return queue_command(f"G0 F{speed}", robot)
+            lua_globals.robot_set_speed = robot_set_speed
+
+            def robot_home(robot):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                lua_print("Homing robot: G28")
+                return queue_command("G28", robot)
+            lua_globals.robot_home = robot_home
+
+            def robot_set_output(robot, pin, state):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                return queue_command(f"M03 D{pin}" if state else f"M05 D{pin}", robot)
+            lua_globals.robot_set_output = robot_set_output
+
+            def robot_set_pwm(robot, pin, value):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                return queue_command(f"M03 P{pin} W{value}", robot)
+            lua_globals.robot_set_pwm = robot_set_pwm
+
+            def robot_set_auto_feedback(robot, period_ms):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return False
+                if period_ms and period_ms > 0:
+                    return queue_command(
+                        f"M100 A1 B{int(period_ms)} C{robot.transport.feedback_port()}", robot)
+                return queue_command("M100 A0", robot)
+            lua_globals.robot_set_auto_feedback = robot_set_auto_feedback
+
+            def robot_get_position(robot):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return None
+                sample = robot.get_position()
+                if sample is None:
+                    return None
+                timestamp, (x, y, z) = sample
+                return x, y, z, timestamp
+            lua_globals.robot_get_position = robot_get_position
+
+            def robot_position_history(robot, since=0):
+                if not isinstance(robot, RobotControl):
+                    lua_print("Error: Invalid robot device")
+                    return None
+                # Every sample since the given get_time() value, at full feedback rate
+                return self.lua.table_from([
+                    self.lua.table_from({'t': timestamp, 'x': x, 'y': y, 'z': z})
+                    for timestamp, (x, y, z) in robot.get_position_history(since or 0)
+                ])
+            lua_globals.robot_position_history = robot_position_history
+
+            lua_globals.WAIT_POLL_INTERVAL = WAIT_POLL_INTERVAL
+
+            # Now set up the robot methods in Lua
+            self.lua.execute("""
+                -- Suspend the script until the queued command may proceed
+                function wait_command(status)
+                    if status == "wait" then
+                        coroutine.yield()
+                    end
+                    return status ~= false
+                end
+
+                function queue_command(command, device)
+                    return wait_command(_queue_command(command, device))
+                end
+
+                -- Wait for the reply to a send_async() handle: ok, response, value
+                function wait_reply(handle)
+                    wait_command(_wait_future(handle))
+                    return _reply_result(handle)
+                end
+
+                -- Pause this job; other jobs and the devices carry on
+                function sleep(seconds)
+                    wait_command(_sleep(seconds))
+                end
+
+                -- Wait until predicate() is true, checking it every interval
+                -- seconds; false if timeout seconds pass first
+                function wait_until(predicate, timeout, interval)
+                    local deadline = timeout and get_time() + timeout
+                    while not predicate() do
+                        if check_stop() or (deadline and get_time() >= deadline) then
+                            return false
+                        end
+                        sleep(interval or WAIT_POLL_INTERVAL)
+                    end
+                    return true
+                end
+
+                -- Run fn(...) as a job of its own, with its own command queue
+                function spawn(name, fn, ...)
+                    local args = table.pack(...)
+                    return _spawn(name, function()
+                        return fn(table.unpack(args, 1, args.n))
+                    end)
+                end
+
+                -- Run fn as a coroutine up to its first yield; returns the coroutine
+                function start_coroutine(fn)
+                    local co = coroutine.create(fn)
+                    local success, result = coroutine.resume(co)
+                    if not success then
+                        error("Script error: " .. tostring(result))
+                    end
+                    return co
+                end
+
+                -- Compile a script; returns the chunk, or nil and the error
+                function compile_script(script_text)
+                    local fn, err = load(script_text, "=script")
+                    return fn, err
+                end
+
+                -- Point a compiled chunk's globals (its _ENV upvalue) at env
+                function bind_environment(chunk, env)
+                    debug.setupvalue(chunk, 1, env)
+                    return chunk
+                end
+
+                function safe_resume_script(co)
+                    if not co then return false, "No coroutine" end
+
+                    local status = coroutine.status(co)
+                    if status == "suspended" then
+                        local success, result = coroutine.resume(co)
+                        if not success then
+                            error("Script error: " .. tostring(result))
+                        end
+                        return success, result
+                    elseif status == "dead" then
+                        return true, "Script completed"
+                    end
+                    return false, "Coroutine is " .. status
+                end
+
+                function safe_stop_script(co)
+                    if not co then return end
+
+                    local status = coroutine.status(co)
+                    if status == "suspended" then
+                        -- Abandon the job at its wait: nothing after it runs,
+                        -- only the job's pending to-be-closed variables
+                        pcall(coroutine.close, co)
+                    end
+                end
+
+                -- Wait until a spawned job has returned and all its commands are acked
+                function wait_job(name)
+                    return wait_command(_wait_job(name))
+                end
+
+                -- Robot methods
+                function robot_methods()
+                    return {
+                        move_to = function(self, x, y, z)
+                            print("Robot executing move command...")
+                            return wait_command(robot_move_to(self._robot, x, y, z))
+                        end,
+                        set_speed = function(self, speed)
+                            print("Robot executing speed command...")
+                            return wait_command(robot_set_speed(self._robot, speed))
+                        end,
+                        home = function(self)
+                            print("Robot executing home command...")
+                            return wait_command(robot_home(self._robot))
+                        end,
+                        set_output = function(self, pin, on)
+                            return wait_command(robot_set_output(self._robot, pin, on))
+                        end,
+                        set_pwm = function(self, pin, value)
+                            return wait_command(robot_set_pwm(self._robot, pin, value))
+                        end,
+                        set_auto_feedback = function(self, period_ms)
+                            return wait_command(robot_set_auto_feedback(self._robot, period_ms))
+                        end,
+                        get_position = function(self)
+                            return robot_get_position(self._robot)
+                        end,
+                        position_history = function(self, since)
+                            return robot_position_history(self._robot, since)
+                        end
+                    }
+                end
+
+                -- Set up metatable for robot; the methods are built once and shared
+                robot_mt = {
+                    __index = robot_methods()
+                }
+
+                -- Function to set up robot object
+                function setup_robot(robot)
+                    return setmetatable({_robot = robot}, robot_mt)
+                end
+            """)
+
+            # Conveyor and encoder settings go through the job's command queue
+            # as G-code (gc_industrial_conveyor.md, gc_encoder.md); the Lua
+            # functions of the same names wait for them like queue_command()
+            def queue_commands(commands, device):
+                status = "sent"
+                for command in commands:
+                    status = queue_command(command, device)
+                    if status is False:
+                        return False
+                return status
+
+            def conveyor_move(conveyor, direction, speed):
+                try:
+                    conveyor = unwrap_device(conveyor)
+                    if not isinstance(conveyor, ConveyorControl):
+                        raise TypeError("First argument must be a conveyor device")
+                    if direction not in ["forward", "backward"]:
+                        raise ValueError("Direction must be 'forward' or 'backward'")
+                    if not isinstance(speed, (int, float)) or speed < 0:
+                        raise ValueError("Speed must be a positive number of mm/s")
+
+                    velocity = speed if direction == "forward" else -speed
+                    return queue_commands(["M310 2", f"M311 {velocity}"], conveyor)
+                except Exception as e:
+                    lua_print(f"Error moving conveyor: {str(e)}")
+                    return False
+            lua_globals._conveyor_move = conveyor_move
+
+            def conveyor_stop(conveyor):
+                try:
+                    conveyor = unwrap_device(conveyor)
+                    if not isinstance(conveyor, ConveyorControl):
+                        raise TypeError("Argument must be a conveyor device")
+                    return queue_command("M311 0", conveyor)
+                except Exception as e:
+                    lua_print(f"Error stopping conveyor: {str(e)}")
+                    return False
+            lua_globals._conveyor_stop = conveyor_stop
+
+            def conveyor_step(conveyor, distance, speed):
+                try:
+                    conveyor = unwrap_device(conveyor)
+                    if not isinstance(conveyor, ConveyorControl):
+                        raise TypeError("First argument must be a conveyor device")
+                    if not isinstance(distance, (int, float)):
+                        raise TypeError("Distance must be a number")
+                    if not isinstance(speed, (int, float)) or speed <= 0:
+                        raise ValueError("Speed must be a positive number of mm/s")
+
+                    # Entering position mode zeroes the position, so the move is relative
+                    return queue_commands(["M310 1", f"M313 {speed}", f"M312 {distance}"], conveyor)
+                except Exception as e:
+                    lua_print(f"Error stepping conveyor: {str(e)}")
+                    return False
+            lua_globals._conveyor_step = conveyor_step
+
+            # Encoder specific functions with error handling; positions are read from
+            # what the device last reported, so any number of jobs can poll them
+            def get_encoder_position(encoder):
+                try:
+                    encoder = unwrap_device(encoder)
+                    if not isinstance(encoder, (EncoderControl, ConveyorControl)):
+                        raise TypeError("Argument must be an encoder or conveyor device")
+                    sample = encoder.get_position()
+                    if sample is None:
+                        return None
+                    timestamp, position = sample
+                    return position, timestamp
+                except Exception as e:
+                    lua_print(f"Error getting encoder position: {str(e)}")
+                    return None
+            lua_globals.get_encoder_position = get_encoder_position
+
+            def get_input(device, pin):
+                try:
+                    sample = unwrap_device(device).get_input(str(pin))
+                    if sample is None:
+                        return None
+                    timestamp, value = sample
+                    return value, timestamp
+                except Exception as e:
+                    lua_print(f"Error getting input: {str(e)}")
+                    return None
+            lua_globals.get_input = get_input
+
+            def reset_encoder(conveyor):
+                try:
+                    conveyor = unwrap_device(conveyor)
+                    if not isinstance(conveyor, ConveyorControl):
+                        # The X Encoder has no reset; relative mode reports each change instead
+                        raise TypeError("Argument must be a conveyor device")
+                    return queue_command("M317 R", conveyor)
+                except Exception as e:
+                    lua_print(f"Error resetting encoder: {str(e)}")
+                    return False
+            lua_globals._reset_encoder = reset_encoder
+
+            def set_encoder_mode(encoder, mode):
+                try:
+                    encoder = unwrap_device(encoder)
+                    if not isinstance(encoder, (EncoderControl, ConveyorControl)):
+                        raise TypeError("First argument must be an encoder or conveyor device")
+                    if mode not in ENCODER_MODES:
+                        raise ValueError("Mode must be 'absolute' or 'relative'")
+                    return queue_command(f"M316 {ENCODER_MODES[mode]}", encoder)
+                except Exception as e:
+                    lua_print(f"Error setting encoder mode: {str(e)}")
+                    return False
+            lua_globals._set_encoder_mode = set_encoder_mode
+
+            self.lua.execute("""
+                for _, name in ipairs({"conveyor_move", "conveyor_stop", "conveyor_step",
+                                       "reset_encoder", "set_encoder_mode"}) do
+                    local queue = _G["_" .. name]
+                    _G[name] = function(...)
+                        return wait_command(queue(...))
+                    end
+                end
+            """)
+
+            # Math and utility functions, as a Lua table so it can be frozen
+            lua_globals.math = self.lua.table_from({
+                'pi': math.pi,
+                'sin': math.sin,
+                'cos': math.cos,
+                'tan': math.tan,
+                'abs': math.fabs,
+                'floor': math.floor,
+                'ceil': math.ceil,
+                'rad': math.radians,
+                'deg': math.degrees,
+                'sqrt': math.sqrt,
+                'min': min,
+                'max': max
+            })
+
+            # Time functions with error handling; sleep yields the job and the
+            # wake timer resumes it, so devices and other jobs keep running
+            def sleep(seconds):
+                try:
+                    if not isinstance(seconds, (int, float)) or seconds < 0:
+                        raise ValueError("Sleep time must be a non-negative number")
+                    if self.stop_requested:
+                        return "wait"  # Hand control back to stop()
+                    job = self.current_job
+                    job.sleep_until = time.monotonic() + seconds
+                    job.waiting_response = True
+                    heapq.heappush(self.sleepers, (job.sleep_until, self.next_sleeper_seq, job))
+                    self.next_sleeper_seq += 1
+                    if self.sleepers[0][2] is job:
+                        self.arm_wake_timer()
+                    return "wait"
+                except Exception as e:
+                    lua_print(f"Error in sleep: {str(e)}")
+                    return False
+            lua_globals._sleep = sleep
+
+            def get_time():
+                try:
+                    return time.time()
+                except Exception as e:
+                    lua_print(f"Error getting time: {str(e)}")
+                    return 0
+            lua_globals.get_time = get_time
+
+            # Data processing functions with error handling
+            def average(values):
+                try:
+                    if not isinstance(values, (list, tuple)):
+                        raise TypeError("Expected list or tuple")
+                    if not values:
+                        return 0
+                    numeric_values = [float(x) for x in values]
+                    return sum(numeric_values) / len(numeric_values)
+                except Exception as e:
+                    lua_print(f"Error calculating average: {str(e)}")
+                    return 0
+            lua_globals.average = average
+
+            def median(values):
+                try:
+                    if not isinstance(values, (list, tuple)):
+                        raise TypeError("Expected list or tuple")
+                    if not values:
+                        return 0
+                    numeric_values = sorted([float(x) for x in values])
+                    mid = len(numeric_values) // 2
+                    if len(numeric_values) % 2 == 0:
+                        return (numeric_values[mid-1] + numeric_values[mid]) / 2
+                    return numeric_values[mid]
+                except Exception as e:
+                    lua_print(f"Error calculating median: {str(e)}")
+                    return 0
+            lua_globals.median = median
+
+            # Add stop check function
+            def check_stop():
+                return self.stop_requested
+            lua_globals.check_stop = check_stop
+
+            # Continuous mode: no run-time cap, a watchdog on heartbeat() instead
+            def set_continuous(watchdog=WATCHDOG_TIMEOUT):
+                try:
+                    if not isinstance(watchdog, (int, float)) or watchdog <= 0:
+                        raise ValueError("Watchdog timeout must be a positive number")
+                    self.watchdog = float(watchdog)
+                    self.cpu_deadline = None
+                    self.heartbeat()
+                    return True
+                except Exception as e:
+                    lua_print(f"Error setting continuous mode: {str(e)}")
+                    return False
+            lua_globals.set_continuous = set_continuous
+            lua_globals.heartbeat = self.heartbeat
+
+            # Basic device functions with error handling
+            def get_device(name):
+                try:
+                    if not isinstance(name, str):
+                        raise TypeError("Device name must be a string")
+
+                    device = self.device_manager.get_device(name)
+                    if device is None:
+                        raise Exception(f"Device {name} not found")
+                    if self.current_job is not None:
+                        self.current_job.current_device = device  # Set current device
+                    return device
+                except Exception as e:
+                    lua_print(f"Error getting device: {str(e)}")
+                    return None
+            lua_globals.get_device = get_device
+
+            # Wrap robots so their methods go through the command queue
+            setup_robot = lua_globals.setup_robot
+            def get_robot_device(name):
+                device = get_device(name)
+                if device and isinstance(device, RobotControl):
+                    return setup_robot(device)
+                return device
+            lua_globals.get_device = get_robot_device
+
+            # Every coroutine, the jobs' and any the script creates, gets a
+            # count hook that checks the budgets, so pure-Lua loops can be
+            # preempted. Once it trips, it fails every instruction: a pcall
+            # in the script cannot swallow it.
+            self.set_check_interval = self.lua.execute("""
+                local check_budget, interval = ...
+                local create, resume, sethook = coroutine.create, coroutine.resume, debug.sethook
+
+                local function budget_hook()
+                    local reason = check_budget()
+                    if reason then
+                        sethook(budget_hook, "", 1)
+                        error(reason, 0)
+                    end
+                end
+
+                function coroutine.create(fn)
+                    local co = create(fn)
+                    if interval > 0 then
+                        sethook(co, budget_hook, "", interval)
+                    end
+                    return co
+                end
+
+                local function wrap_results(ok, ...)
+                    if not ok then error((...), 0) end
+                    return ...
+                end
+
+                function coroutine.wrap(fn)
+                    local co = coroutine.create(fn)
+                    return function(...)
+                        return wrap_results(resume(co, ...))
+                    end
+                end
+
+                return function(count)
+                    interval = count
+                end
+            """, self.check_budget, CHECK_INTERVAL)
+
+            # Scripts run in an environment of their own that inherits from a
+            # read-only copy of everything defined above. The debug library
+            # stays with the runtime (it could remove the budget hook); scripts
+            # only get its traceback.
+            self.new_environment = self.lua.execute("""
+                local frozen = {}
+                -- These write straight past a proxy into the table it copies
+                local hidden = {[rawset] = true, [rawget] = true}
+                -- Strings index the real string library through their metatable
+                getmetatable("").__metatable = false
+
+                local function read_only(t)
+                    if frozen[t] then return frozen[t] end
+                    local contents = {}
+                    local proxy = setmetatable({}, {
+                        __index = contents,
+                        __newindex = function(_, key)
+                            error("cannot modify read-only field " .. tostring(key), 2)
+                        end,
+                        __pairs = function() return next, contents, nil end,
+                        __len = function() return #contents end,
+                        __metatable = false
+                    })
+                    frozen[t] = proxy
+                    for key, value in pairs(t) do
+                        if type(value) == "table" then
+                            value = read_only(value)
+                        end
+                        if not hidden[value] then
+                            contents[key] = value
+                        end
+                    end
+                    return proxy
+                end
+
+                frozen[debug] = read_only({traceback = debug.traceback})
+                local env_mt = {__index = read_only(_G), __metatable = false}
+
+                -- Fresh globals for one run; what a script defines goes here
+                return function()
+                    local env = setmetatable({}, env_mt)
+                    env._G = env
+                    env.load = function(chunk, name, mode, chunk_env)
+                        return load(chunk, name, mode, chunk_env or env)
+                    end
+                    return env
+                end
+            """)
+
+            # Generational collection suits scripts that make short-lived
+            # garbage for hours; maintain() adds steps between resumes
+            lua_globals.collectgarbage("generational")
+            self.gc_step = self.lua.eval('function() collectgarbage("step", 0) end')
+            self.gc_full = self.lua.eval('function() collectgarbage("collect") end')
+            self.lua_memory_kb = self.lua.eval('function() return collectgarbage("count") end')
+
+            # Helpers called on every run and every ack, compiled above once
+            self.compile_chunk = lua_globals.compile_script
+            self.bind_environment = lua_globals.bind_environment
+            self.start_coroutine = lua_globals.start_coroutine
+            self.safe_resume = lua_globals.safe_resume_script
+            self.safe_stop = lua_globals.safe_stop_script
+            self.coroutine_status = lua_globals.coroutine.status
+
+        except Exception as e:
+            self.log_message.emit(f"Error setting up Lua environment: {str(e)}")
+            self.print(traceback.format_exc())
+
+    @pyqtSlot(str)
+    def start(self, script):
+        """Run a script as the main job"""
+        try:
+            # Reset state
+            self.running = True
+            self.stop_requested = False
+            self.interrupted = None
+            self.watchdog = None
+            self.channel.active = True
+            main = ScriptJob(MAIN_JOB)
+            self.jobs = {MAIN_JOB: main}
+
+            # Set up timeout: the timer covers a script waiting on devices,
+            # the hook one that is busy computing
+            self.script_timeout.start(self.time_limit)
+            self.deadline = time.monotonic() + self.time_limit / 1000
+            self.cpu_deadline = time.thread_time() + self.cpu_time_limit / 1000
+            self.set_check_interval(self.check_interval)
+            self.maintenance_timer.start(MAINTENANCE_INTERVAL)
+
+            # Run the script in fresh globals; the previous run's are dropped
+            chunk = self.bind_environment(self.compile_script(script), self.new_environment())
+            self.current_job = main
+            try:
+                main.thread = self.start_coroutine(chunk)
+            finally:
+                self.current_job = None
+            self.check_job_finished(main)
+
+        except Exception as e:
+            self.report_error(main, e)
+
+    def compile_script(self, script):
+        """Compiled chunk for a script, reused while its text is unchanged"""
+        key = hashlib.sha1(script.encode()).hexdigest()
+        chunk = self.chunk_cache.get(key)
+        if chunk is not None:
+            self.chunk_cache.move_to_end(key)
+            return chunk
+        chunk, err = self.compile_chunk(script)
+        if chunk is None:
+            raise Exception(f"Failed to load script: {err}")
+        self.chunk_cache[key] = chunk
+        if len(self.chunk_cache) > SCRIPT_CACHE_SIZE:
+            self.chunk_cache.popitem(last=False)
+        return chunk
+
+    def start_job(self, job, fn):
+        """Run a spawned job up to its first wait"""
+        try:
+            if self.stop_requested or not self.running or job.finished:
+                return
+            previous, self.current_job = self.current_job, job
+            try:
+                job.thread = self.start_coroutine(fn)
+            finally:
+                self.current_job = previous
+            self.check_job_finished(job)
+
+        except Exception as e:
+            self.report_error(job, e)
+
+    @pyqtSlot()
+    def stop(self):
+        """Stop the script and every job it spawned"""
+        try:
+            self.stop_requested = True
+
+            # Stop the jobs
+            for job in list(self.jobs.values()):
+                self.current_job = job
+                try:
+                    self.safe_stop(job.thread)
+                finally:
+                    self.current_job = None
+                job.clear()
+                job.finished = True
+            self.sleepers.clear()
+            self.wake_timer.stop()
+            self.channel.active = False
+            self.running = False
+
+            # Stop timeout timer
+            self.script_timeout.stop()
+            self.maintenance_timer.stop()
+
+        except Exception as e:
+            self.log_message.emit(f"Error stopping script: {str(e)}")
+            self.print(traceback.format_exc())
+        self.running = False
+        self.finished.emit()
+
+    def process_queue(self, job):
+        """Send a job's queued commands while their device windows have room"""
+        try:
+            if self.stop_requested:
+                return
+
+            # Giữ đúng thứ tự lệnh: chỉ gửi lệnh đầu queue khi cửa sổ
+            # của thiết bị đích còn chỗ
+            while job.command_queue and self.running:
+                command, device, queued_time = job.command_queue[0]
+                window = job.get_command_window(device)
+                if not window.can_send(command):
+                    break
+
+                job.command_queue.popleft()
+                entry = window.push(command, self.next_command_seq)
+                self.next_command_seq += 1
+                job.queue_waits.append(time.perf_counter() - queued_time)
+                job.last_command = command
+
+                # Thiết bị tự khớp phản hồi và hạn chót với lệnh
+                self.send(command, device).add_done_callback(
+                    lambda future, window=window, entry=entry:
+                        self.command_finished(job, window, entry, future))
+
+        except Exception as e:
+            self.log_message.emit(f"Error processing queue: {str(e)}")
+            self.print(traceback.format_exc())
+            self.stop()
+
+    def command_finished(self, job, window, entry, future):
+        """A queued command got its reply, failed or timed out"""
+        try:
+            # Ignore replies to commands of a job that was stopped
+            if not self.running or job.finished or window.head() is not entry:
+                return
+
+            if future.succeeded():
+                window.ack()
+            elif future.state == NOT_SENT:
+                self.log_message.emit(f"Command failed: {entry.command} (device not connected)")
+                self.stop()
+                return
+            elif future.state == TIMED_OUT:
+                window.drop(entry.seq)
+                self.log_message.emit(f"Command timeout: {entry.command}")
+            else:
+                window.fail()
+                self.log_message.emit(f"Command failed: {entry.command} ({future.error})")
+
+            # Cửa sổ vừa có chỗ trống: gửi tiếp và tiếp tục job nếu được
+            self.process_queue(job)
+            self.resume_if_ready(job)
+
+        except Exception as e:
+            self.log_message.emit(f"Error handling response: {str(e)}")
+            self.print(traceback.format_exc())
+            self.stop()
+
+    def resume_if_ready(self, job):
+        """Resume a waiting job once its commands allow it, or finish it"""
+        if job.waiting_response and job.can_resume():
+            job.waiting_response = False
+            self.resume_script(job)
+        self.check_job_finished(job)
+
+    def check_job_finished(self, job):
+        """Finish a job once it has returned and every command is acknowledged"""
+        if not self.running or job.finished or job.thread is None:
+            return
+        if self.coroutine_status(job.thread) != "dead":
+            return
+        if job.commands_pending():
+            return
+        job.finished = True
+        stats = job.get_queue_stats()
+        label = "" if len(self.jobs) < 2 else f"{job.name}: "
+        if stats['count']:
+            self.log_message.emit(
+                f"{label}Queue wait over {stats['count']} commands: avg {stats['avg_ms']:.2f} ms, "
+                f"p95 {stats['p95_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+        if label:
+            self.log_message.emit(f"Job {job.name} finished")
+
+        # Forget the job, so a long run that keeps spawning does not grow
+        if job.name != MAIN_JOB and self.jobs.get(job.name) is job:
+            del self.jobs[job.name]
+
+        # Jobs blocked in wait_job() on this one may go on
+        for other in list(self.jobs.values()):
+            if other.waiting_job is job:
+                self.resume_if_ready(other)
+
+        if self.running and all(other.finished for other in self.jobs.values()):
+            self.log_message.emit("Script execution completed")
+            self.stop()
+
+    def resume_script(self, job):
+        """Resume a job's coroutine"""
+        try:
+            # Check if job should continue
+            if self.stop_requested or not self.running or job.finished:
+                return
+
+            # Resume the job
+            previous, self.current_job = self.current_job, job
+            try:
+                success, result = self.safe_resume(job.thread)
+            finally:
+                self.current_job = previous
+
+            if not success:
+                raise Exception(str(result))
+            self.check_job_finished(job)
+
+        except Exception as e:
+            self.report_error(job, e)
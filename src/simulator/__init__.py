@@ -1,5 +1,9 @@
 from .robot_simulator import RobotSimulator
 from .robot_state import RobotState
 from .gcode_parser import GCodeParser
+from .motion_profile import MotionProfile
+from .motion_planner import MotionPlanner, Segment, plan_path
+from .cycle_time import estimate_cycle_time
 
-__all__ = ['RobotSimulator', 'RobotState', 'GCodeParser'] 
\ No newline at end of file
+__all__ = ['RobotSimulator', 'RobotState', 'GCodeParser', 'MotionProfile', 'MotionPlanner',
+           'Segment', 'plan_path', 'estimate_cycle_time'] 
\ No newline at end of file
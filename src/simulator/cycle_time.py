@@ -0,0 +1,31 @@
+from typing import Iterable, Optional
+
+from .gcode_parser import GCodeParser
+from .motion_planner import MotionPlanner, PLANNER_LOOKAHEAD
+from .robot_state import RobotState
+
+
+def estimate_cycle_time(commands: Iterable[str], lookahead: int = PLANNER_LOOKAHEAD,
+                        robot_state: Optional[RobotState] = None) -> float:
+    """Seconds the robot takes to run G-code lines streamed to it without
+    waiting, with no simulator, port or clock involved.
+
+    Moves are timed as RobotSimulator times them: jerk-limited, and blended
+    through up to lookahead queued G0/G1 (1 stops at every move). Dwells,
+    homing and the like add their delay. robot_state is the state to start
+    from and is updated as the commands run; a fresh one by default.
+    """
+    parser = GCodeParser(robot_state or RobotState())
+    planner = MotionPlanner(lookahead)
+    total = 0.0
+    for command in commands:
+        success, _, delay = parser.execute_command(command)
+        if not parser.is_linear_move(command):
+            total += sum(segment.profile.duration for segment in planner.drain()) + delay
+        elif success:
+            if planner.full:
+                total += planner.pop().profile.duration
+            planner.rest_velocity = parser.robot_state.begin_end_velocity
+            planner.add(parser.last_segment)
+    total += sum(segment.profile.duration for segment in planner.drain())
+    return total
@@ -1,8 +1,12 @@
 import re
 from typing import Dict, Any, Optional, Tuple
 from .robot_state import Position, RobotState
+from .motion_profile import MotionProfile
+from .motion_planner import Segment
 import math
 
+LINEAR_MOVES = ('G0', 'G1', 'G00', 'G01')
+
 class GCodeParser:
     def __init__(self, robot_state: RobotState):
         self.robot_state = robot_state
@@ -10,6 +14,14 @@ class GCodeParser:
         self.current_feedrate = 200  # Default feedrate (mm/s)
         self.current_acceleration = 5000  # Default acceleration (mm/s^2)
         self.current_jerk = 1200000  # Default jerk (mm/s^3)
+        # The last G0/G1, for a MotionPlanner to blend with the moves around it
+        self.last_segment: Optional[Segment] = None
+        
+    @staticmethod
+    def is_linear_move(command: str) -> bool:
+        """Whether command is a G0/G1, which the firmware blends."""
+        parts = command.upper().split(maxsplit=1)
+        return bool(parts) and parts[0] in LINEAR_MOVES
         
     def parse_params(self, command: str) -> Dict[str, float]:
         """Parse G-code parameters from command string."""
@@ -23,15 +35,22 @@ class GCodeParser:
             
         return params
 
-    def calculate_movement_time(self, start: Position, end: Position, feedrate: float) -> float:
-        """Calculate the time needed for a movement."""
+    def plan_movement(self, start: Position, end: Position,
+                      begin_velocity: Optional[float] = None,
+                      end_velocity: Optional[float] = None) -> MotionProfile:
+        """Jerk-limited profile of a straight move with the current feedrate,
+        acceleration and jerk. The begin/end velocities default to M205's."""
         dx = end.x - start.x
         dy = end.y - start.y
         dz = end.z - start.z
         distance = math.sqrt(dx*dx + dy*dy + dz*dz)
         
-        # Simple time calculation based on distance and feedrate
-        return distance / feedrate if feedrate > 0 else 0
+        if begin_velocity is None:
+            begin_velocity = self.robot_state.begin_end_velocity
+        if end_velocity is None:
+            end_velocity = self.robot_state.begin_end_velocity
+        return MotionProfile(distance, self.current_feedrate, self.current_acceleration,
+                             self.current_jerk, begin_velocity, end_velocity)
 
     def execute_command(self, command: str) -> Tuple[bool, str, float]:
         """Execute a G-code command and return (success, response, delay)."""
@@ -50,7 +69,7 @@ class GCodeParser:
                 return True, "YesDelta\n", 0
                 
             # Movement commands
-            if cmd_type in ['G0', 'G1', 'G01', 'G00']:
+            if cmd_type in LINEAR_MOVES:
                 return self._handle_linear_move(params)
                 
             # Arc movement
@@ -139,23 +158,25 @@ class GCodeParser:
             target.y += self.robot_state.current_position.y
             target.z += self.robot_state.current_position.z
             
-        # Calculate movement time
-        move_time = self.calculate_movement_time(
-            self.robot_state.current_position,
-            target,
-            self.current_feedrate
-        )
+        # Calculate movement time; S and E set this move's begin/end velocity
+        start = self.robot_state.current_position
+        profile = self.plan_movement(start, target, params.get('S'), params.get('E'))
+        self.last_segment = Segment(
+            (start.x, start.y, start.z), (target.x, target.y, target.z),
+            self.current_feedrate, self.current_acceleration, self.current_jerk,
+            params.get('S'), params.get('E'))
         
         # Update position
         self.robot_state.current_position = target
         
-        return True, "Ok\n", move_time
+        return True, "Ok\n", profile.duration
 
     def _handle_arc_move(self, cmd_type: str, params: Dict[str, float]) -> Tuple[bool, str, float]:
         """Handle G2/G3 arc movement commands."""
         # For simulation, we'll treat arc moves as linear moves
         # In a real implementation, proper arc interpolation would be needed
-        result = self._handle_linear_move(params)
+        # I and J are the arc centre here, not a jerk
+        result = self._handle_linear_move({k: v for k, v in params.items() if k not in ('I', 'J')})
         return True, "Ok\n", result[2]
 
     def _handle_dwell(self, params: Dict[str, float]) -> Tuple[bool, str, float]:
@@ -213,7 +234,7 @@ class GCodeParser:
             pin = int(value)
             if param == 'I':
                 val = self.robot_state.digital_inputs.get(pin, 0)
-                responses.append(f"I{pin} V{val}")
+                responses.append(f"I{pin} V{int(val)}")
             elif param == 'A':
                 val = self.robot_state.analog_inputs.get(pin, 0)
                 responses.append(f"A{pin} V{val}")
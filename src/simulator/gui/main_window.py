@@ -5,6 +5,7 @@ from PyQt5.QtCore import Qt, pyqtSlot, QTimer
 from .opengl_widget import DeltaRobotWidget
 from .delta_control_widget import DeltaControlWidget
 from ..robot_simulator import RobotSimulator
+from ..sim_clock import TIME_SCALES
 import serial
 
 class MainWindow(QMainWindow):
@@ -42,13 +43,19 @@ class MainWindow(QMainWindow):
         conn_layout = QHBoxLayout(conn_group)
         
         self.port_combo = QComboBox()
-        self.port_combo.addItems(['COM1', 'COM2', 'COM3', 'COM4'])
+        self.port_combo.addItems(['COM1', 'COM2', 'COM3', 'COM4', 'tcp://127.0.0.1:8080', 'pty'])
+        self.port_combo.setEditable(True)
         self.port_combo.setCurrentText('COM1')
         
         self.baud_combo = QComboBox()
         self.baud_combo.addItems(['9600', '19200', '38400', '57600', '115200'])
         self.baud_combo.setCurrentText('115200')
         
+        # Moves, dwells and homing run this much faster than the real robot
+        self.speed_combo = QComboBox()
+        self.speed_combo.addItems(list(TIME_SCALES))
+        self.speed_combo.currentTextChanged.connect(self.change_time_scale)
+        
         self.connect_btn = QPushButton("Connect")
         self.connect_btn.clicked.connect(self.toggle_connection)
         
@@ -56,6 +63,8 @@ class MainWindow(QMainWindow):
         conn_layout.addWidget(self.port_combo)
         conn_layout.addWidget(QLabel("Baud:"))
         conn_layout.addWidget(self.baud_combo)
+        conn_layout.addWidget(QLabel("Speed:"))
+        conn_layout.addWidget(self.speed_combo)
         conn_layout.addWidget(self.connect_btn)
         
         layout.addWidget(conn_group)
@@ -97,10 +106,14 @@ class MainWindow(QMainWindow):
             self.log_message("Disconnected")
         else:
             try:
-                # Create simulator on COM1
-                self.simulator = RobotSimulator(port='COM1', baudrate=115200)
+                # Create simulator on the selected port (or TCP address)
+                port = self.port_combo.currentText()
+                baudrate = int(self.baud_combo.currentText())
+                time_scale = TIME_SCALES[self.speed_combo.currentText()]
+                self.simulator = RobotSimulator(port=port, baudrate=baudrate, time_scale=time_scale)
                 
                 # Connect simulator signals
+                self.simulator.movement_planned.connect(self.on_movement_planned)
                 self.simulator.movement_started.connect(self.on_movement_started)
                 self.simulator.movement_finished.connect(self.on_movement_finished)
                 
@@ -108,7 +121,7 @@ class MainWindow(QMainWindow):
                 self.simulator.start()
                 
                 self.connect_btn.setText("Disconnect")
-                self.log_message("Connected to COM1 at 115200 baud")
+                self.log_message(f"Connected to {self.simulator.device_port} at {baudrate} baud")
                 
             except Exception as e:
                 self.log_message(f"Error connecting: {str(e)}")
@@ -116,10 +129,22 @@ class MainWindow(QMainWindow):
                     self.simulator.stop()
                 self.simulator = None
 
+    def change_time_scale(self, name: str):
+        """Apply a new speed to a running simulator."""
+        if self.simulator:
+            self.simulator.clock.time_scale = TIME_SCALES[name]
+            self.log_message(f"Simulation speed: {name}")
+
+    @pyqtSlot(float, float, float, object)
+    def on_movement_planned(self, x: float, y: float, z: float, profile):
+        """Animate a G0/G1 along its motion profile."""
+        # The profile's duration is the real robot's; animate over the scaled wall time
+        duration = self.simulator.clock.wall_duration(profile.duration) if self.simulator else 0
+        self.delta_control_widget.robot_widget.start_movement(x, y, z, duration, profile)
+
     @pyqtSlot(float, float, float, float)
     def on_movement_started(self, x: float, y: float, z: float, duration: float):
         """Handle movement start signal from simulator."""
-        self.delta_control_widget.robot_widget.start_movement(x, y, z, duration)
         self.pos_label.setText(f"X: {x:.3f}  Y: {y:.3f}  Z: {z:.3f}")
 
     @pyqtSlot()
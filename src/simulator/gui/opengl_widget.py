@@ -30,6 +30,8 @@ class DeltaRobotWidget(QGLWidget):
         # Current position and movement
         self.current_position = [0, 0, -500]  # Adjusted initial Z position
         self.target_position = [0, 0, -500]
+        self.movement_start_position = [0, 0, -500]
+        self.movement_profile = None  # MotionProfile of the current move, if known
         self.movement_start_time = 0
         self.movement_duration = 0
         self.is_moving = False
@@ -315,8 +317,11 @@ class DeltaRobotWidget(QGLWidget):
         glLoadIdentity()
         gluPerspective(45, width / height, 1.0, 4000.0)  # Adjusted near and far planes
 
-    def start_movement(self, x: float, y: float, z: float, duration: float):
-        """Start a movement to a new position."""
+    def start_movement(self, x: float, y: float, z: float, duration: float, profile=None):
+        """Start a movement to a new position, over duration seconds of
+        wall time, following profile's velocity if given."""
+        self.movement_start_position = self.current_position.copy()
+        self.movement_profile = profile
         self.target_position = [x, y, z]
         self.movement_start_time = time.time()
         self.movement_duration = duration
@@ -342,10 +347,12 @@ class DeltaRobotWidget(QGLWidget):
             
         # Calculate interpolated position
         t = elapsed / self.movement_duration
+        profile = self.movement_profile
+        if profile is not None and profile.distance > 0:
+            t = profile.position(t * profile.duration) / profile.distance
         self.current_position = [
-            self.current_position[0] + (self.target_position[0] - self.current_position[0]) * t,
-            self.current_position[1] + (self.target_position[1] - self.current_position[1]) * t,
-            self.current_position[2] + (self.target_position[2] - self.current_position[2]) * t
+            start + (target - start) * t
+            for start, target in zip(self.movement_start_position, self.target_position)
         ]
         
         self.updateGL()
@@ -0,0 +1,262 @@
+import os
+import select
+import socket
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import serial
+
+TCP_PREFIX = 'tcp://'
+LOOP_PREFIX = 'loop://'
+PTY_PORT = 'pty'  # Port name that makes the simulator create a pseudo-terminal
+READ_TIMEOUT = 0.1  # s; longest a read() waits for the first byte
+
+
+def parse_tcp_address(port: str) -> Optional[Tuple[str, int]]:
+    """(host, port) for a "tcp://host:port" link name, else None."""
+    if not port.startswith(TCP_PREFIX):
+        return None
+    host, _, number = port[len(TCP_PREFIX):].rpartition(':')
+    return host or '127.0.0.1', int(number)
+
+
+class TcpServerLink:
+    """Stand-in for a robot's RJ45 port: a TCP server with the small part of
+    the serial.Serial API the simulator uses (in_waiting, read, write, close).
+    Like a serial port opened with a timeout, read() waits up to READ_TIMEOUT
+    when nothing has arrived.
+
+    One client is served at a time; when it disconnects the link waits for
+    the next one, like the controller does.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(1)
+        self.address = self.server.getsockname()
+        self.client: Optional[socket.socket] = None
+        self.buffer = bytearray()
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> str:
+        return f"{TCP_PREFIX}{self.address[0]}:{self.address[1]}"
+
+    def _poll(self, timeout: float = 0):
+        """Accept a waiting client and pull in whatever it has sent."""
+        if self.client is None:
+            ready, _, _ = select.select([self.server], [], [], timeout)
+            if not ready:
+                return
+            client, peer = self.server.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.client = client
+            print(f"TCP client connected from {peer[0]}:{peer[1]}")
+        ready, _, _ = select.select([self.client], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = self.client.recv(65536)
+        except OSError:
+            data = b''
+        if data:
+            self.buffer += data
+        else:
+            self.drop_client()
+
+    def drop_client(self):
+        with self.lock:
+            client, self.client = self.client, None
+        if client is not None:
+            client.close()
+            print("TCP client disconnected")
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.buffer:
+            self._poll()
+        return len(self.buffer)
+
+    def read(self, size: int = 1) -> bytes:
+        if not self.buffer:
+            self._poll(READ_TIMEOUT)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        with self.lock:
+            client = self.client
+        if client is None:
+            return 0  # Nobody to answer; a real controller drops the reply too
+        try:
+            client.sendall(data)
+        except OSError:
+            self.drop_client()
+            return 0
+        return len(data)
+
+    def close(self):
+        self.drop_client()
+        self.server.close()
+
+
+class PtyLink:
+    """Virtual serial port: a pseudo-terminal whose master end the simulator
+    serves. port is the slave path (e.g. /dev/pts/3) that the tool opens like
+    any serial port. POSIX only.
+    """
+
+    def __init__(self):
+        if not hasattr(os, 'openpty'):
+            raise OSError("Pseudo-terminals are not available on this platform")
+        import tty
+        self.master, self.slave = os.openpty()
+        # Raw mode: no echo and no newline translation until a client sets
+        # its own line settings. The simulator keeps the slave open so the
+        # master does not fail while no client is connected.
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.buffer = bytearray()
+
+    def _poll(self, timeout: float = 0):
+        ready, _, _ = select.select([self.master], [], [], timeout)
+        if not ready:
+            return
+        try:
+            self.buffer += os.read(self.master, 65536)
+        except (BlockingIOError, OSError):
+            pass
+
+    @property
+    def in_waiting(self) -> int:
+        if not self.buffer:
+            self._poll()
+        return len(self.buffer)
+
+    def read(self, size: int = 1) -> bytes:
+        if not self.buffer:
+            self._poll(READ_TIMEOUT)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        try:
+            return os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            return 0  # Nobody reading and the pty buffer is full; drop it
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class LoopbackEnd:
+    """One end of an in-process byte pipe, with the serial.Serial calls the
+    simulator uses. Bytes written at one end arrive at the other.
+
+    A listener, once set, is called with incoming bytes in the writer's
+    thread instead of buffering them.
+    """
+
+    def __init__(self, port: str):
+        self.port = port
+        self.peer: Optional['LoopbackEnd'] = None
+        self.buffer = bytearray()
+        self.arrived = threading.Condition()
+        self.listener: Optional[Callable[[bytes], None]] = None
+        self.closed = False
+
+    def set_listener(self, listener: Optional[Callable[[bytes], None]]):
+        with self.arrived:
+            self.listener = listener
+            data, self.buffer = bytes(self.buffer), bytearray()
+        if listener is not None and data:
+            listener(data)
+
+    def receive(self, data: bytes):
+        with self.arrived:
+            listener = self.listener
+            if listener is None:
+                self.buffer += data
+                self.arrived.notify()
+        if listener is not None:
+            listener(data)
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.buffer)
+
+    def read(self, size: int = 1) -> bytes:
+        """Up to size bytes; waits up to READ_TIMEOUT if none have arrived"""
+        with self.arrived:
+            if not self.buffer and not self.closed:
+                self.arrived.wait(READ_TIMEOUT)
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        peer = self.peer
+        if self.closed or peer is None or peer.closed:
+            return 0
+        peer.receive(bytes(data))
+        return len(data)
+
+    def close(self):
+        with self.arrived:
+            self.closed = True
+            self.arrived.notify_all()
+
+
+# Client ends of running loopback simulators, by port name
+_loopbacks: Dict[str, LoopbackEnd] = {}
+
+
+class LoopbackLink(LoopbackEnd):
+    """Device end of an in-process link for tests: no OS port at all. The
+    client end is registered under port ("loop://name") until the link
+    closes; get it with connect_loopback(port).
+    """
+
+    def __init__(self, port: str):
+        super().__init__(port)
+        if port in _loopbacks:
+            raise ValueError(f"Loopback port {port} is already in use")
+        self.peer = LoopbackEnd(port)
+        self.peer.peer = self
+        _loopbacks[port] = self.peer
+
+    def close(self):
+        super().close()
+        self.peer.close()
+        _loopbacks.pop(self.port, None)
+
+
+def connect_loopback(port: str) -> LoopbackEnd:
+    """Client end of the loopback a simulator in this process serves on port."""
+    try:
+        return _loopbacks[port]
+    except KeyError:
+        raise ValueError(f"No simulator on {port}") from None
+
+
+def open_link(port: str, baudrate: int):
+    """Serial port, or a TCP server for "tcp://host:port" names, a
+    pseudo-terminal for "pty", or an in-process pipe for "loop://name"."""
+    address = parse_tcp_address(port)
+    if address is not None:
+        return TcpServerLink(*address)
+    if port == PTY_PORT:
+        return PtyLink()
+    if port.startswith(LOOP_PREFIX):
+        return LoopbackLink(port)
+    return serial.Serial(port=port, baudrate=baudrate, timeout=0.1)
@@ -0,0 +1,133 @@
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Iterator, List, Optional, Tuple
+
+from .motion_profile import MotionProfile, reachable_velocity
+
+PLANNER_LOOKAHEAD = 16  # Segments planned ahead of the one being executed
+JUNCTION_DEVIATION = 0.05  # mm the path may cut a corner by at full junction speed
+REST_VELOCITY = 40  # mm/s, M205 S: what moves start and end at when they cannot blend
+
+Point = Tuple[float, float, float]
+
+
+@dataclass
+class Segment:
+    """One straight G0/G1 in the planner queue."""
+    start: Point
+    end: Point
+    feedrate: float
+    acceleration: float
+    jerk: float
+    begin_velocity: Optional[float] = None  # The move's S word, if any
+    end_velocity: Optional[float] = None    # The move's E word, if any
+    tag: Any = None  # Caller's data, e.g. the reply to send once the move is done
+    profile: Optional[MotionProfile] = field(default=None, repr=False)  # Set when committed
+
+    def __post_init__(self):
+        delta = [b - a for a, b in zip(self.start, self.end)]
+        self.length = math.sqrt(sum(d * d for d in delta))
+        self.direction = tuple(d / self.length for d in delta) if self.length else None
+
+
+class MotionPlanner:
+    """Lookahead queue that blends consecutive moves, as the firmware does.
+
+    Segments are added as they are parsed and popped as they are executed.
+    Each pop commits the oldest segment's profile using every segment still
+    queued behind it: its exit velocity is the highest that the corner to
+    the next segment allows and from which the rest of the queue can still
+    slow to rest_velocity at its end. The corner speed follows the usual
+    junction deviation model (a tighter corner is slower), never above
+    either segment's feedrate or below rest_velocity. S and E words fix a
+    junction's velocity instead.
+    """
+
+    def __init__(self, lookahead: int = PLANNER_LOOKAHEAD, rest_velocity: float = REST_VELOCITY,
+                 junction_deviation: float = JUNCTION_DEVIATION):
+        self.lookahead = max(1, lookahead)
+        self.rest_velocity = rest_velocity
+        self.junction_deviation = junction_deviation
+        self.segments: Deque[Segment] = deque()
+        self.entry_velocity: Optional[float] = None  # Exit of the last committed segment; None at rest
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    @property
+    def full(self) -> bool:
+        return len(self.segments) >= self.lookahead
+
+    def add(self, segment: Segment):
+        self.segments.append(segment)
+
+    def pop(self) -> Segment:
+        """Commit and remove the oldest segment; its profile is set."""
+        velocities = self._plan()
+        segment = self.segments.popleft()
+        segment.profile = MotionProfile(segment.length, segment.feedrate, segment.acceleration,
+                                        segment.jerk, velocities[0], velocities[1])
+        # The queue's tail always ends at rest, so an emptied planner is at rest
+        self.entry_velocity = segment.profile.end_velocity if self.segments else None
+        return segment
+
+    def drain(self) -> Iterator[Segment]:
+        """Pop every segment: the queue's end is a stop."""
+        while self.segments:
+            yield self.pop()
+
+    def junction_velocity(self, before: Segment, after: Segment) -> float:
+        """Highest velocity through the corner between two segments."""
+        given = [v for v in (before.end_velocity, after.begin_velocity) if v is not None]
+        if given:
+            return min(given)
+        limit = min(before.feedrate, after.feedrate)
+        if before.direction is None or after.direction is None:
+            return min(self.rest_velocity, limit)
+        cos_theta = -sum(a * b for a, b in zip(before.direction, after.direction))
+        sin_half = math.sqrt(max(0.0, 0.5 * (1 - cos_theta)))
+        if sin_half >= 1 - 1e-9:
+            velocity = math.inf  # Straight on
+        else:
+            acceleration = min(a for a in (before.acceleration, after.acceleration, math.inf) if a > 0)
+            velocity = math.sqrt(acceleration * self.junction_deviation * sin_half / (1 - sin_half))
+        return min(max(velocity, self.rest_velocity), limit)
+
+    def _plan(self) -> List[float]:
+        """Velocity at each junction of the queue, from its entry to its end."""
+        segments = self.segments
+        first, last = segments[0], segments[-1]
+        if self.entry_velocity is not None:
+            entry = self.entry_velocity
+        else:
+            entry = first.begin_velocity if first.begin_velocity is not None else self.rest_velocity
+        velocities = [entry]
+        for before, after in zip(segments, list(segments)[1:]):
+            velocities.append(self.junction_velocity(before, after))
+        velocities.append(last.end_velocity if last.end_velocity is not None else self.rest_velocity)
+
+        # Backward: each junction must be able to slow to the next within its segment
+        for i in range(len(segments) - 1, 0, -1):
+            segment = segments[i]
+            velocities[i] = min(velocities[i], reachable_velocity(
+                velocities[i + 1], segment.length, segment.acceleration, segment.jerk, segment.feedrate))
+        # Forward: and to be reachable from the one before
+        for i, segment in enumerate(segments):
+            velocities[i + 1] = min(velocities[i + 1], reachable_velocity(
+                velocities[i], segment.length, segment.acceleration, segment.jerk, segment.feedrate))
+        return velocities
+
+
+def plan_path(points: List[Point], feedrate: float, acceleration: float = 0, jerk: float = 0,
+              lookahead: int = PLANNER_LOOKAHEAD, rest_velocity: float = REST_VELOCITY) -> List[Segment]:
+    """Plan moves through a list of points with the same limits, returning
+    the committed segments (see Segment.profile)."""
+    planner = MotionPlanner(lookahead, rest_velocity)
+    planned = []
+    for start, end in zip(points, points[1:]):
+        if planner.full:
+            planned.append(planner.pop())
+        planner.add(Segment(tuple(start), tuple(end), feedrate, acceleration, jerk))
+    planned.extend(planner.drain())
+    return planned
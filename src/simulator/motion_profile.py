@@ -0,0 +1,202 @@
+import math
+from bisect import bisect_right
+from typing import List, Tuple
+
+# Bisection steps when the peak or an end velocity has to be solved for
+SOLVE_STEPS = 40
+
+
+def _velocity_change(v_from: float, v_to: float, acceleration: float, jerk: float) -> Tuple[float, float]:
+    """Duration of a jerk-limited change between two velocities and of each
+    of its jerk phases: (total, jerk_phase).
+
+    The acceleration ramps up at the jerk limit, holds at the acceleration
+    limit if the change is large enough to reach it, then ramps down.
+    """
+    dv = abs(v_to - v_from)
+    if dv == 0:
+        return 0.0, 0.0
+    if math.isinf(jerk):
+        return (0.0 if math.isinf(acceleration) else dv / acceleration), 0.0
+    if dv * jerk < acceleration * acceleration:
+        jerk_phase = math.sqrt(dv / jerk)
+        return 2 * jerk_phase, jerk_phase
+    jerk_phase = acceleration / jerk
+    return jerk_phase + dv / acceleration, jerk_phase
+
+
+def _change_distance(v_from: float, v_to: float, acceleration: float, jerk: float) -> float:
+    """Distance covered by _velocity_change: the profile is symmetric, so
+    the mean velocity is the midpoint."""
+    return (v_from + v_to) / 2 * _velocity_change(v_from, v_to, acceleration, jerk)[0]
+
+
+def reachable_velocity(v_from: float, distance: float, acceleration: float, jerk: float,
+                       limit: float) -> float:
+    """Highest velocity, up to limit, that a jerk-limited change from v_from
+    reaches within distance. A limit of 0 for acceleration or jerk means
+    unlimited. The profile is symmetric, so this is also the highest
+    velocity that can slow to v_from within distance."""
+    acceleration = acceleration if acceleration > 0 else math.inf
+    jerk = jerk if jerk > 0 else math.inf
+    if limit <= v_from or _change_distance(v_from, limit, acceleration, jerk) <= distance:
+        return max(v_from, limit)
+    low, high = v_from, limit
+    for _ in range(SOLVE_STEPS):
+        middle = (low + high) / 2
+        if _change_distance(v_from, middle, acceleration, jerk) > distance:
+            high = middle
+        else:
+            low = middle
+    return low
+
+
+class MotionProfile:
+    """Jerk-limited (S-curve) velocity profile of one straight move.
+
+    The move starts at begin_velocity, accelerates to at most feedrate,
+    cruises, and slows to end_velocity, with acceleration and jerk within
+    their limits. When the move is too short to reach feedrate the peak
+    velocity is lowered; when it is too short even to get from one end
+    velocity to the other, the higher of the two is lowered. A limit of 0
+    means unlimited, so acceleration=0 gives the constant-velocity move
+    distance / feedrate.
+
+    The profile is a list of constant-jerk phases; position(), velocity()
+    and acceleration() evaluate it at any time in [0, duration].
+    """
+
+    def __init__(self, distance: float, feedrate: float, acceleration: float = 0, jerk: float = 0,
+                 begin_velocity: float = 0, end_velocity: float = 0):
+        self.distance = max(0.0, distance)
+        self.feedrate = feedrate
+        self.acceleration_limit = acceleration if acceleration > 0 else math.inf
+        self.jerk_limit = jerk if jerk > 0 else math.inf
+        self.begin_velocity = max(0.0, min(begin_velocity, feedrate))
+        self.end_velocity = max(0.0, min(end_velocity, feedrate))
+        self.peak_velocity = 0.0
+        # (duration, jerk, velocity_step, acceleration_step)
+        self.phases: List[Tuple[float, float, float, float]] = []
+        if self.distance > 0 and feedrate > 0:
+            self._plan()
+        self._integrate()
+
+    @property
+    def duration(self) -> float:
+        return self._starts[-1]
+
+    def _distance(self, v_from: float, v_to: float) -> float:
+        return _change_distance(v_from, v_to, self.acceleration_limit, self.jerk_limit)
+
+    def _solve(self, low: float, high: float, distance_at) -> float:
+        """Highest velocity in [low, high] at which distance_at() fits the move."""
+        for _ in range(SOLVE_STEPS):
+            middle = (low + high) / 2
+            if distance_at(middle) > self.distance:
+                high = middle
+            else:
+                low = middle
+        return low
+
+    def _plan(self):
+        v_begin, v_end = self.begin_velocity, self.end_velocity
+        v_low = min(v_begin, v_end)
+        if self._distance(v_begin, v_end) > self.distance:
+            # Too short to change between the end velocities: lower the higher one
+            v_high = self._solve(v_low, max(v_begin, v_end), lambda v: self._distance(v_low, v))
+            if v_begin > v_end:
+                v_begin = v_high
+            else:
+                v_end = v_high
+            self.begin_velocity, self.end_velocity = v_begin, v_end
+
+        def ramps(peak):
+            return self._distance(v_begin, peak) + self._distance(peak, v_end)
+
+        peak = self.feedrate
+        if ramps(peak) > self.distance:
+            peak = self._solve(max(v_begin, v_end), peak, ramps)
+        self.peak_velocity = peak
+        cruise = self.distance - ramps(peak)
+
+        self._add_change(v_begin, peak)
+        if peak > 0 and cruise > 0:
+            self._add_phase(cruise / peak)
+        self._add_change(peak, v_end)
+
+    def _add_phase(self, duration: float, jerk: float = 0.0,
+                   velocity_step: float = 0.0, acceleration_step: float = 0.0):
+        """A constant-jerk phase, after stepping velocity or acceleration
+        (which only an unlimited jerk or acceleration allows)."""
+        self.phases.append((duration, jerk, velocity_step, acceleration_step))
+
+    def _add_change(self, v_from: float, v_to: float):
+        total, jerk_phase = _velocity_change(v_from, v_to, self.acceleration_limit, self.jerk_limit)
+        if v_to == v_from:
+            return
+        sign = 1.0 if v_to > v_from else -1.0
+        if total == 0:
+            self._add_phase(0.0, velocity_step=v_to - v_from)
+        elif jerk_phase == 0:
+            self._add_phase(total, acceleration_step=sign * self.acceleration_limit)
+            self._add_phase(0.0, acceleration_step=-sign * self.acceleration_limit)
+        else:
+            self._add_phase(jerk_phase, sign * self.jerk_limit)
+            if total > 2 * jerk_phase:
+                self._add_phase(total - 2 * jerk_phase)
+            self._add_phase(jerk_phase, -sign * self.jerk_limit)
+
+    def _integrate(self):
+        """Position, velocity and acceleration at the start of each phase,
+        after its steps, and at the end of the move."""
+        self._starts = []
+        self._states = []
+        t, s, v, a = 0.0, 0.0, self.begin_velocity, 0.0
+        for duration, jerk, velocity_step, acceleration_step in self.phases:
+            v += velocity_step
+            a += acceleration_step
+            self._starts.append(t)
+            self._states.append((s, v, a))
+            s, v, a = self._advance(s, v, a, jerk, duration)
+            t += duration
+        # Land exactly on the target despite rounding
+        self._starts.append(t)
+        self._states.append((self.distance, self.end_velocity, 0.0))
+
+    @staticmethod
+    def _advance(s: float, v: float, a: float, jerk: float, dt: float) -> Tuple[float, float, float]:
+        return (s + v * dt + a * dt * dt / 2 + jerk * dt ** 3 / 6,
+                v + a * dt + jerk * dt * dt / 2,
+                a + jerk * dt)
+
+    def state(self, t: float) -> Tuple[float, float, float]:
+        """(position, velocity, acceleration) t seconds into the move."""
+        if t >= self.duration:
+            return self._states[-1]
+        index = max(0, bisect_right(self._starts, t) - 1)
+        s, v, a = self._states[index]
+        jerk = self.phases[index][1]
+        return self._advance(s, v, a, jerk, t - self._starts[index])
+
+    def position(self, t: float) -> float:
+        """Distance along the move t seconds in."""
+        return self.state(t)[0]
+
+    def velocity(self, t: float) -> float:
+        return self.state(t)[1]
+
+    def acceleration(self, t: float) -> float:
+        return self.state(t)[2]
+
+    def sample(self, interval: float) -> List[Tuple[float, float, float]]:
+        """(time, position, velocity) every interval seconds, ending at the target."""
+        samples = []
+        count = int(self.duration / interval) if interval > 0 else 0
+        for step in range(count + 1):
+            t = step * interval
+            s, v, _ = self.state(t)
+            samples.append((t, s, v))
+        if not samples or samples[-1][0] < self.duration:
+            s, v, _ = self.state(self.duration)
+            samples.append((self.duration, s, v))
+        return samples
@@ -1,29 +1,50 @@
 import serial
+import sys
 import time
 import threading
+from collections import deque
 from queue import Queue, Empty
-from typing import Optional
+from typing import Optional, Tuple
 from PyQt5.QtCore import QObject, pyqtSignal
 
 from .robot_state import RobotState
 from .gcode_parser import GCodeParser
+from .links import open_link
+from .sim_clock import SimClock
+from .motion_profile import MotionProfile
+from .motion_planner import MotionPlanner, Segment, PLANNER_LOOKAHEAD
 
 class RobotSimulator(QObject):
     # Signal to update 3D visualization
     movement_started = pyqtSignal(float, float, float, float)  # x, y, z, duration
     movement_finished = pyqtSignal()
+    # G0/G1 about to run: x, y, z target and its MotionProfile
+    movement_planned = pyqtSignal(float, float, float, object)
 
-    def __init__(self, port: str = 'COM1', baudrate: int = 115200):
+    def __init__(self, port: str = 'COM1', baudrate: int = 115200, time_scale: float = 1,
+                 lookahead: int = PLANNER_LOOKAHEAD):
+        """port is a serial port name, "tcp://host:port" to serve the robot's
+        Ethernet interface instead, "pty" for a virtual serial port or
+        "loop://name" for an in-process link (see device_port).
+
+        time_scale speeds up moves, dwells and homing: 1 is real time, 10
+        is ten times faster and 0 (sim_clock.INSTANT) replies at once.
+        The clock still counts their full length (see simulated_time).
+
+        Up to lookahead queued G0/G1 moves are blended as the firmware
+        does (see MotionPlanner); a lookahead of 1 stops at every move."""
         super().__init__()
         self.port = port
         self.baudrate = baudrate
-        self.serial: Optional[serial.Serial] = None
+        self.clock = SimClock(time_scale)
+        self.serial: Optional[serial.Serial] = None  # Or a TcpServerLink, PtyLink or LoopbackLink
         self.running = False
         self.command_queue = Queue()
         
         # Initialize robot state and G-code parser
-        self.robot_state = RobotState()
+        self.robot_state = RobotState(self.clock)
         self.gcode_parser = GCodeParser(self.robot_state)
+        self.planner = MotionPlanner(lookahead)
         
         # Communication threads
         self.reader_thread: Optional[threading.Thread] = None
@@ -36,11 +57,7 @@ class RobotSimulator(QObject):
     def start(self):
         """Start the robot simulator."""
         try:
-            self.serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                timeout=0.1
-            )
+            self.serial = open_link(self.port, self.baudrate)
             
             self.running = True
             self.reader_thread = threading.Thread(target=self._reader_loop)
@@ -52,12 +69,29 @@ class RobotSimulator(QObject):
             self.reader_thread.start()
             self.processor_thread.start()
             
-            print(f"Robot simulator started on {self.port}")
+            print(f"Robot simulator started on {self.device_port}"
+                  f" at {self._scale_name(self.clock.time_scale)}")
             
-        except serial.SerialException as e:
+        except (serial.SerialException, OSError, ValueError) as e:
             print(f"Error opening serial port {self.port}: {e}")
             self.running = False
 
+    @property
+    def device_port(self) -> str:
+        """What a client opens to reach the simulator: the pty slave path,
+        the tcp:// address, the loop:// name or the serial port."""
+        return getattr(self.serial, 'port', None) or self.port
+
+    @property
+    def simulated_time(self) -> float:
+        """Seconds the real robot would have taken since the simulator was
+        created, whatever the time scale."""
+        return self.clock.elapsed()
+
+    @staticmethod
+    def _scale_name(time_scale: float) -> str:
+        return f"{time_scale:g}x" if time_scale else "instant"
+
     def stop(self):
         """Stop the robot simulator."""
         self.running = False
@@ -67,70 +101,138 @@ class RobotSimulator(QObject):
             self.processor_thread.join()
         if self.serial:
             self.serial.close()
+        if self.clock.skipped:
+            simulated = self.simulated_time
+            print(f"Simulated {simulated:.1f} s of robot time in "
+                  f"{simulated - self.clock.skipped:.1f} s")
 
     def _reader_loop(self):
-        """Read commands from serial port."""
-        buffer = ""
+        """Read commands from serial port.
+
+        Each read takes everything that has arrived, or blocks until
+        something does (up to the link's timeout, so stop() is noticed).
+        The complete lines of a read go to the processor as one batch.
+        """
+        buffer = bytearray()
         
         while self.running:
-            if self.serial and self.serial.in_waiting:
-                char = self.serial.read().decode('ascii')
-                
-                if char == '\n':
-                    command = buffer.strip()
-                    if command:
-                        self.command_queue.put(command)
-                    buffer = ""
-                else:
-                    buffer += char
-            else:
-                time.sleep(0.001)  # Small delay to prevent CPU hogging
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                if self.running:
+                    print(f"Error reading from {self.device_port}: {e}")
+                    time.sleep(0.1)  # Link gone; do not spin on the error
+                continue
+            if not data:
+                continue
+            buffer += data
+            if b'\n' not in data:
+                continue
+            end = buffer.rindex(b'\n')
+            lines = buffer[:end].split(b'\n')
+            del buffer[:end + 1]
+            commands = [line.decode('ascii', 'replace').strip() for line in lines]
+            commands = [command for command in commands if command]
+            if commands:
+                self.command_queue.put(commands)
 
     def _processor_loop(self):
-        """Process commands from the queue."""
+        """Process batches of commands from the queue.
+
+        G0/G1 moves are parsed ahead into the planner, up to its lookahead,
+        so each one is blended with the moves queued behind it; a move is
+        answered once it has run. Any other command waits for the queued
+        moves to finish. Replies to commands that take no time are written
+        together; a command with a delay first flushes the replies before it.
+        """
+        pending = deque()
         while self.running:
-            try:
-                command = self.command_queue.get(timeout=0.1)
-                success, response, delay = self.gcode_parser.execute_command(command)
-                
-                if success and delay > 0:
-                    # For movement commands, simulate real-time movement
-                    if command.startswith(('G0', 'G1')):
-                        self._simulate_movement(delay)
-                    else:
-                        # For non-movement commands, just wait
-                        time.sleep(delay)
-                
-                # Send response
-                if self.serial:
-                    response_str = response + "\n"
-                    self.serial.write(response_str.encode('ascii'))
-                    
-            except Empty:
+            if not pending and not self.planner:
+                try:
+                    pending.extend(self.command_queue.get(timeout=0.1))
+                except Empty:
+                    continue
+            # Whatever else has arrived extends the lookahead
+            while True:
+                try:
+                    pending.extend(self.command_queue.get_nowait())
+                except Empty:
+                    break
+            while pending and self.gcode_parser.is_linear_move(pending[0]) and not self.planner.full:
+                self._plan_move(pending.popleft())
+            if self.planner:
+                self._run_move(self.planner.pop())
                 continue
-            except Exception as e:
-                print(f"Error processing command: {e}")
+            replies = []
+            while pending and not self.gcode_parser.is_linear_move(pending[0]):
+                command = pending.popleft()
+                try:
+                    success, response, delay = self.gcode_parser.execute_command(command)
+                    
+                    if success and delay > 0:
+                        self._write_replies(replies)
+                        replies = []
+                        self.clock.sleep(delay)
+                    
+                    replies.append(response + "\n")
+                        
+                except Exception as e:
+                    print(f"Error processing command: {e}")
+            self._write_replies(replies)
+
+    def _plan_move(self, command: str):
+        """Parse a G0/G1 and queue it in the planner with its reply."""
+        try:
+            success, response, delay = self.gcode_parser.execute_command(command)
+        except Exception as e:
+            print(f"Error processing command: {e}")
+            return
+        reply = response + "\n"
+        if not success:
+            # Nothing to move: answer in turn, after the moves queued before it
+            if self.planner:
+                self.planner.segments[-1].tag.append(reply)
+            else:
+                self._write_replies([reply])
+            return
+        segment = self.gcode_parser.last_segment
+        segment.tag = [reply]
+        self.planner.rest_velocity = self.robot_state.begin_end_velocity
+        self.planner.add(segment)
+
+    def _run_move(self, segment: Segment):
+        if segment.profile.duration > 0:
+            self._simulate_movement(segment.profile.duration, segment.profile, segment.end)
+        self._write_replies(segment.tag)
+
+    def _write_replies(self, replies):
+        if replies and self.serial:
+            self.serial.write(''.join(replies).encode('ascii'))
 
-    def _simulate_movement(self, duration: float):
+    def _simulate_movement(self, duration: float, profile: Optional[MotionProfile] = None,
+                           target: Optional[Tuple[float, float, float]] = None):
         """Simulate robot movement in real-time."""
         with self.movement_lock:
+            if target is None:
+                position = self.robot_state.current_position
+                target = (position.x, position.y, position.z)
+            if profile is not None:
+                self.movement_planned.emit(*target, profile)
             # Signal movement start with target position and duration
-            self.movement_started.emit(
-                self.robot_state.current_position.x,
-                self.robot_state.current_position.y,
-                self.robot_state.current_position.z,
-                duration
-            )
+            self.movement_started.emit(*target, duration)
             
             # Wait for the movement duration
-            time.sleep(duration)
+            self.clock.sleep(duration)
             
             # Signal movement completion
             self.movement_finished.emit()
 
 def main():
-    """Main entry point for the robot simulator."""
-    simulator = RobotSimulator()
+    """Main entry point for the robot simulator: [port] [baudrate] [time_scale]"""
+    port = sys.argv[1] if len(sys.argv) > 1 else 'COM1'
+    baudrate = int(sys.argv[2]) if len(sys.argv) > 2 else 115200
+    time_scale = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+    simulator = RobotSimulator(port, baudrate, time_scale)
     simulator.start()
     
     try:
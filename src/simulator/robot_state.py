@@ -1,9 +1,11 @@
 import math
-import time
 from dataclasses import dataclass
 from typing import Optional, Dict
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from .motion_profile import MotionProfile
+from .sim_clock import SimClock
+
 @dataclass
 class Position:
     x: float = 0
@@ -25,14 +27,15 @@ class RobotState(QObject):
     # Signal emitted when position changes
     position_changed = pyqtSignal(float, float, float)
 
-    def __init__(self):
+    def __init__(self, clock: Optional[SimClock] = None):
         super().__init__()
+        self.clock = clock or SimClock()
         self.current_position = Position()
         self.movement_params = MovementParams()
         self.is_absolute_mode = True
         self.is_homed = False
         self.z_safe = -870  # Default Z safe limit
-        self.last_command_time = time.time()
+        self.last_command_time = self.clock.time()
         
         # Position and movement
         self.x_offset = 0
@@ -68,18 +71,15 @@ class RobotState(QObject):
         # Calculate distance
         distance = math.sqrt(dx*dx + dy*dy + dz*dz)
         
-        # Simple time calculation based on constant velocity
-        # In reality, this should account for acceleration and deceleration
-        if distance == 0:
-            return 0
-            
-        time_s = distance / self.movement_params.feed_rate
-        return max(0.1, time_s)  # Minimum 0.1s for any movement
+        # Jerk-limited: accounts for acceleration and deceleration
+        params = self.movement_params
+        return MotionProfile(distance, params.feed_rate, params.acceleration, params.jerk,
+                             params.begin_velocity, params.end_velocity).duration
 
     def update_position(self, new_position: Position):
         """Update the current position."""
         self.current_position = new_position
-        self.last_command_time = time.time()
+        self.last_command_time = self.clock.time()
         # Emit signal with new position
         self.position_changed.emit(
             new_position.x,
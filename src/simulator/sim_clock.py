@@ -0,0 +1,54 @@
+import time
+
+INSTANT = 0  # Time scale that skips every delay
+TIME_SCALES = {'1x': 1, '10x': 10, '100x': 100, 'Instant': INSTANT}
+
+
+class SimClock:
+    """The simulated robot's clock.
+
+    Simulated time runs with the wall clock, except that each delay the
+    robot sleeps through (a move, a dwell, homing) takes 1/time_scale of its
+    length on the wall and the rest is skipped ahead. A time_scale of 1 is
+    real time, 10 runs delays ten times faster and INSTANT (0) does not
+    wait at all. Either way the simulated time moves by the full delay, so
+    durations read from this clock are the ones the real robot would take.
+    """
+
+    def __init__(self, time_scale: float = 1):
+        self.time_scale = time_scale
+        self.skipped = 0.0  # Simulated seconds that did not pass on the wall
+        self.started = self.monotonic()
+
+    @property
+    def time_scale(self) -> float:
+        return self._time_scale
+
+    @time_scale.setter
+    def time_scale(self, value: float):
+        if value < 0:
+            raise ValueError(f"Time scale must be 0 (instant) or positive, not {value}")
+        self._time_scale = value
+
+    def wall_duration(self, duration: float) -> float:
+        """How long a simulated duration takes on the wall clock."""
+        return duration / self._time_scale if self._time_scale else 0.0
+
+    def sleep(self, duration: float):
+        """Let duration pass in simulated time."""
+        wall = self.wall_duration(duration)
+        if wall > 0:
+            time.sleep(wall)
+        self.skipped += duration - wall
+
+    def monotonic(self) -> float:
+        """Simulated counterpart of time.monotonic()."""
+        return time.monotonic() + self.skipped
+
+    def time(self) -> float:
+        """Simulated counterpart of time.time()."""
+        return time.time() + self.skipped
+
+    def elapsed(self) -> float:
+        """Simulated seconds since the clock was created."""
+        return self.monotonic() - self.started
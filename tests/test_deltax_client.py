@@ -0,0 +1,71 @@
+import asyncio
+import itertools
+
+import pytest
+
+import deltax_client as dx
+from deltax_client.devices import DeviceError
+from simulator.robot_simulator import RobotSimulator
+from simulator.sim_clock import INSTANT
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def simulator():
+    simulator = RobotSimulator(port=f'loop://client-test-{next(_names)}', time_scale=INSTANT)
+    simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+def run(simulator, test):
+    async def main():
+        robot = await dx.open_robot(simulator.device_port)
+        try:
+            return await asyncio.wait_for(test(robot), 5)
+        finally:
+            robot.close()
+    return asyncio.run(main())
+
+
+def test_positions_reports_feedback_error(simulator):
+    # The simulator does not implement M100, so enabling feedback fails
+    async def test(robot):
+        positions = robot.positions(period_ms=50)
+        with pytest.raises(DeviceError) as error:
+            await positions.__anext__()
+        assert error.value.command.startswith("M100")
+        # The failed stream has unsubscribed and the robot still answers
+        assert not any(robot.listeners.values())
+        return await robot.get_position()
+
+    assert run(simulator, test) == (0.0, 0.0, -750.0)
+
+
+def test_read_inputs_reads_several_pins(simulator):
+    simulator.robot_state.digital_inputs[1] = True
+    simulator.robot_state.analog_inputs[2] = 3946
+
+    async def test(robot):
+        return await robot.read_inputs(digital=[0, 1], analog=[2])
+
+    assert run(simulator, test) == {"I0": 0, "I1": 1, "A2": 3946}
+
+
+def test_auto_feedback_goes_to_the_link_port():
+    from deltax_client.devices import Robot
+    from deltax_client.links import TcpLink
+
+    sent = []
+
+    class Recorder(Robot):
+        def __init__(self, link):
+            self.link = link
+
+        def send(self, command, expect=None, timeout=None):
+            sent.append(command)
+
+    Recorder(TcpLink()).set_auto_feedback(50)
+    Recorder(object()).set_auto_feedback(50)
+    assert sent == ["M100 A1 B50 C4", "M100 A1 B50 C0"]
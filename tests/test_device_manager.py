@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture
+def manager(qapp):
+    from components.device_manager import DeviceManager
+    manager = DeviceManager()
+    yield manager
+    for plugin in manager.plugins.values():
+        if hasattr(plugin, 'cleanup'):
+            plugin.cleanup()
+
+
+def item_of(manager, name):
+    for row in range(manager.device_list.count()):
+        item = manager.device_list.item(row)
+        if item.text() == name:
+            return item
+    raise KeyError(name)
+
+
+def test_added_device_takes_first_unused_name(manager):
+    manager.add_device('robot')
+    manager.add_device('robot')
+    robot2 = manager.devices_by_name["Robot 2"]
+    manager.remove_device(item_of(manager, "Robot 1"))
+
+    manager.add_device('robot')
+
+    assert manager.devices_by_name["Robot 2"] is robot2
+    added = manager.devices_by_name["Robot 1"]
+    assert added is not robot2
+    assert added.transport.name == "Robot 1"
+    assert sorted(manager.devices_by_name) == ["Robot 1", "Robot 2"]
+
+
+def test_removing_device_keeps_other_names(manager):
+    manager.add_device('robot')
+    manager.add_device('robot')
+    manager.remove_device(item_of(manager, "Robot 1"))
+    manager.add_device('robot')
+    robot1 = manager.devices_by_name["Robot 1"]
+
+    manager.remove_device(item_of(manager, "Robot 2"))
+
+    assert manager.devices_by_name == {"Robot 1": robot1}
+
+
+def test_removing_device_announces_it(manager):
+    manager.add_device('robot')
+    robot = manager.devices_by_name["Robot 1"]
+    removed = []
+    manager.device_removed.connect(removed.append)
+
+    manager.remove_device(item_of(manager, "Robot 1"))
+
+    assert removed == [robot]
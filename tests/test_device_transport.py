@@ -0,0 +1,12 @@
+from components.device_transport import DeviceTransport, FEEDBACK_PORT_RJ45, FEEDBACK_PORT_USB
+
+
+def test_feedback_port_follows_link(qapp):
+    transport = DeviceTransport('robot', "Robot 1")
+    assert transport.feedback_port() == FEEDBACK_PORT_USB
+
+    transport.connect_port('127.0.0.1:9')
+    assert transport.feedback_port() == FEEDBACK_PORT_RJ45
+
+    transport.disconnect_port()
+    assert transport.feedback_port() == FEEDBACK_PORT_USB
@@ -0,0 +1,18 @@
+from components.line_framer import classify
+from components.response_router import ResponseRouter, ROUTE_OK
+
+
+def test_callback_on_several_matching_routes_is_called_once():
+    router = ResponseRouter()
+    device = object()
+    calls = []
+
+    def callback(text, source):
+        calls.append((text, source))
+
+    router.subscribe(callback, device)
+    router.subscribe(callback, device, [ROUTE_OK])
+    router.subscribe(callback)
+
+    assert router.dispatch(classify(b"Ok"), device) == 1
+    assert calls == [("Ok", device)]
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from components.command_futures import CommandFuture, DONE
+from components.conveyor_control import ConveyorControl
+from components.response_router import ResponseRouter
+from plugins.script_runtime import ScriptRuntime
+
+
+class DeviceManager(QObject):
+    """Just what ScriptRuntime needs to be constructed"""
+    device_removed = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.router = ResponseRouter()
+        self.devices = {}
+
+    def get_device(self, name):
+        return self.devices.get(name)
+
+
+@pytest.fixture
+def runtime(qapp):
+    runtime = ScriptRuntime(DeviceManager(), None)
+    runtime.lines = []
+    runtime.output.connect(lambda line, device: runtime.lines.append(line))
+    runtime.log_message.connect(runtime.lines.append)
+    yield runtime
+    runtime.shutdown()
+
+
+def process_events(qapp, seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+def test_stop_does_not_run_code_after_the_wait(qapp, runtime):
+    runtime.run('print("before") sleep(0.3) print("should not")')
+    process_events(qapp, 0.1)
+    runtime.request_stop()
+    process_events(qapp, 0.5)
+
+    assert "before" in runtime.lines
+    assert "should not" not in runtime.lines
+    assert not runtime.running
+
+
+def test_timeout_does_not_run_code_after_the_wait(qapp, runtime):
+    runtime.time_limit = 100  # ms
+    runtime.run('sleep(0.3) print("should not")')
+    process_events(qapp, 0.6)
+
+    assert "should not" not in runtime.lines
+    assert not runtime.running
+
+
+def test_scripts_cannot_remove_the_budget_hook(qapp, runtime):
+    runtime.cpu_time_limit = 200  # ms
+    runtime.run('while true do pcall(debug.sethook) end')
+    process_events(qapp, 1)
+
+    assert "Script CPU time limit exceeded" in runtime.lines
+    assert not runtime.running
+
+
+def test_runs_cannot_change_the_standard_libraries(qapp, runtime):
+    runtime.run('pcall(rawset, string, "leak", 42) pcall(rawset, math, "pi", 3) '
+                'pcall(function() getmetatable("").__index.leak = 42 end)')
+    process_events(qapp, 0.2)
+    runtime.lines.clear()
+    runtime.run('print(string.leak, ("").leak, math.pi == 3)')
+    process_events(qapp, 0.2)
+
+    assert "None None False" in runtime.lines
+
+
+def test_conveyor_functions_send_gcode(qapp, runtime):
+    sent = []
+
+    def send_command(command, device, timeout):
+        sent.append(command)
+        future = CommandFuture(command)
+        future.settle(DONE)
+        return future
+
+    runtime.device_manager.devices["Conveyor 1"] = ConveyorControl()
+    runtime.channel.send_command = send_command
+    runtime.run('local conveyor = get_device("Conveyor 1") '
+                'print(conveyor_move(conveyor, "backward", 30)) '
+                'conveyor_stop(conveyor) '
+                'conveyor_step(conveyor, 120, 300) '
+                'reset_encoder(conveyor) '
+                'set_encoder_mode(conveyor, "relative")')
+    process_events(qapp, 0.3)
+
+    assert "True" in runtime.lines
+    assert sent == ["M310 2", "M311 -30", "M311 0", "M310 1", "M313 300", "M312 120",
+                    "M317 R", "M316 1"]
+
+
+def test_channel_forgets_removed_devices(qapp, runtime):
+    manager = runtime.device_manager
+    conveyor = ConveyorControl()
+    runtime.channel.send_command = lambda command, device, timeout: CommandFuture(command)
+    runtime.channel.handle_request(("M317", conveyor, None, CommandFuture("M317")))
+    assert conveyor in runtime.channel.watched_devices
+
+    manager.router.remove_device(conveyor)
+    manager.device_removed.emit(conveyor)
+
+    assert conveyor not in runtime.channel.watched_devices